@@ -2,7 +2,7 @@
 Admin configuration for Video RAG models
 """
 from django.contrib import admin
-from .models import Video, Query, PDF, UserProfile
+from .models import Video, Query, PDF, UserProfile, ProcessingJob, StageTiming, PDFChunkNote
 
 
 @admin.register(Video)
@@ -33,7 +33,41 @@ class PDFAdmin(admin.ModelAdmin):
     readonly_fields = ['generated_at']
 
 
+@admin.register(PDFChunkNote)
+class PDFChunkNoteAdmin(admin.ModelAdmin):
+    list_display = ['video', 'index', 'status', 'updated_at']
+    list_filter = ['status', 'updated_at']
+    search_fields = ['video__title']
+    readonly_fields = ['updated_at']
+
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'total_videos', 'total_queries', 'total_pdfs', 'total_processing_hours']
     search_fields = ['user__username']
+
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'video', 'user', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['video__title', 'user__username', 'last_error']
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at']
+
+
+@admin.register(StageTiming)
+class StageTimingAdmin(admin.ModelAdmin):
+    list_display = ['video', 'stage', 'started_at', 'duration_seconds', 'succeeded', 'bytes', 'segments', 'tokens']
+    list_filter = ['stage', 'succeeded', 'started_at']
+    search_fields = ['video__title']
+    readonly_fields = ['started_at', 'finished_at']
+    
+    def changelist_view(self, request, extra_context=None):
+        """Show p50/p95 duration per stage for the filtered runs above the list"""
+        from video_processor.timing import stage_percentiles
+        
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None:
+            response.context_data['stage_report'] = stage_percentiles(changelist.queryset)
+        return response
@@ -0,0 +1,34 @@
+"""
+Management command to (re)build the library-wide ANN index.
+
+Trains a fresh IVF coarse quantizer over every shard in the vector store and
+replaces the saved index. New videos are inserted incrementally by the
+processing pipeline, so this is only needed after bulk imports or to
+re-balance the lists once the library has changed shape.
+"""
+
+from django.core.management.base import BaseCommand
+
+from video_processor.ann_index import rebuild_library_index
+from video_processor.vector_store import get_vector_store
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the library-wide approximate nearest-neighbour index from all vector shards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--nlist',
+            type=int,
+            default=None,
+            help='Number of IVF lists (default: ANN_INDEX_NLIST or 4 * sqrt(N)).',
+        )
+
+    def handle(self, *args, **options):
+        index = rebuild_library_index(get_vector_store(), nlist=options['nlist'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Indexed %d vectors from %d shard(s) into %d list(s).' % (
+                    len(index), len(index.shard_keys), len(index.centroids))
+            )
+        )
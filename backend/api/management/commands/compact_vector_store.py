@@ -0,0 +1,40 @@
+"""
+Management command to compact the vector store.
+
+Ingest appends each batch of new embeddings as its own segment (per-video
+shards) or part (library ANN index) and compacts in the background once a
+threshold is crossed. This command folds everything back into single
+contiguous files on demand, e.g. from a nightly cron job.
+"""
+
+from django.core.management.base import BaseCommand
+
+from video_processor.ann_index import INDEX_DIR, MANIFEST_FILE, compact_library_index
+from video_processor.vector_store import get_vector_store
+
+
+class Command(BaseCommand):
+    help = 'Merge vector shard segments and library index parts into single files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retrain',
+            action='store_true',
+            help='Also retrain the library index quantizer on the current vectors.',
+        )
+
+    def handle(self, *args, **options):
+        store = get_vector_store()
+
+        compacted = 0
+        for key in store.shard_keys():
+            if store.compact_shard(key):
+                compacted += 1
+                self.stdout.write('  [COMPACTED] %s' % key)
+        self.stdout.write('Compacted %d shard(s).' % compacted)
+
+        if (INDEX_DIR / MANIFEST_FILE).exists():
+            index = compact_library_index(retrain=options['retrain'])
+            self.stdout.write('Library index: %d entries in %d part(s).' % (len(index), len(index.parts)))
+
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,101 @@
+"""
+Management command to link existing videos to vector store shards.
+
+Queries resolve a video's chunks through Video.vector_shard, which the
+processing pipeline sets at ingest. Videos processed earlier have no shard
+recorded, and their embeddings may still live only in the old library-wide
+embeddings.joblib (rows keyed by the cleaned filename in the `title` column).
+
+For every video without a shard this command:
+    1. links it to an existing shard named after its artifact key (content
+       hash, or cleaned filename for videos uploaded before hashing), or
+    2. imports its rows from embeddings.joblib into a new shard.
+
+Videos found in neither place are reported and must be reprocessed.
+"""
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.models import Video
+from video_processor.ann_index import index_shard
+from video_processor.artifacts import artifact_key
+from video_processor.embedding import EMBEDDING_MODEL
+from video_processor.files import SCRIPTS_DIR
+from video_processor.vector_store import get_vector_store
+
+
+class Command(BaseCommand):
+    help = 'Record vector shards for videos processed before Video.vector_shard existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Preview changes without saving them.',
+        )
+
+    def _legacy_rows(self):
+        """Group embeddings.joblib rows by title, or None if there is no legacy file"""
+        embedding_file = SCRIPTS_DIR / 'embeddings.joblib'
+        if not embedding_file.exists():
+            return None
+
+        import joblib
+        df = joblib.load(str(embedding_file))
+        self.stdout.write('Loaded %d legacy rows from %s\n' % (len(df), embedding_file))
+        return {title: group for title, group in df.groupby('title')}
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        store = get_vector_store()
+        legacy_rows = None
+
+        videos = Video.objects.filter(Q(vector_shard__isnull=True) | Q(vector_shard=''))
+        self.stdout.write('Found %d video(s) without a vector shard.\n' % videos.count())
+
+        linked = imported = missing = 0
+
+        for video in videos:
+            base_name = artifact_key(video)
+
+            if not store.has_shard(base_name):
+                if legacy_rows is None:
+                    legacy_rows = self._legacy_rows() or {}
+
+                rows = legacy_rows.get(base_name)
+                if rows is None:
+                    self.stdout.write(
+                        self.style.WARNING('  [MISS] #%d "%s" - no embeddings found' % (video.id, video.title))
+                    )
+                    missing += 1
+                    continue
+
+                self.stdout.write('  [IMPORT] #%d "%s" - %d rows' % (video.id, video.title, len(rows)))
+                if not dry_run:
+                    rows = rows.sort_values('start')
+                    chunks = [
+                        {'chunk_id': position, 'start': row['start'], 'end': row['end'], 'text': row['text']}
+                        for position, row in enumerate(rows.to_dict('records'))
+                    ]
+                    shard = store.write_shard(base_name, chunks, np.vstack(rows['embedding'].to_numpy()),
+                                              model=EMBEDDING_MODEL)
+                    index_shard(base_name, shard.vectors)
+                imported += 1
+            else:
+                self.stdout.write(self.style.SUCCESS('  [LINK] #%d "%s" -> %s' % (video.id, video.title, base_name)))
+                linked += 1
+
+            if not dry_run:
+                video.vector_shard = base_name
+                video.save(update_fields=['vector_shard'])
+
+        self.stdout.write('\n--- Summary ---')
+        self.stdout.write('Linked   : %d' % linked)
+        self.stdout.write('Imported : %d' % imported)
+        self.stdout.write('Missing  : %d  (reprocess these videos)' % missing)
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN - no changes were saved.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,35 @@
+"""
+Management command to inspect or clear the LLM response cache.
+
+PDF generation and the AI chat answer repeated Groq requests from a disk cache
+(see video_processor.llm_cache). This command reports its size and clears it,
+e.g. after changing prompts in bulk.
+"""
+
+from django.core.management.base import BaseCommand
+
+from video_processor.llm_cache import response_cache
+
+
+class Command(BaseCommand):
+    help = 'Show LLM response cache usage, or clear it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete every cached response.',
+        )
+
+    def handle(self, *args, **options):
+        stats = response_cache.stats()
+        self.stdout.write('Directory: %s' % response_cache.directory)
+        self.stdout.write('Entries: %d (%.1f of %.1f MB)' % (
+            stats['entries'], stats['bytes'] / 1e6, stats['max_bytes'] / 1e6,
+        ))
+
+        if options['clear']:
+            response_cache.clear()
+            self.stdout.write('Cleared %d cached response(s).' % stats['entries'])
+
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,67 @@
+"""
+Management command to resume failed or interrupted video processing.
+
+The pipeline checkpoints every completed stage and every transcribed audio
+segment, so a resumed video skips extraction and the segments that were
+already transcribed. By default this queues every failed video and every
+video left 'uploading'/'processing' without an active job (e.g. after a crash);
+`--video` limits it to specific ids. Jobs run on `manage.py run_workers`.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.models import ProcessingJob, Video
+from video_processor.pipeline import checkpoint_progress, resume_video
+
+
+class Command(BaseCommand):
+    help = 'Resume failed or interrupted videos from their last pipeline checkpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--video',
+            type=int,
+            action='append',
+            dest='video_ids',
+            default=None,
+            help='Resume only this video id (repeatable).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be resumed without queueing anything.',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        videos = Video.objects.exclude(status='completed')
+        if options['video_ids']:
+            videos = videos.filter(id__in=options['video_ids'])
+        else:
+            active = ProcessingJob.objects.filter(
+                kind='process_video', status__in=['queued', 'running']
+            ).values('video_id')
+            videos = videos.exclude(id__in=active)
+
+        self.stdout.write('Found %d video(s) to resume.\n' % videos.count())
+
+        queued = 0
+        for video in videos.order_by('upload_date'):
+            progress = checkpoint_progress(video)
+            self.stdout.write('  [RESUME] #%d "%s" (%s) - stages: %s, segments %d/%d' % (
+                video.id, video.title, video.status,
+                ', '.join(progress['stages']) or 'none',
+                progress['segments_transcribed'], progress['segments_total'],
+            ))
+            if not dry_run:
+                job, created = resume_video(video.id)
+                if created:
+                    queued += 1
+
+        self.stdout.write('\n--- Summary ---')
+        self.stdout.write('Queued : %d' % queued)
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN - nothing was queued.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Done. Jobs run on `manage.py run_workers`.'))
@@ -0,0 +1,52 @@
+"""
+Management command to run the background processing workers.
+
+Claims jobs (video processing, YouTube downloads) from the ProcessingJob table
+and runs them on a fixed-size thread pool. Jobs are stored in the database, so
+uploads made while no worker is running are processed once one starts, and jobs
+interrupted by a restart are requeued after their lease expires.
+"""
+
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from video_processor.worker import JobWorkerPool
+
+
+class Command(BaseCommand):
+    help = 'Run background workers that process queued videos and downloads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of concurrent jobs (default: JOB_QUEUE_WORKERS).',
+        )
+        parser.add_argument(
+            '--kind',
+            action='append',
+            dest='kinds',
+            default=None,
+            help='Only run jobs of this kind (repeatable), e.g. --kind process_video.',
+        )
+
+    def handle(self, *args, **options):
+        pool = JobWorkerPool(workers=options['workers'], kinds=options['kinds']).start()
+        self.stdout.write(self.style.SUCCESS(
+            'Running %d worker(s) as %s. Press Ctrl+C to stop.' % (pool.workers, pool.worker_id)
+        ))
+
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        try:
+            while not stopping.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write('Stopping workers; waiting for running jobs to finish...')
+        pool.stop()
+        self.stdout.write(self.style.SUCCESS('Workers stopped.'))
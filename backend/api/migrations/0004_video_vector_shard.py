@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-16 23:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_add_youtube_url_to_video"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="vector_shard",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
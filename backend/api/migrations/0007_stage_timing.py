@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-17 00:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_video_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StageTiming",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("stage", models.CharField(choices=[("audio_extraction", "Audio Extraction"), ("transcription", "Transcription"), ("embedding", "Embedding"), ("pdf_generation", "PDF Generation")], max_length=30)),
+                ("started_at", models.DateTimeField()),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("duration_seconds", models.FloatField(blank=True, null=True)),
+                ("succeeded", models.BooleanField(blank=True, null=True)),
+                ("bytes", models.BigIntegerField(blank=True, null=True)),
+                ("segments", models.IntegerField(blank=True, null=True)),
+                ("tokens", models.IntegerField(blank=True, null=True)),
+                ("video", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="stage_timings", to="api.video")),
+            ],
+            options={
+                "ordering": ["started_at"],
+                "indexes": [models.Index(fields=["stage", "started_at"], name="stage_timing_idx")],
+            },
+        ),
+    ]
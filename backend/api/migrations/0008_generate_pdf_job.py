@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 00:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_stage_timing"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="processingjob",
+            name="kind",
+            field=models.CharField(choices=[("process_video", "Process Video"), ("youtube_download", "YouTube Download"), ("generate_pdf", "Generate PDF")], max_length=30),
+        ),
+    ]
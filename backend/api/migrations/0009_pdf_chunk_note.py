@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-17 00:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_generate_pdf_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PDFChunkNote",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("index", models.IntegerField()),
+                ("input_hash", models.CharField(max_length=64)),
+                ("status", models.CharField(choices=[("generated", "Generated"), ("fallback", "Fallback")], max_length=20)),
+                ("content", models.TextField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("video", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="pdf_chunk_notes", to="api.video")),
+            ],
+            options={
+                "ordering": ["video", "index"],
+                "unique_together": {("video", "index")},
+            },
+        ),
+    ]
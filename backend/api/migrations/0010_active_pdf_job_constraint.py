@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-17 00:28
+
+from django.db import migrations, models
+
+
+def fail_duplicate_pdf_jobs(apps, schema_editor):
+    """Keep the oldest active generate_pdf job per video so the constraint can be added"""
+    ProcessingJob = apps.get_model("api", "ProcessingJob")
+    seen = set()
+    active = ProcessingJob.objects.filter(kind="generate_pdf", status__in=["queued", "running"]).order_by("created_at")
+    for job in active:
+        if job.video_id in seen:
+            ProcessingJob.objects.filter(id=job.id).update(status="failed", last_error="Superseded by an earlier PDF job")
+        seen.add(job.video_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_pdf_chunk_note"),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_pdf_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="processingjob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("kind", "generate_pdf"), ("status__in", ["queued", "running"])),
+                fields=("video", "kind"),
+                name="one_active_pdf_job_per_video",
+            ),
+        ),
+    ]
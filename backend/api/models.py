@@ -39,6 +39,12 @@ class Video(models.Model):
     # Source URL (for YouTube videos)
     youtube_url = models.URLField(max_length=500, null=True, blank=True)
     
+    # Vector store shard holding this video's chunk embeddings (set at ingest)
+    vector_shard = models.CharField(max_length=255, null=True, blank=True)
+    
+    # SHA-256 of the uploaded file; derived artifacts are stored under it and shared by duplicates
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    
     class Meta:
         ordering = ['-upload_date']
     
@@ -92,3 +98,114 @@ class UserProfile(models.Model):
     
     def __str__(self):
         return f"Profile: {self.user.username}"
+
+
+class ProcessingJob(models.Model):
+    """Durable background job, claimed and run by `manage.py run_workers`"""
+    
+    KIND_CHOICES = [
+        ('process_video', 'Process Video'),
+        ('youtube_download', 'YouTube Download'),
+        ('generate_pdf', 'Generate PDF'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs', null=True, blank=True)
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='jobs', null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    
+    # Progress reported by the handler while running (e.g. 'downloading', 42)
+    phase = models.CharField(max_length=30, blank=True, default='')
+    progress = models.IntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True, default='')
+    
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_claim_idx'),
+        ]
+        constraints = [
+            # One active PDF job per video: concurrent refresh requests coalesce on insert
+            models.UniqueConstraint(
+                fields=['video', 'kind'],
+                condition=models.Q(kind='generate_pdf', status__in=['queued', 'running']),
+                name='one_active_pdf_job_per_video',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.id} - {self.status}"
+
+
+class StageTiming(models.Model):
+    """Wall-clock time and work done by one run of a pipeline stage for a video"""
+    
+    STAGE_CHOICES = [
+        ('audio_extraction', 'Audio Extraction'),
+        ('transcription', 'Transcription'),
+        ('embedding', 'Embedding'),
+        ('pdf_generation', 'PDF Generation'),
+    ]
+    
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='stage_timings')
+    stage = models.CharField(max_length=30, choices=STAGE_CHOICES)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    succeeded = models.BooleanField(null=True, blank=True)
+    
+    # Work done by the stage (bytes written/sent, audio segments or chunks, LLM/embedding tokens)
+    bytes = models.BigIntegerField(null=True, blank=True)
+    segments = models.IntegerField(null=True, blank=True)
+    tokens = models.IntegerField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['started_at']
+        indexes = [
+            models.Index(fields=['stage', 'started_at'], name='stage_timing_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.video.title} - {self.stage} ({self.duration_seconds}s)"
+
+
+class PDFChunkNote(models.Model):
+    """Generated notes for one transcript chunk of a video's PDF, reused by later rebuilds"""
+    
+    STATUS_CHOICES = [
+        ('generated', 'Generated'),
+        ('fallback', 'Fallback'),
+    ]
+    
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='pdf_chunk_notes')
+    index = models.IntegerField()
+    # Hash of the LLM request (model, prompt, sampling) the notes were generated from
+    input_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    content = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['video', 'index']
+        unique_together = [('video', 'index')]
+    
+    def __str__(self):
+        return f"{self.video.title} - chunk {self.index} ({self.status})"
@@ -1,3 +1,745 @@
-from django.test import TestCase
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from api.models import PDF, PDFChunkNote, ProcessingJob, Video
+from video_processor.artifacts import find_shared_pdf
+from video_processor.checkpoints import PipelineCheckpoint
+from video_processor.embedding import EmbeddingCache
+from video_processor.lexical_index import BM25Index, tokenize
+from video_processor import llm_cache
+from video_processor.jobs import (
+    JOB_HANDLERS, PermanentJobError, claim_job, enqueue, requeue_stale_jobs, run_job,
+)
+from video_processor import pdf_gen
+from video_processor.pdf_gen import _repair_code_blocks_with_llm, generate_pdf_async
+from video_processor.query import search_library
+from video_processor.streaming import EmbeddingStream
+from video_processor.youtube import download_youtube_video
+
+from video_processor.ann_index import IVFIndex
+from video_processor.transcription import read_segment_list, transcribe_segments
+from video_processor import vector_store
+from video_processor.vector_store import VectorStore
+
+
+class FakeWhisperClient:
+    """Returns one Whisper segment per file, timed relative to the file"""
+
+    def __init__(self):
+        self.files = []
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self.create))
+
+    def create(self, file, model, response_format):
+        name = Path(file.name).name
+        self.files.append(name)
+        return SimpleNamespace(
+            segments=[
+                {'start': 1.0, 'end': 2.5, 'text': f' {name} a'},
+                {'start': 590.0, 'end': 599.0, 'text': f' {name} b'},
+            ],
+            text=f'{name} text',
+        )
+
+
+class SegmentOffsetTests(SimpleTestCase):
+    def setUp(self):
+        self.segments_dir = Path(tempfile.mkdtemp())
+        self.list_path = self.segments_dir / 'lecture_segments.csv'
+        # Segment muxer CSV: name,start,end (last segment is shorter)
+        self.list_path.write_text(
+            'lecture_part_000.mp3,0.000000,600.024000\n'
+            'lecture_part_001.mp3,600.024000,1200.048000\n'
+            'lecture_part_002.mp3,1200.048000,1415.500000\n'
+        )
+        for index in range(3):
+            (self.segments_dir / f'lecture_part_{index:03d}.mp3').write_bytes(b'')
+
+    def test_read_segment_list(self):
+        segments = read_segment_list(self.list_path, self.segments_dir)
+
+        self.assertEqual(
+            [(path.name, start, end) for path, start, end in segments],
+            [
+                ('lecture_part_000.mp3', 0.0, 600.024),
+                ('lecture_part_001.mp3', 600.024, 1200.048),
+                ('lecture_part_002.mp3', 1200.048, 1415.5),
+            ],
+        )
+
+    def test_read_segment_list_orders_by_start(self):
+        self.list_path.write_text(
+            'lecture_part_1000.mp3,600000.0,600600.0\n'
+            'lecture_part_999.mp3,599400.0,600000.0\n'
+            '\n'
+        )
+
+        segments = read_segment_list(self.list_path, self.segments_dir)
+
+        self.assertEqual([path.name for path, _, _ in segments], ['lecture_part_999.mp3', 'lecture_part_1000.mp3'])
+
+    def test_offsets_come_from_segment_list_without_subprocesses(self):
+        segments = read_segment_list(self.list_path, self.segments_dir)
+
+        with mock.patch('subprocess.run') as run, mock.patch('subprocess.check_output') as check_output:
+            chunks, text = transcribe_segments(FakeWhisperClient(), segments, 'lecture', workers=3)
+
+        run.assert_not_called()
+        check_output.assert_not_called()
+        self.assertEqual(
+            [(round(chunk['start'], 3), round(chunk['end'], 3)) for chunk in chunks],
+            [
+                (1.0, 2.5), (590.0, 599.0),
+                (601.024, 602.524), (1190.024, 1199.024),
+                (1201.048, 1202.548), (1790.048, 1799.048),
+            ],
+        )
+        self.assertEqual(chunks[2]['text'], 'lecture_part_001.mp3 a')
+        self.assertEqual(text, 'lecture_part_000.mp3 text lecture_part_001.mp3 text lecture_part_002.mp3 text')
+
+    def test_trimmed_segment_times_map_back_to_source(self):
+        # Speech kept from 100-400s and 700-1000s of the video, silence in between dropped
+        segment = (self.segments_dir / 'lecture_part_000.mp3', 100.0, 1000.0, [(100.0, 400.0), (700.0, 1000.0)])
+
+        chunks, _ = transcribe_segments(FakeWhisperClient(), [segment], 'lecture', workers=1)
+
+        self.assertEqual(
+            [(chunk['start'], chunk['end']) for chunk in chunks],
+            [(101.0, 102.5), (990.0, 999.0)],
+        )
+
+
+class CheckpointResumeTests(SimpleTestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.segments = [
+            (self.root / f'lecture_part_{index:03d}.mp3', index * 600.0, (index + 1) * 600.0)
+            for index in range(3)
+        ]
+        for path, _, _ in self.segments:
+            path.write_bytes(b'')
+        self.checkpoint = PipelineCheckpoint('lecture', directory=self.root)
+        self.checkpoint.record_segments(self.segments)
+
+    def test_segments_need_a_file_or_a_transcript(self):
+        self.segments[0][0].unlink()
+        self.assertIsNone(self.checkpoint.segments())
+
+        self.checkpoint.record_transcript(0, {'segments': [], 'text': ''})
+        reloaded = PipelineCheckpoint.load('lecture', directory=self.root)
+
+        self.assertEqual(
+            [(path.name, start, end) for path, start, end, _ in reloaded.segments()],
+            [(path.name, start, end) for path, start, end in self.segments],
+        )
+        self.assertTrue(reloaded.has_stage('audio_extracted'))
+
+    def test_recording_segments_resets_transcripts(self):
+        self.checkpoint.record_transcript(1, {'segments': [], 'text': ''})
+        self.checkpoint.record_segments(self.segments)
+
+        self.assertEqual(self.checkpoint.progress()['segments_transcribed'], 0)
+
+    def test_resume_skips_recorded_transcripts(self):
+        self.checkpoint.record_transcript(1, {'segments': [{'start': 5.0, 'end': 6.0, 'text': ' saved'}], 'text': 'saved'})
+        client = FakeWhisperClient()
+
+        chunks, text = transcribe_segments(client, self.segments, 'lecture', workers=2, checkpoint=self.checkpoint)
+
+        self.assertEqual(sorted(client.files), ['lecture_part_000.mp3', 'lecture_part_002.mp3'])
+        self.assertEqual([chunk['start'] for chunk in chunks], [1.0, 590.0, 605.0, 1201.0, 1790.0])
+        self.assertEqual(text, 'lecture_part_000.mp3 text saved lecture_part_002.mp3 text')
+        self.assertEqual(
+            PipelineCheckpoint.load('lecture', directory=self.root).progress()['segments_transcribed'], 3
+        )
+
+
+def random_vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+class IVFIndexTests(SimpleTestCase):
+    def test_insert_search_and_reinsert(self):
+        index = IVFIndex(nlist=4)
+        first, second = random_vectors(40, seed=1), random_vectors(30, seed=2)
+        index.add_shard('a', first)
+        index.add_shard('b', second)
+
+        hits = index.search(second[7], top_k=3, nprobe=4)
+
+        self.assertEqual(hits[0][:2], ('b', 7))
+        self.assertAlmostEqual(hits[0][2], 1.0, places=5)
+
+        # Re-indexing a shard tombstones its previous generation
+        index.add_shard('a', first[:10])
+        self.assertEqual(len(index), 40)
+        self.assertEqual(index.live_shard_keys, ['a', 'b'])
+        self.assertEqual({key for key, _, _ in index.search(first[25], top_k=40, nprobe=4)}, {'a', 'b'})
+        self.assertNotIn(('a', 25), [hit[:2] for hit in index.search(first[25], top_k=40, nprobe=4)])
+
+    def test_retrains_once_outgrown(self):
+        index = IVFIndex(nlist=4)
+        index.add_shard('a', random_vectors(10, seed=1))
+        self.assertEqual(index.trained_count, 10)
+
+        part = index.add_shard('b', random_vectors(100, seed=2))
+
+        self.assertIsNone(part)
+        self.assertEqual(index.trained_count, 110)
+        self.assertEqual(len(index.parts), 1)
+        self.assertEqual(len(index), 110)
+
+    def test_dimension_mismatch_leaves_index_untouched(self):
+        index = IVFIndex(nlist=4)
+        vectors = random_vectors(40, seed=1)
+        index.add_shard('a', vectors)
+
+        with self.assertRaises(ValueError):
+            index.add_shard('b', random_vectors(5, dim=8))
+
+        self.assertEqual(index.live_shard_keys, ['a'])
+        self.assertEqual(len(index.parts), 1)
+        self.assertEqual(index.search(vectors[3], top_k=1, nprobe=4)[0][:2], ('a', 3))
+
+    def test_empty_index_adopts_new_dimension(self):
+        index = IVFIndex(nlist=4)
+        index.add_shard('a', random_vectors(10, dim=8))
+        index.remove_shard('a')
+
+        index.add_shard('b', random_vectors(10, dim=16))
+
+        self.assertEqual(index.dim, 16)
+        self.assertEqual(index.live_shard_keys, ['b'])
+
+    def test_save_and_load_round_trip(self):
+        directory = Path(tempfile.mkdtemp())
+        index = IVFIndex(nlist=4)
+        vectors = random_vectors(40, seed=1)
+        index.add_shard('a', vectors)
+        index.save(directory)
+        index.append(index.add_shard('b', random_vectors(5, seed=2)), directory)
+
+        loaded = IVFIndex.load(directory)
+
+        self.assertEqual(loaded.live_shard_keys, ['a', 'b'])
+        self.assertEqual(len(loaded), 45)
+        self.assertEqual(loaded.search(vectors[9], top_k=1, nprobe=4)[0][:2], ('a', 9))
+
+
+def make_chunks(start, count):
+    return [
+        {'chunk_id': start + i, 'start': float(start + i), 'end': float(start + i + 1), 'text': f'chunk {start + i}'}
+        for i in range(count)
+    ]
+
+
+class VectorStoreSegmentTests(SimpleTestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.store = VectorStore(self.root)
+
+    def test_append_then_compact_keeps_rows_in_order(self):
+        self.store.append_chunks('v', make_chunks(0, 3), random_vectors(3, seed=1), model='m')
+        shard = self.store.append_chunks('v', make_chunks(3, 2), random_vectors(2, seed=2), model='m')
+        version = shard.version
+
+        self.assertEqual(len(shard.segments), 2)
+        self.assertEqual([shard.text(row) for row in range(5)], [f'chunk {i}' for i in range(5)])
+
+        self.assertTrue(self.store.compact_shard('v'))
+        shard = self.store.open_shard('v')
+
+        self.assertEqual(len(shard.segments), 1)
+        self.assertEqual(shard.version, version)
+        self.assertEqual([shard.chunk(row)['chunk_id'] for row in range(5)], list(range(5)))
+        self.assertEqual(len(list((self.root / 'v').glob('seg-*'))), 3)
+
+    def test_append_during_compaction_in_another_process_is_kept(self):
+        # Two stores over one directory stand in for a worker and the compaction command
+        worker = VectorStore(self.root)
+        self.store.append_chunks('v', make_chunks(0, 2), random_vectors(2, seed=1), model='m')
+        self.store.append_chunks('v', make_chunks(2, 2), random_vectors(2, seed=2), model='m')
+
+        write_segment = self.store._write_segment
+        appender = threading.Thread(
+            target=worker.append_chunks, args=('v', make_chunks(4, 1), random_vectors(1, seed=3)), kwargs={'model': 'm'},
+        )
+
+        def write_segment_then_race(*args):
+            appender.start()
+            time.sleep(0.2)
+            return write_segment(*args)
+
+        with mock.patch.object(self.store, '_write_segment', write_segment_then_race):
+            self.store.compact_shard('v')
+        appender.join()
+
+        shard = VectorStore(self.root).open_shard('v')
+        self.assertEqual(len(shard), 5)
+        self.assertEqual(shard.text(4), 'chunk 4')
+        self.assertEqual(len(shard.vectors), 5)
+
+    def test_open_retries_when_compaction_retires_the_manifest_just_read(self):
+        self.store.append_chunks('v', make_chunks(0, 2), random_vectors(2, seed=1), model='m')
+        self.store.append_chunks('v', make_chunks(2, 2), random_vectors(2, seed=2), model='m')
+        reader = VectorStore(self.root)
+        shard_segments = vector_store.shard_segments
+        raced = []
+
+        def segments_then_compact(manifest):
+            segments = shard_segments(manifest)
+            if not raced:
+                raced.append(True)
+                self.store.compact_shard('v')
+            return segments
+
+        with mock.patch.object(vector_store, 'shard_segments', segments_then_compact):
+            shard = reader.open_shard('v')
+
+        self.assertEqual(len(shard.segments), 1)
+        self.assertEqual(shard.text(3), 'chunk 3')
+
+
+def fake_embeddings(texts, model=None, metrics=None):
+    return [vector for vector in random_vectors(len(texts))]
+
+
+def segment_texts(start, count):
+    return [{'start': float(start + i), 'end': float(start + i + 1), 'text': f'chunk {start + i}'} for i in range(count)]
+
+
+@mock.patch('video_processor.streaming.embed_texts_batched', fake_embeddings)
+class EmbeddingStreamTests(SimpleTestCase):
+    def setUp(self):
+        self.store = VectorStore(Path(tempfile.mkdtemp()))
+
+    def test_appends_in_batches_and_skips_embedded_chunks(self):
+        with EmbeddingStream(self.store, 'v', skip_starts={1.0}, model='m', flush_chunks=3) as stream:
+            for start in (0, 2, 4):
+                stream.put(segment_texts(start, 2))
+
+        shard = self.store.open_shard('v')
+        self.assertEqual(stream.embedded, 5)
+        self.assertEqual(len(shard.segments), 2)
+        self.assertEqual([shard.chunk(row)['chunk_id'] for row in range(5)], [0, 2, 3, 4, 5])
+
+    def test_failure_stops_the_stream_and_is_raised(self):
+        with mock.patch('video_processor.streaming.embed_texts_batched', side_effect=RuntimeError('ollama down')):
+            with self.assertRaisesMessage(RuntimeError, 'ollama down'):
+                with EmbeddingStream(self.store, 'v', model='m') as stream:
+                    stream.put(segment_texts(0, 2))
+                    while stream.error is None:
+                        time.sleep(0.01)
+                    stream.put(segment_texts(2, 2))
+
+        self.assertIsNone(self.store.open_shard('v'))
+
+    def test_embedded_chunks_are_kept_when_the_producer_fails(self):
+        embedding = threading.Event()
+
+        def signalling_embeddings(texts, model=None, metrics=None):
+            embedding.set()
+            return fake_embeddings(texts)
+
+        with mock.patch('video_processor.streaming.embed_texts_batched', signalling_embeddings):
+            with self.assertRaises(ValueError):
+                with EmbeddingStream(self.store, 'v', model='m') as stream:
+                    stream.put(segment_texts(0, 2))
+                    embedding.wait(timeout=5)
+                    raise ValueError('transcription failed')
+
+        self.assertEqual(self.store.open_shard('v').starts(), {0.0, 1.0})
+
+    def test_full_queue_blocks_the_producer(self):
+        release = threading.Event()
+
+        def slow_embeddings(texts, model=None, metrics=None):
+            release.wait(timeout=5)
+            return fake_embeddings(texts)
+
+        with mock.patch('video_processor.streaming.embed_texts_batched', slow_embeddings):
+            with EmbeddingStream(self.store, 'v', maxsize=1, model='m') as stream:
+                stream.put(segment_texts(0, 1))
+                time.sleep(0.1)
+                stream.put(segment_texts(1, 1))
+                producer = threading.Thread(target=stream.put, args=(segment_texts(2, 1),))
+                producer.start()
+                producer.join(timeout=0.2)
+
+                self.assertTrue(producer.is_alive())
+                release.set()
+                producer.join(timeout=5)
+
+        self.assertEqual(stream.embedded, 3)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class SharedPDFTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        self.original = Video.objects.create(user=self.alice, title='Private title', file='videos/a.mp4', content_hash='h')
+        pdf_path = Path(PDF._meta.get_field('file').storage.path('pdfs/h.pdf'))
+        pdf_path.parent.mkdir(parents=True, exist_ok=True)
+        pdf_path.write_bytes(b'%PDF')
+        self.pdf = PDF.objects.create(video=self.original, file='pdfs/h.pdf', file_size_bytes=4)
+
+    def test_same_users_duplicate_reuses_pdf(self):
+        duplicate = Video.objects.create(user=self.alice, title='Copy', file='videos/b.mp4', content_hash='h')
+
+        self.assertEqual(find_shared_pdf(duplicate), self.pdf)
+
+    def test_other_users_duplicate_gets_its_own_pdf(self):
+        duplicate = Video.objects.create(user=self.bob, title='Mine', file='videos/c.mp4', content_hash='h')
+
+        self.assertIsNone(find_shared_pdf(duplicate))
+
+
+class PDFJobCoalescingTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('alice')
+        self.video = Video.objects.create(user=user, title='Lecture', file='videos/a.mp4', status='completed')
+
+    def test_refreshes_coalesce_into_one_active_job(self):
+        job, created = generate_pdf_async(self.video.id)
+        again, created_again = generate_pdf_async(self.video.id, regenerate=True)
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.id, job.id)
+
+        ProcessingJob.objects.filter(id=job.id).update(status='succeeded')
+        _, created = generate_pdf_async(self.video.id)
+        self.assertTrue(created)
+
+    def test_regenerate_upgrades_a_queued_job_only(self):
+        job, _ = generate_pdf_async(self.video.id)
+        joined, _ = generate_pdf_async(self.video.id, regenerate=True)
+        self.assertEqual(joined.id, job.id)
+        self.assertTrue(ProcessingJob.objects.get(id=job.id).payload['regenerate'])
+
+        ProcessingJob.objects.filter(id=job.id).update(status='succeeded')
+        job, _ = generate_pdf_async(self.video.id)
+        ProcessingJob.objects.filter(id=job.id).update(status='running')
+        joined, created = generate_pdf_async(self.video.id, regenerate=True)
+
+        self.assertFalse(created)
+        self.assertFalse(joined.payload['regenerate'])
+
+    def test_database_rejects_a_second_active_job(self):
+        # What a request that raced past the lookup runs into
+        enqueue('generate_pdf', video=self.video)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            enqueue('generate_pdf', video=self.video)
+
+
+# Stand-in for scripts/enhance_and_pdf: '|' separates token chunks
+fake_enhance_and_pdf = SimpleNamespace(
+    split_text_by_tokens=lambda text, max_tokens, overlap: text.split('|'),
+    beautify_text=lambda text: f'plain {text}',
+)
+
+
+@mock.patch.dict('os.environ', {'PDF_ENHANCE_WORKERS': '1'})
+@mock.patch.object(pdf_gen, '_repair_code_blocks_with_llm', lambda client, model, content, **kwargs: content)
+@mock.patch.object(pdf_gen, '_generate_final_sections', lambda *args, **kwargs: 'SECTION: Final Summary')
+@mock.patch.object(pdf_gen, 'Groq', mock.Mock())
+class PDFChunkNoteReuseTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('alice')
+        self.video = Video.objects.create(user=user, title='Lecture', file='videos/a.mp4', status='completed')
+        self.failing = set()
+
+    def build(self, raw_text, use_cache=True):
+        """Generate notes for raw_text, returning the chunk texts sent to the LLM"""
+        requested = []
+
+        def generate_chunk_content(client, model, chunk_text, *args, **kwargs):
+            requested.append(chunk_text)
+            if chunk_text in self.failing:
+                raise RuntimeError('rate limited')
+            return f'notes {chunk_text}'
+
+        with mock.patch.object(pdf_gen, '_generate_chunk_content', generate_chunk_content):
+            content = pdf_gen._generate_high_quality_pdf_content(
+                raw_text, [], fake_enhance_and_pdf, use_cache=use_cache, video=self.video,
+            )
+        return requested, content
+
+    def notes(self):
+        return {note.index: (note.status, note.content) for note in PDFChunkNote.objects.filter(video=self.video)}
+
+    def test_only_changed_or_fallback_chunks_regenerate(self):
+        self.failing = {'b'}
+        requested, content = self.build('a|b|c')
+        self.assertEqual(requested, ['a', 'b', 'c'])
+        self.assertIn('plain b', content)
+        self.assertEqual(self.notes()[1], ('fallback', 'plain b'))
+
+        self.failing = set()
+        requested, content = self.build('a|b|c')
+        self.assertEqual(requested, ['b'])
+        self.assertIn('notes b', content)
+
+        requested, _ = self.build('a|y|c')
+        self.assertEqual(requested, ['y'])
+        self.assertEqual(self.notes(), {0: ('generated', 'notes a'), 1: ('generated', 'notes y'), 2: ('generated', 'notes c')})
+
+    def test_stale_indexes_are_dropped(self):
+        self.build('a|b|c')
+        self.build('a|b')
+
+        self.assertEqual(sorted(self.notes()), [0, 1])
+
+    def test_regenerate_ignores_stored_notes(self):
+        self.build('a|b')
+        requested, _ = self.build('a|b', use_cache=False)
+
+        self.assertEqual(requested, ['a', 'b'])
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = EmbeddingCache(max_size=2, ttl_seconds=0)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats(), {'size': 2, 'max_size': 2, 'hits': 3, 'misses': 1})
+
+    def test_entries_expire_after_ttl(self):
+        cache = EmbeddingCache(max_size=4, ttl_seconds=60)
+        with mock.patch('video_processor.embedding.time.monotonic', return_value=1000.0):
+            cache.put('a', 1)
+        with mock.patch('video_processor.embedding.time.monotonic', return_value=1059.0):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('video_processor.embedding.time.monotonic', return_value=1061.0):
+            self.assertIsNone(cache.get('a'))
+
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+class BM25IndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = BM25Index.build([
+            (0, 'we call os.path.join to build the path'),
+            (1, 'the path of the file and the path of the folder'),
+            (2, 'error E1001 means the join failed'),
+        ])
+
+    def test_identifiers_stay_whole_and_split(self):
+        self.assertEqual(tokenize('Call os.path.join'), ['call', 'os.path.join', 'os', 'path', 'join'])
+
+    def test_exact_identifier_ranks_first(self):
+        scores = self.index.scores('E1001')
+
+        self.assertEqual(int(scores.argmax()), 2)
+        self.assertEqual((scores[0], scores[1]), (0.0, 0.0))
+        self.assertEqual(int(self.index.scores('os.path.join').argmax()), 0)
+
+    def test_rarer_terms_weigh_more(self):
+        scores = self.index.scores('folder join')
+
+        # 'folder' occurs in one segment, 'join' in two
+        self.assertGreater(scores[1], scores[2])
+
+    def test_round_trip(self):
+        loaded = BM25Index.from_dict(self.index.to_dict())
+
+        np.testing.assert_allclose(loaded.scores('path join'), self.index.scores('path join'))
+
+
+@override_settings(JOB_RETRY_BACKOFF_SECONDS=30, JOB_LEASE_SECONDS=300)
+class JobQueueTests(TestCase):
+    def make_job(self, **fields):
+        return ProcessingJob.objects.create(kind='test', max_attempts=2, **fields)
+
+    def run_with(self, handler, job):
+        with mock.patch.dict(JOB_HANDLERS, {'test': handler}):
+            return run_job(job)
+
+    def test_claims_oldest_runnable_job_once(self):
+        later = self.make_job(run_after=timezone.now() + timedelta(minutes=5))
+        first = self.make_job()
+        second = self.make_job()
+
+        claimed = claim_job('worker-1')
+
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), ('running', 'worker-1', 1))
+        self.assertEqual(claim_job('worker-2').id, second.id)
+        self.assertIsNone(claim_job('worker-3'))
+        later.refresh_from_db()
+        self.assertEqual(later.status, 'queued')
+
+    def test_failed_attempt_is_retried_with_backoff_then_fails(self):
+        job = self.make_job()
+
+        def fail(job):
+            raise RuntimeError('boom')
+
+        self.assertFalse(self.run_with(fail, claim_job('w')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error, job.locked_by), ('queued', 'boom', ''))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=25))
+
+        ProcessingJob.objects.filter(id=job.id).update(run_after=None)
+        self.assertFalse(self.run_with(fail, claim_job('w')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_permanent_error_is_not_retried(self):
+        job = self.make_job()
+
+        def reject(job):
+            raise PermanentJobError('bad input')
+
+        self.run_with(reject, claim_job('w'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+
+    def test_success(self):
+        job = self.make_job()
+
+        self.assertTrue(self.run_with(lambda job: None, claim_job('w')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('succeeded', ''))
+
+    def test_stale_jobs_are_requeued_until_attempts_run_out(self):
+        stale_at = timezone.now() - timedelta(seconds=600)
+        retryable = self.make_job(status='running', attempts=1, locked_by='dead', locked_at=stale_at)
+        exhausted = self.make_job(status='running', attempts=2, locked_by='dead', locked_at=stale_at)
+        alive = self.make_job(status='running', attempts=1, locked_by='live', locked_at=timezone.now())
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+
+        for job in (retryable, exhausted, alive):
+            job.refresh_from_db()
+        self.assertEqual((retryable.status, retryable.locked_by), ('queued', ''))
+        self.assertEqual(exhausted.status, 'failed')
+        self.assertEqual(alive.status, 'running')
+
+    def test_youtube_retry_after_the_video_was_stored_does_not_download_again(self):
+        user = User.objects.create_user('alice')
+        video = Video.objects.create(user=user, title='Lecture', file='videos/a.mp4')
+        job = self.make_job(user=user, video=video, payload={'youtube_url': 'https://youtu.be/x'})
+
+        with mock.patch.dict('sys.modules', {'yt_dlp': None}):
+            download_youtube_video(job)
+
+        self.assertEqual(Video.objects.count(), 1)
+        self.assertEqual(ProcessingJob.objects.get(id=job.id).phase, 'processing')
+
+
+class FakeGroqClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        self.calls += 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f'answer {self.calls}'))],
+            usage=SimpleNamespace(total_tokens=10),
+        )
+
+
+@override_settings(LLM_CACHE_ENABLED=True)
+class ChatCompletionTests(SimpleTestCase):
+    def setUp(self):
+        cache = llm_cache.LLMResponseCache(directory=tempfile.mkdtemp())
+        patcher = mock.patch.object(llm_cache, 'response_cache', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_live_calls_take_a_network_slot(self):
+        client = FakeGroqClient()
+        messages = [{'role': 'user', 'content': 'hi'}]
+
+        with mock.patch.object(llm_cache, 'stage_slot', wraps=llm_cache.stage_slot) as slot:
+            first = llm_cache.chat_completion(client, 'm', messages)
+            second = llm_cache.chat_completion(client, 'm', messages)
+            fresh = llm_cache.chat_completion(client, 'm', messages, use_cache=False)
+
+        self.assertEqual((first, second, fresh), ('answer 1', 'answer 1', 'answer 2'))
+        self.assertEqual(client.calls, 2)
+        self.assertEqual([call.args for call in slot.call_args_list], [('network',), ('network',)])
+
+
+class CodeRepairSpliceTests(SimpleTestCase):
+    def test_each_repair_lands_on_its_own_block(self):
+        content = (
+            "Intro\n```python\nx = 1\n```\nMiddle\n```python\nx = 1\n```\n"
+            "```js\nbroken(\n```\nEnd"
+        )
+        repairs = iter(['first = 1', 'second = 1'])
+        lock = threading.Lock()
+
+        def repair(client, model, lang, code, metrics=None, use_cache=True):
+            if lang == 'js':
+                raise RuntimeError('model unavailable')
+            with lock:
+                return next(repairs)
+
+        with mock.patch('video_processor.pdf_gen._repair_code_block', side_effect=repair), \
+                mock.patch.dict('os.environ', {'PDF_CODE_REPAIR_WORKERS': '1'}):
+            repaired = _repair_code_blocks_with_llm(None, 'm', content)
+
+        self.assertEqual(
+            repaired,
+            "Intro\n```python\nfirst = 1\n```\nMiddle\n```python\nsecond = 1\n```\n"
+            "```js\nbroken(\n```\nEnd",
+        )
+
+
+class LibrarySearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice')
+        self.store = VectorStore(Path(tempfile.mkdtemp()))
+        self.index = IVFIndex(nlist=16)
+        # Twenty clustered shards; the user owns only 'far', whose cluster is far from the query
+        rng = np.random.default_rng(0)
+        self.centers = rng.standard_normal((20, 16)).astype(np.float32)
+        for number, center in enumerate(self.centers):
+            key = 'far' if number == 19 else f's{number}'
+            vectors = center + 0.05 * rng.standard_normal((30, 16)).astype(np.float32)
+            self.store.write_shard(key, make_chunks(0, 30), vectors, model='m')
+            self.index.add_shard(key, vectors)
+        self.index.compact(retrain=True)
+        for title in ('Lecture', 'Same file again'):
+            Video.objects.create(user=self.user, title=title, file='videos/a.mp4', status='completed', vector_shard='far')
+
+    def search(self, **kwargs):
+        with mock.patch('video_processor.query.get_vector_store', return_value=self.store), \
+                mock.patch('video_processor.ann_index.get_library_index', return_value=self.index), \
+                mock.patch('video_processor.query.embed_questions', return_value=self.centers[:1]):
+            return search_library(self.user, 'question', **kwargs)
+
+    def test_small_library_is_scanned_exactly(self):
+        results = self.search(limit=4)
+
+        self.assertEqual(len(results), 4)
+        # Both uploads of the same content appear, each with its own result
+        self.assertEqual({result['title'] for result in results}, {'Lecture', 'Same file again'})
+
+    @override_settings(LIBRARY_SEARCH_EXACT_MAX_ROWS=0, ANN_INDEX_NPROBE=1)
+    def test_index_probes_further_until_the_users_hits_are_found(self):
+        results = self.search(limit=10, offset=10)
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(len(self.search(limit=10, offset=50)), 10)
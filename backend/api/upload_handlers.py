@@ -0,0 +1,39 @@
+"""
+Upload handlers that hash file content while it is streamed to memory/disk
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class ContentHashMixin:
+    """
+    Computes the SHA-256 of every chunk this handler stores and exposes it as
+    `content_hash` on the resulting UploadedFile, so no second read is needed.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # Before super(): the memory handler ends new_file by raising StopFutureHandlers
+        self._content_hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        passed_on = super().receive_data_chunk(raw_data, start)
+        if passed_on is None:
+            # Chunk was stored by this handler
+            self._content_hasher.update(raw_data)
+        return passed_on
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.content_hash = self._content_hasher.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(ContentHashMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(ContentHashMixin, TemporaryFileUploadHandler):
+    pass
@@ -0,0 +1,17 @@
+"""
+Validation helpers shared by the API and background jobs
+"""
+import os
+
+MAX_VIDEO_SIZE = 500 * 1024 * 1024  # 500MB
+ALLOWED_VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
+
+
+def validate_video_file(file_name, file_size):
+    """Validate uploaded/downloaded video metadata"""
+    if file_size > MAX_VIDEO_SIZE:
+        raise ValueError(f"File too large. Max size is {MAX_VIDEO_SIZE / (1024*1024):.0f}MB")
+
+    file_ext = os.path.splitext(file_name)[1].lower()
+    if file_ext not in ALLOWED_VIDEO_EXTENSIONS:
+        raise ValueError(f"Invalid file type. Allowed: {', '.join(ALLOWED_VIDEO_EXTENSIONS)}")
@@ -15,8 +15,8 @@ from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.utils import timezone
-from django.core.files import File
-from .models import Video, Query, PDF, UserProfile
+from .models import Video, Query, PDF, UserProfile, ProcessingJob
+from .validators import validate_video_file
 from .serializers import (
     VideoSerializer, VideoListSerializer, QuerySerializer,
     PDFSerializer, UserProfileSerializer, DailyVideosSerializer,
@@ -24,20 +24,13 @@ from .serializers import (
 )
 import os
 import logging
-import shutil
-import tempfile
-import threading
-import uuid
-import re
 from datetime import datetime, timedelta
-from django.db.models import Count
+from django.db.models import Count, F
 from django.db.models.functions import TruncDate
 from collections import OrderedDict
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
-YOUTUBE_DOWNLOAD_TASKS = {}
-YOUTUBE_DOWNLOAD_LOCK = threading.Lock()
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -56,17 +49,6 @@ class VideoViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Video.objects.filter(user=self.request.user)
 
-    def _validate_video_file(self, file_name, file_size):
-        """Validate uploaded/downloaded video metadata"""
-        max_size = 500 * 1024 * 1024  # 500MB
-        if file_size > max_size:
-            raise ValueError(f"File too large. Max size is {max_size / (1024*1024):.0f}MB")
-
-        allowed_extensions = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
-        file_ext = os.path.splitext(file_name)[1].lower()
-        if file_ext not in allowed_extensions:
-            raise ValueError(f"Invalid file type. Allowed: {', '.join(allowed_extensions)}")
-
     def _is_youtube_url(self, value):
         """Check if URL is from YouTube"""
         try:
@@ -76,132 +58,6 @@ class VideoViewSet(viewsets.ModelViewSet):
         except Exception:
             return False
 
-    def _update_youtube_task(self, task_id, **updates):
-        """Thread-safe update for YouTube download task state"""
-        with YOUTUBE_DOWNLOAD_LOCK:
-            if task_id in YOUTUBE_DOWNLOAD_TASKS:
-                YOUTUBE_DOWNLOAD_TASKS[task_id].update(updates)
-
-    def _parse_progress_percent(self, value):
-        """Convert yt-dlp progress value to integer percent"""
-        if value is None:
-            return None
-
-        if isinstance(value, (int, float)):
-            return max(0, min(100, int(float(value))))
-
-        text = str(value)
-        match = re.search(r"(\d+(?:\.\d+)?)%", text)
-        if not match:
-            return None
-
-        return max(0, min(100, int(float(match.group(1)))))
-
-    def _run_youtube_download_task(self, task_id, youtube_url, custom_title, user_id):
-        """Background task that downloads YouTube video and triggers processing"""
-        temp_dir = None
-        downloaded_path = None
-
-        try:
-            import yt_dlp
-
-            temp_dir = tempfile.mkdtemp(prefix='yt_download_')
-            info_ref = {}
-
-            def progress_hook(progress_data):
-                status_value = progress_data.get('status')
-
-                if status_value == 'downloading':
-                    percent_value = self._parse_progress_percent(progress_data.get('_percent_str'))
-                    if percent_value is None:
-                        total_bytes = progress_data.get('total_bytes') or progress_data.get('total_bytes_estimate')
-                        downloaded_bytes = progress_data.get('downloaded_bytes')
-                        if total_bytes and downloaded_bytes is not None:
-                            percent_value = int((downloaded_bytes / total_bytes) * 100)
-
-                    self._update_youtube_task(
-                        task_id,
-                        status='downloading',
-                        message='Downloading from YouTube...',
-                        progress=percent_value if percent_value is not None else 0,
-                    )
-
-                if status_value == 'finished':
-                    filename = progress_data.get('filename')
-                    if filename:
-                        info_ref['downloaded_path'] = filename
-
-                    self._update_youtube_task(
-                        task_id,
-                        status='downloaded',
-                        message='Download complete. Uploading to application...',
-                        progress=100,
-                    )
-
-            ydl_opts = {
-                'format': 'best[ext=mp4]/best',
-                'outtmpl': os.path.join(temp_dir, '%(title).200B [%(id)s].%(ext)s'),
-                'noplaylist': True,
-                'quiet': True,
-                'no_warnings': True,
-                'progress_hooks': [progress_hook],
-            }
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(youtube_url, download=True)
-                downloaded_path = info_ref.get('downloaded_path') or ydl.prepare_filename(info)
-
-            if not downloaded_path or not os.path.exists(downloaded_path):
-                downloaded_files = [
-                    os.path.join(temp_dir, name)
-                    for name in os.listdir(temp_dir)
-                    if os.path.isfile(os.path.join(temp_dir, name))
-                ]
-                if not downloaded_files:
-                    raise ValueError('Failed to download video from YouTube')
-                downloaded_path = downloaded_files[0]
-
-            file_name = os.path.basename(downloaded_path)
-            file_size = os.path.getsize(downloaded_path)
-            self._validate_video_file(file_name, file_size)
-
-            user = User.objects.get(id=user_id)
-            final_title = custom_title or info.get('title') or os.path.splitext(file_name)[0]
-
-            video = Video(user=user, title=final_title, status='uploading', youtube_url=youtube_url)
-            with open(downloaded_path, 'rb') as downloaded_file:
-                video.file.save(file_name, File(downloaded_file), save=False)
-            video.save()
-
-            from video_processor.pipeline import process_video_async
-            process_video_async(video.id)
-
-            self._update_youtube_task(
-                task_id,
-                status='processing',
-                message='Uploaded. Processing video...',
-                progress=100,
-                video_id=video.id,
-                title=video.title,
-                user_id=user.id,
-            )
-
-            logger.info(f"YouTube download task {task_id} created video ID: {video.id}")
-
-        except ValueError as e:
-            logger.error(f"YouTube upload validation error in task {task_id}: {e}")
-            self._update_youtube_task(task_id, status='failed', message=str(e), progress=0, error=str(e))
-        except ImportError:
-            logger.error("yt-dlp is not installed")
-            error_message = 'YouTube downloader dependency is missing on server'
-            self._update_youtube_task(task_id, status='failed', message=error_message, progress=0, error=error_message)
-        except Exception as e:
-            logger.error(f"Error during YouTube upload task {task_id}: {e}", exc_info=True)
-            self._update_youtube_task(task_id, status='failed', message=str(e), progress=0, error=str(e))
-        finally:
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir, ignore_errors=True)
-    
     def perform_create(self, serializer):
         """Handle video upload with proper error handling and logging"""
         try:
@@ -211,15 +67,20 @@ class VideoViewSet(viewsets.ModelViewSet):
             
             uploaded_file = self.request.data['file']
             
-            self._validate_video_file(uploaded_file.name, uploaded_file.size)
+            validate_video_file(uploaded_file.name, uploaded_file.size)
             
             logger.info(f"Uploading video: {uploaded_file.name}, size: {uploaded_file.size} bytes")
             
-            video = serializer.save(user=self.request.user, status='uploading')
+            # Hash computed while the upload streamed in (see api.upload_handlers)
+            content_hash = getattr(uploaded_file, 'content_hash', None)
+            if not content_hash:
+                from video_processor.artifacts import file_sha256
+                content_hash = file_sha256(uploaded_file)
+            
+            video = serializer.save(user=self.request.user, status='uploading', content_hash=content_hash)
             logger.info(f"Video created with ID: {video.id}, file path: {video.file.path}")
             
-            # Trigger background processing
-            # TODO: Move to Celery task for production
+            # Queue background processing (run by `manage.py run_workers`)
             from video_processor.pipeline import process_video_async
             process_video_async(video.id)
             
@@ -242,30 +103,16 @@ class VideoViewSet(viewsets.ModelViewSet):
         if not self._is_youtube_url(youtube_url):
             return Response({'error': 'Only YouTube links are supported'}, status=status.HTTP_400_BAD_REQUEST)
 
-        task_id = str(uuid.uuid4())
-        with YOUTUBE_DOWNLOAD_LOCK:
-            YOUTUBE_DOWNLOAD_TASKS[task_id] = {
-                'task_id': task_id,
-                'status': 'queued',
-                'message': 'Queued for download...',
-                'progress': 0,
-                'video_id': None,
-                'title': custom_title or '',
-                'error': None,
-                'user_id': request.user.id,
-                'created_at': datetime.now().isoformat(),
-            }
-
-        thread = threading.Thread(
-            target=self._run_youtube_download_task,
-            args=(task_id, youtube_url, custom_title, request.user.id),
-            daemon=True,
+        from video_processor.jobs import enqueue
+        job = enqueue(
+            'youtube_download',
+            user=request.user,
+            payload={'youtube_url': youtube_url, 'title': custom_title},
         )
-        thread.start()
 
         return Response(
             {
-                'task_id': task_id,
+                'task_id': str(job.id),
                 'status': 'queued',
                 'message': 'Queued for download...',
                 'progress': 0,
@@ -280,16 +127,40 @@ class VideoViewSet(viewsets.ModelViewSet):
         if not task_id:
             return Response({'error': 'task_id is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        with YOUTUBE_DOWNLOAD_LOCK:
-            task = YOUTUBE_DOWNLOAD_TASKS.get(task_id)
+        job = ProcessingJob.objects.filter(
+            id=int(task_id) if task_id.isdigit() else None,
+            kind='youtube_download',
+            user=request.user,
+        ).select_related('video').first()
 
-        if not task:
+        if not job:
             return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        if task.get('user_id') != request.user.id:
-            return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._youtube_task_state(job))
 
-        return Response(task)
+    def _youtube_task_state(self, job):
+        """Shape a download job like the task dict the upload page polls"""
+        if job.status == 'failed':
+            task_status, message = 'failed', job.last_error or 'Download failed'
+        elif job.status == 'succeeded':
+            task_status, message = 'processing', job.message or 'Uploaded. Processing video...'
+        elif job.status == 'running':
+            task_status, message = job.phase or 'downloading', job.message or 'Downloading from YouTube...'
+        else:
+            task_status = 'queued'
+            message = 'Retrying download...' if job.attempts else 'Queued for download...'
+
+        return {
+            'task_id': str(job.id),
+            'status': task_status,
+            'message': message,
+            'progress': 0 if task_status in ('queued', 'failed') else job.progress,
+            'video_id': job.video_id,
+            'title': job.video.title if job.video else job.payload.get('title', ''),
+            'error': job.last_error if job.status == 'failed' else None,
+            'user_id': job.user_id,
+            'created_at': job.created_at.isoformat(),
+        }
     
     @action(detail=False, methods=['get'])
     def by_date(self, request):
@@ -358,6 +229,48 @@ class VideoViewSet(viewsets.ModelViewSet):
         
         return Response(result)
     
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Semantic search across all of the user's completed videos (?q=, &limit=, &offset=)"""
+        query = (request.query_params.get('q') or '').strip()
+        if not query:
+            return Response(
+                {'error': 'q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+            offset = max(0, int(request.query_params.get('offset', 0)))
+        except ValueError:
+            return Response(
+                {'error': 'limit and offset must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        max_results = getattr(settings, 'LIBRARY_SEARCH_MAX_RESULTS', 200)
+        limit = min(limit, max(0, max_results - offset))
+        if not limit:
+            return Response({'query': query, 'offset': offset, 'next_offset': None, 'results': []})
+        
+        from video_processor.query import search_library
+        try:
+            results = search_library(request.user, query, limit=limit, offset=offset)
+        except Exception as e:
+            logger.error(f"Library search failed: {e}")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        next_offset = offset + limit if len(results) == limit and offset + limit < max_results else None
+        return Response({
+            'query': query,
+            'offset': offset,
+            'next_offset': next_offset,
+            'results': results,
+        })
+    
     @action(detail=False, methods=['get'])
     def daily_stats(self, request):
         """Get daily conversion statistics"""
@@ -436,11 +349,12 @@ class VideoViewSet(viewsets.ModelViewSet):
                 except Exception as e:
                     logger.warning(f"Could not delete video file: {e}")
             
-            # Delete associated PDF if exists
+            # Delete associated PDF if exists (files shared with duplicate uploads are kept)
             try:
                 if hasattr(video, 'pdf') and video.pdf:
+                    from video_processor.artifacts import shared_pdf_file
                     pdf_file_path = video.pdf.file.path
-                    if os.path.exists(pdf_file_path):
+                    if os.path.exists(pdf_file_path) and not shared_pdf_file(video.pdf):
                         os.remove(pdf_file_path)
                         logger.info(f"Deleted PDF file: {pdf_file_path}")
                     video.pdf.delete()
@@ -466,13 +380,18 @@ class VideoViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def status(self, request, pk=None):
-        """Get processing status of a video"""
+        """Get processing status of a video, with per-stage timings"""
+        from video_processor.timing import latest_timings, timing_record
+        
         video = self.get_object()
         return Response({
             'id': video.id,
             'status': video.status,
             'processing_stage': video.processing_stage,
             'error_message': video.error_message,
+            'duration_seconds': video.duration_seconds,
+            # Latest run of each pipeline stage (an unfinished one is in flight)
+            'stage_timings': [timing_record(timing) for timing in latest_timings(video)],
         })
     
     @action(detail=True, methods=['post'])
@@ -493,10 +412,18 @@ class VideoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Optional retrieval mode: vector, hybrid or lexical (lexical skips the embedding call)
+        from video_processor.query import query_video, VideoNotIndexed, SEARCH_MODES
+        mode = request.data.get('mode') or None
+        if mode and mode not in SEARCH_MODES:
+            return Response(
+                {'error': f"mode must be one of: {', '.join(SEARCH_MODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         # Query the video
-        from video_processor.query import query_video
         try:
-            result = query_video(video.id, question)
+            result = query_video(video.id, question, mode=mode)
             
             # Save query to database
             user = request.user
@@ -514,20 +441,135 @@ class VideoViewSet(viewsets.ModelViewSet):
             profile.total_queries += 1
             profile.save()
             
-            return Response({
+            response = Response({
                 **QuerySerializer(query_obj).data,
                 'youtube_url': video.youtube_url or '',
             })
+            response['X-Answer-Cache'] = result.get('cache_status', 'miss').upper()
+            return response
         
+        except VideoNotIndexed as e:
+            logger.warning(f"Query on unindexed video {video.id}: {e}")
+            return Response(
+                {'error': 'Video is not indexed for search. Reprocess it to enable questions.'},
+                status=status.HTTP_409_CONFLICT
+            )
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=True, methods=['post'])
+    def query_batch(self, request, pk=None):
+        """Ask many questions about a video with one embedding call and one scoring pass"""
+        video = self.get_object()
+        
+        if video.status != 'completed':
+            return Response(
+                {'error': 'Video processing not complete'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        questions = request.data.get('questions')
+        if not isinstance(questions, list) or not questions:
+            return Response(
+                {'error': 'questions must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        questions = [str(q).strip() for q in questions]
+        if not all(questions):
+            return Response(
+                {'error': 'Questions must not be empty'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        max_questions = getattr(settings, 'QUERY_BATCH_MAX_QUESTIONS', 100)
+        if len(questions) > max_questions:
+            return Response(
+                {'error': f'At most {max_questions} questions per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        from video_processor.query import query_video_batch, VideoNotIndexed, SEARCH_MODES
+        mode = request.data.get('mode') or None
+        if mode and mode not in SEARCH_MODES:
+            return Response(
+                {'error': f"mode must be one of: {', '.join(SEARCH_MODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            results = query_video_batch(video.id, questions, mode=mode)
+            
+            # Save all queries in one INSERT
+            user = request.user
+            query_objs = Query.objects.bulk_create([
+                Query(
+                    user=user,
+                    video=video,
+                    question=question,
+                    answer=result['answer'],
+                    timestamp_start=result.get('timestamp_start'),
+                    timestamp_end=result.get('timestamp_end'),
+                )
+                for question, result in zip(questions, results)
+            ])
+            
+            # Update user profile stats with a single UPDATE
+            UserProfile.objects.get_or_create(user=user)
+            UserProfile.objects.filter(user=user).update(total_queries=F('total_queries') + len(query_objs))
+            
+            return Response({
+                'results': [
+                    {**QuerySerializer(query_obj).data, 'cache_status': result.get('cache_status', 'miss')}
+                    for query_obj, result in zip(query_objs, results)
+                ],
+                'youtube_url': video.youtube_url or '',
+            })
+        
+        except VideoNotIndexed as e:
+            logger.warning(f"Batch query on unindexed video {video.id}: {e}")
+            return Response(
+                {'error': 'Video is not indexed for search. Reprocess it to enable questions.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """Continue a failed or interrupted video from its last checkpoint"""
+        video = self.get_object()
+        
+        if video.status == 'completed':
+            return Response(
+                {'error': 'Video processing is already complete'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        from video_processor.pipeline import resume_video, checkpoint_progress
+        job, created = resume_video(video.id)
+        if created:
+            video.error_message = None
+            video.save(update_fields=['error_message'])
+        
+        return Response(
+            {
+                'job_id': job.id,
+                'status': job.status,
+                'message': 'Resuming from last checkpoint' if created else 'Video is already queued for processing',
+                'checkpoint': checkpoint_progress(video),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+    
     @action(detail=True, methods=['get'])
     def pdf(self, request, pk=None):
-        """Get or generate PDF for a video"""
+        """Get a video's PDF, or queue its (re)generation and return 202 with the job"""
         video = self.get_object()
         
         if video.status != 'completed':
@@ -537,6 +579,9 @@ class VideoViewSet(viewsets.ModelViewSet):
             )
         
         refresh = str(request.query_params.get('refresh', '')).lower() in ['1', 'true', 'yes']
+        # refresh rebuilds the PDF from cached LLM answers; regenerate also asks the LLM again
+        regenerate = str(request.query_params.get('regenerate', '')).lower() in ['1', 'true', 'yes']
+        refresh = refresh or regenerate
 
         # Check if PDF exists
         try:
@@ -546,16 +591,53 @@ class VideoViewSet(viewsets.ModelViewSet):
         except PDF.DoesNotExist:
             pass
 
-        # Generate or regenerate PDF
-        from video_processor.pdf_gen import generate_pdf
-        try:
-            pdf = generate_pdf(video.id)
-            return Response(PDFSerializer(pdf).data)
-        except Exception as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        # Generate or regenerate in the background; repeated requests join the running job
+        from video_processor.pdf_gen import generate_pdf_async
+        job, created = generate_pdf_async(video.id, regenerate=regenerate)
+        # A joined job that was already running without regenerate reuses cached answers
+        regenerate_ignored = regenerate and not job.payload.get('regenerate')
+        if created:
+            message = 'PDF generation queued'
+        elif regenerate_ignored:
+            message = 'PDF generation already in progress from cached answers; request regenerate again once it finishes'
+        else:
+            message = 'PDF generation already in progress'
+        return Response(
+            {
+                'job_id': job.id,
+                'status': job.status,
+                'coalesced': not created,
+                'regenerate_ignored': regenerate_ignored,
+                'message': message,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @action(detail=True, methods=['get'])
+    def pdf_status(self, request, pk=None):
+        """Progress of a video's PDF generation job (latest one unless job_id is given)"""
+        video = self.get_object()
+        
+        jobs = ProcessingJob.objects.filter(video=video, kind='generate_pdf')
+        job_id = (request.query_params.get('job_id') or '').strip()
+        if job_id:
+            jobs = jobs.filter(id=int(job_id) if job_id.isdigit() else None)
+        job = jobs.order_by('-created_at').first()
+        
+        if not job:
+            return Response({'error': 'No PDF generation job found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        pdf = PDF.objects.filter(video=video).first() if job.status == 'succeeded' else None
+        return Response({
+            'job_id': job.id,
+            'status': job.status,
+            'phase': job.phase,
+            'progress': job.progress,
+            'message': job.message,
+            'attempts': job.attempts,
+            'error': job.last_error if job.status == 'failed' else None,
+            'pdf': PDFSerializer(pdf).data if pdf else None,
+        })
 
 
     @action(detail=True, methods=['post'])
@@ -571,6 +653,7 @@ class VideoViewSet(viewsets.ModelViewSet):
 
         message = request.data.get('message')
         history = request.data.get('history', [])
+        regenerate = str(request.data.get('regenerate', '')).lower() in ['1', 'true', 'yes']
 
         if not message:
             return Response(
@@ -580,17 +663,9 @@ class VideoViewSet(viewsets.ModelViewSet):
 
         try:
             # Load transcript for this video
-            from pathlib import Path as PPath
             import json as json_mod
-            SCRIPTS_DIR = PPath(settings.BASE_DIR).parent / 'Video-Knowledge-Extraction-Semantic-Search-System-RAG-based-'
-
-            import sys
-            sys.path.insert(0, str(SCRIPTS_DIR))
-            import pipelIne_api
-
-            video_filename = PPath(video.file.name).name
-            base_name = pipelIne_api.clean_filename(video_filename.rsplit('.', 1)[0])
-            json_path = SCRIPTS_DIR / 'jsons' / f'0_{base_name}.mp3.json'
+            from video_processor.artifacts import artifact_key, transcript_path
+            json_path = transcript_path(artifact_key(video))
 
             transcript_text = ""
             if json_path.exists():
@@ -627,19 +702,20 @@ class VideoViewSet(viewsets.ModelViewSet):
             # Add current message
             groq_messages.append({"role": "user", "content": message})
 
-            # Call Groq chat completions
+            # Call Groq chat completions (a repeated conversation is answered from the LLM cache)
             from groq import Groq
+            from video_processor.llm_cache import chat_completion
             groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
-            completion = groq_client.chat.completions.create(
+            reply = chat_completion(
+                groq_client,
                 model="llama-3.3-70b-versatile",
                 messages=groq_messages,
                 temperature=0.7,
                 max_tokens=1024,
+                use_cache=not regenerate,
             )
 
-            reply = completion.choices[0].message.content
-
             return Response({
                 'reply': reply,
                 'model': 'llama-3.3-70b-versatile',
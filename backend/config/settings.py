@@ -158,6 +158,7 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ['X-Answer-Cache']
 
 # REST Framework Settings
 REST_FRAMEWORK = {
@@ -180,6 +181,104 @@ REST_FRAMEWORK = {
 # File Upload Settings
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
+# Default handlers plus a SHA-256 of the content computed while the upload is streamed (deduplication)
+FILE_UPLOAD_HANDLERS = [
+    'api.upload_handlers.HashingMemoryFileUploadHandler',
+    'api.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# Cache framework (answer cache); switch to FileBasedCache to share entries between worker processes
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'video-rag'),
+    }
+}
+
+# Retrieval Settings
+# Appends are written as new segments/parts; compact in the background once there are more than this many
+VECTOR_STORE_MAX_SEGMENTS = int(os.getenv('VECTOR_STORE_MAX_SEGMENTS', '8'))
+ANN_INDEX_MAX_PARTS = int(os.getenv('ANN_INDEX_MAX_PARTS', '16'))
+
+# Library-wide IVF index: number of coarse lists (0 = 4 * sqrt(N)) and lists scanned per query
+ANN_INDEX_NLIST = int(os.getenv('ANN_INDEX_NLIST', '0'))
+ANN_INDEX_NPROBE = int(os.getenv('ANN_INDEX_NPROBE', '8'))
+ANN_INDEX_RETRAIN_FACTOR = int(os.getenv('ANN_INDEX_RETRAIN_FACTOR', '4'))
+
+# Retrieval mode: 'vector', 'hybrid' (vector + BM25) or 'lexical' (BM25 only, no Ollama call)
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'vector')
+SEARCH_LEXICAL_WEIGHT = float(os.getenv('SEARCH_LEXICAL_WEIGHT', '0.3'))
+
+# Refine the top hits' timestamps through rag_query's Ollama step. Off by default: answers point at
+# whole chunks, because refining re-embeds the question (bypassing the question cache) and adds calls
+SEARCH_REFINE_TIMESTAMPS = os.getenv('SEARCH_REFINE_TIMESTAMPS', 'false').lower() in ('1', 'true', 'yes')
+
+# In-process LRU cache of question embeddings (skips the Ollama call for repeated questions)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '1024'))
+QUERY_EMBEDDING_CACHE_TTL = int(os.getenv('QUERY_EMBEDDING_CACHE_TTL', '3600'))
+
+# Formatted answers per (video, index version, question, top_k), stored in the default cache
+QUERY_ANSWER_CACHE_TTL = int(os.getenv('QUERY_ANSWER_CACHE_TTL', '86400'))
+
+# Groq chat completions cached on disk by (model, messages, temperature, max_tokens);
+# least recently used answers are evicted past LLM_CACHE_MAX_MB
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR', '')
+LLM_CACHE_MAX_MB = int(os.getenv('LLM_CACHE_MAX_MB', '256'))
+
+# Upper bound on questions accepted by one query_batch request
+QUERY_BATCH_MAX_QUESTIONS = int(os.getenv('QUERY_BATCH_MAX_QUESTIONS', '100'))
+
+# Deepest rank (offset + limit) reachable through the library search endpoint
+LIBRARY_SEARCH_MAX_RESULTS = int(os.getenv('LIBRARY_SEARCH_MAX_RESULTS', '200'))
+
+# Users with at most this many chunk rows are searched exactly instead of through the IVF index
+LIBRARY_SEARCH_EXACT_MAX_ROWS = int(os.getenv('LIBRARY_SEARCH_EXACT_MAX_ROWS', '50000'))
+
+# Processing Job Queue (run with `python manage.py run_workers`)
+JOB_QUEUE_WORKERS = int(os.getenv('JOB_QUEUE_WORKERS', '2'))
+# Workers started inside the web process on first enqueue (0 = rely on run_workers)
+JOB_QUEUE_EMBEDDED_WORKERS = int(os.getenv('JOB_QUEUE_EMBEDDED_WORKERS', '0'))
+JOB_QUEUE_POLL_SECONDS = float(os.getenv('JOB_QUEUE_POLL_SECONDS', '2'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BACKOFF_SECONDS = int(os.getenv('JOB_RETRY_BACKOFF_SECONDS', '30'))
+# A running job whose worker has not heartbeated for this long is requeued
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '300'))
+# Per-process concurrency of CPU-bound (ffmpeg) and network-bound (Groq, Ollama, yt-dlp) stages
+JOB_STAGE_CONCURRENCY = {
+    'ffmpeg': int(os.getenv('JOB_FFMPEG_CONCURRENCY', '1')),
+    'network': int(os.getenv('JOB_NETWORK_CONCURRENCY', '4')),
+}
+
+# Audio extraction: mono speech-quality segments cut straight from the video
+AUDIO_SAMPLE_RATE = int(os.getenv('AUDIO_SAMPLE_RATE', '16000'))
+AUDIO_BITRATE = os.getenv('AUDIO_BITRATE', '32k')
+AUDIO_SEGMENT_SECONDS = int(os.getenv('AUDIO_SEGMENT_SECONDS', '600'))
+# Also write the full-length track to audios/ in the same ffmpeg pass
+AUDIO_KEEP_FULL_TRACK = os.getenv('AUDIO_KEEP_FULL_TRACK', 'false').lower() in ('1', 'true', 'yes')
+# Voice activity detection: drop silence longer than AUDIO_VAD_MIN_SILENCE_SECONDS (below
+# AUDIO_VAD_NOISE_DB) before transcription and cut segments at pauses. Off until the
+# silencedetect / aselect commands have been validated against the deployed ffmpeg
+AUDIO_VAD_ENABLED = os.getenv('AUDIO_VAD_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+AUDIO_VAD_NOISE_DB = int(os.getenv('AUDIO_VAD_NOISE_DB', '-35'))
+AUDIO_VAD_MIN_SILENCE_SECONDS = float(os.getenv('AUDIO_VAD_MIN_SILENCE_SECONDS', '1.0'))
+AUDIO_VAD_PADDING_SECONDS = float(os.getenv('AUDIO_VAD_PADDING_SECONDS', '0.25'))
+
+# Transcription: concurrent Whisper requests per video, and per-segment retries with backoff
+TRANSCRIPTION_WORKERS = int(os.getenv('TRANSCRIPTION_WORKERS', '4'))
+TRANSCRIPTION_SEGMENT_RETRIES = int(os.getenv('TRANSCRIPTION_SEGMENT_RETRIES', '3'))
+TRANSCRIPTION_RETRY_BACKOFF_SECONDS = float(os.getenv('TRANSCRIPTION_RETRY_BACKOFF_SECONDS', '5'))
+
+# Embedding: chunk texts per Ollama request, concurrent requests per video, per-batch retries
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+EMBEDDING_CONCURRENCY = int(os.getenv('EMBEDDING_CONCURRENCY', '3'))
+EMBEDDING_REQUEST_TIMEOUT = int(os.getenv('EMBEDDING_REQUEST_TIMEOUT', '120'))
+EMBEDDING_BATCH_RETRIES = int(os.getenv('EMBEDDING_BATCH_RETRIES', '3'))
+EMBEDDING_RETRY_BACKOFF_SECONDS = float(os.getenv('EMBEDDING_RETRY_BACKOFF_SECONDS', '2'))
+# Transcribed segments waiting to be embedded while the rest of the video transcribes
+EMBEDDING_STREAM_QUEUE_SIZE = int(os.getenv('EMBEDDING_STREAM_QUEUE_SIZE', '4'))
+# Embedded chunks buffered per shard append, so long videos add few segments (and no compactions) mid-ingest
+EMBEDDING_STREAM_FLUSH_CHUNKS = int(os.getenv('EMBEDDING_STREAM_FLUSH_CHUNKS', '512'))
 
 # Logging Configuration
 LOGGING = {
@@ -0,0 +1,441 @@
+"""
+Approximate Nearest-Neighbour Index
+Library-wide IVF (inverted file) index with a k-means coarse quantizer, pure NumPy
+"""
+import json
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+import logging
+
+from .files import atomic_write
+from .vector_store import LOCK_FILE, OPEN_ATTEMPTS, STORE_DIR, file_lock, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = STORE_DIR / '_ann'
+MANIFEST_FILE = 'manifest.json'
+PART_ARRAYS = ('vectors', 'list_ids', 'shard_ids', 'rows')
+
+
+def _kmeans(vectors, n_clusters, iterations=12, seed=0):
+    """Spherical k-means (cosine) seeded from random points; returns unit-norm centroids"""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    n_clusters = max(1, min(n_clusters, n))
+    centroids = np.array(vectors[rng.choice(n, n_clusters, replace=False)], dtype=np.float32)
+
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters with random points so no list stays dead
+            sums[empty] = vectors[rng.integers(n, size=int(empty.sum()))]
+        centroids = normalize_rows(sums)
+
+    return centroids
+
+
+class IndexPart:
+    """One append-only batch of index entries (the compacted base or a later insertion)"""
+
+    def __init__(self, vectors, list_ids, shard_ids, rows, name=None):
+        self.vectors = vectors
+        self.list_ids = list_ids
+        self.shard_ids = shard_ids
+        self.rows = rows
+        self.name = name or f"part-{uuid.uuid4().hex}"
+        self._lists = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def inverted_lists(self, nlist):
+        """Entry ids grouped by list as (permutation, offsets), built once per part"""
+        if self._lists is None:
+            order = np.argsort(self.list_ids, kind='stable')
+            offsets = np.searchsorted(self.list_ids[order], np.arange(nlist + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def save(self, directory):
+        for array_name in PART_ARRAYS:
+            np.save(Path(directory) / f"{self.name}.{array_name}.npy", np.asarray(getattr(self, array_name)))
+
+    @classmethod
+    def load(cls, directory, name):
+        arrays = {
+            array_name: np.load(Path(directory) / f"{name}.{array_name}.npy",
+                                mmap_mode='r' if array_name == 'vectors' else None)
+            for array_name in PART_ARRAYS
+        }
+        return cls(name=name, **arrays)
+
+
+class IVFIndex:
+    """
+    Inverted-file index over unit-normalized chunk vectors from every shard.
+
+    Each entry is (shard key, row in that shard). Searching ranks the coarse
+    centroids, scans only the `nprobe` closest lists and returns the exact
+    cosine top-k among those candidates. More lists probed = better recall,
+    higher latency.
+
+    Entries live in append-only parts. Inserting a shard adds one part and
+    tombstones the shard's previous generation, so persisting an insertion
+    costs O(new vectors). Compaction folds all parts into one and drops dead
+    entries.
+    """
+
+    def __init__(self, dim=0, nlist=None):
+        self.dim = dim
+        self.nlist = nlist
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        self.parts = []
+        # shard_id -> shard key; a re-indexed shard gets a new id and the old one is marked dead
+        self.shard_keys = []
+        self.dead_shard_ids = set()
+        self.trained_count = 0
+        self.version = None
+
+    def __len__(self):
+        dead = np.fromiter(self.dead_shard_ids, dtype=np.int32)
+        return int(sum(np.count_nonzero(~np.isin(part.shard_ids, dead)) for part in self.parts))
+
+    @property
+    def is_trained(self):
+        return len(self.centroids) > 0
+
+    @property
+    def live_shard_keys(self):
+        return sorted({key for shard_id, key in enumerate(self.shard_keys) if shard_id not in self.dead_shard_ids})
+
+    def _target_nlist(self, n):
+        if self.nlist:
+            return self.nlist
+        configured = getattr(settings, 'ANN_INDEX_NLIST', 0)
+        if configured:
+            return configured
+        return int(max(1, min(4096, 4 * np.sqrt(n))))
+
+    def _assign(self, vectors):
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _live_entries(self):
+        """All live entries of every part, concatenated"""
+        dead = np.fromiter(self.dead_shard_ids, dtype=np.int32)
+        vectors, shard_ids, rows = [], [], []
+        for part in self.parts:
+            keep = ~np.isin(part.shard_ids, dead)
+            vectors.append(np.asarray(part.vectors)[keep])
+            shard_ids.append(part.shard_ids[keep])
+            rows.append(part.rows[keep])
+        if not vectors:
+            return np.zeros((0, self.dim), np.float32), np.zeros(0, np.int32), np.zeros(0, np.int32)
+        return np.vstack(vectors), np.concatenate(shard_ids), np.concatenate(rows)
+
+    def needs_retrain(self):
+        retrain_factor = getattr(settings, 'ANN_INDEX_RETRAIN_FACTOR', 4)
+        return not self.is_trained or len(self) > retrain_factor * max(1, self.trained_count)
+
+    def compact(self, retrain=False, sample_size=50000):
+        """
+        Fold every part into a single part without dead entries, retraining the
+        coarse quantizer when requested or when the index has outgrown it.
+        """
+        vectors, shard_ids, rows = self._live_entries()
+        retrain = retrain or self.needs_retrain()
+
+        if retrain and len(vectors):
+            if len(vectors) > sample_size:
+                sample = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+            else:
+                sample = vectors
+            self.centroids = _kmeans(sample, self._target_nlist(len(vectors)))
+            self.trained_count = len(vectors)
+            logger.info(f"Trained IVF index: {len(self.centroids)} lists over {len(vectors)} vectors")
+
+        # Drop ids of dead shards by renumbering the survivors
+        live_ids = np.unique(shard_ids)
+        self.shard_keys = [self.shard_keys[int(old)] for old in live_ids]
+        self.dead_shard_ids = set()
+        shard_ids = np.searchsorted(live_ids, shard_ids).astype(np.int32)
+
+        if len(vectors):
+            self.parts = [IndexPart(vectors, self._assign(vectors), shard_ids, rows)]
+        else:
+            self.parts = []
+
+    def _reset(self):
+        self.dim = 0
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.parts = []
+        self.shard_keys = []
+        self.dead_shard_ids = set()
+        self.trained_count = 0
+
+    def remove_shard(self, key):
+        for shard_id, shard_key in enumerate(self.shard_keys):
+            if shard_key == key:
+                self.dead_shard_ids.add(shard_id)
+
+    def add_shard(self, key, vectors):
+        """
+        Insert (or replace) all vectors of one shard as a new part, assigned to the
+        existing lists. Returns the new part, or None if the index had to be
+        (re)trained and was compacted instead.
+        """
+        vectors = normalize_rows(vectors)
+        if not len(vectors):
+            return None
+        if self.dim and vectors.shape[1] != self.dim:
+            if len(self):
+                raise ValueError(
+                    f"Shard '{key}' has {vectors.shape[1]}-dim vectors but the index holds "
+                    f"{self.dim}-dim vectors; rebuild the index after changing embedding models"
+                )
+            # Nothing live to keep: start over at the new dimension
+            self._reset()
+        if not self.dim:
+            self.dim = vectors.shape[1]
+            self.centroids = np.zeros((0, self.dim), dtype=np.float32)
+
+        # Everything that can fail happens before the index is touched
+        list_ids = self._assign(vectors) if self.is_trained else np.zeros(len(vectors), np.int32)
+
+        self.remove_shard(key)
+        shard_id = len(self.shard_keys)
+        self.shard_keys.append(key)
+
+        part = IndexPart(
+            vectors,
+            list_ids,
+            np.full(len(vectors), shard_id, dtype=np.int32),
+            np.arange(len(vectors), dtype=np.int32),
+        )
+        self.parts.append(part)
+
+        if self.needs_retrain():
+            self.compact(retrain=True)
+            return None
+        return part
+
+    def search(self, query_vector, top_k=10, nprobe=None, shard_filter=None):
+        """
+        Approximate top-k as a list of (shard_key, row, score), best first.
+        `shard_filter` optionally restricts hits to a set of shard keys.
+        """
+        if not self.parts or not self.is_trained:
+            return []
+
+        nprobe = nprobe or getattr(settings, 'ANN_INDEX_NPROBE', 8)
+        query = normalize_rows(query_vector)[0]
+
+        centroid_scores = self.centroids @ query
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        allowed = [i for i in range(len(self.shard_keys)) if i not in self.dead_shard_ids]
+        if shard_filter is not None:
+            allowed = [i for i in allowed if self.shard_keys[i] in shard_filter]
+        allowed = np.array(allowed, dtype=np.int32)
+
+        hit_scores, hit_shards, hit_rows = [], [], []
+        for part in self.parts:
+            order, offsets = part.inverted_lists(len(self.centroids))
+            candidates = np.concatenate([order[offsets[l]:offsets[l + 1]] for l in probe])
+            candidates = candidates[np.isin(part.shard_ids[candidates], allowed)]
+            if not len(candidates):
+                continue
+            hit_scores.append(np.asarray(part.vectors)[candidates] @ query)
+            hit_shards.append(part.shard_ids[candidates])
+            hit_rows.append(part.rows[candidates])
+
+        if not hit_scores:
+            return []
+        scores = np.concatenate(hit_scores)
+        shard_ids = np.concatenate(hit_shards)
+        rows = np.concatenate(hit_rows)
+
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+
+        return [(self.shard_keys[shard_ids[i]], int(rows[i]), float(scores[i])) for i in best]
+
+    def _commit(self, path):
+        """Atomically publish the manifest (write-temp + rename)"""
+        self.version = uuid.uuid4().hex
+        manifest = {
+            'dim': self.dim,
+            'nlist': self.nlist,
+            'shard_keys': self.shard_keys,
+            'dead_shard_ids': sorted(self.dead_shard_ids),
+            'parts': [part.name for part in self.parts],
+            'trained_count': self.trained_count,
+            'version': self.version,
+        }
+        with atomic_write(path / MANIFEST_FILE, fsync=True) as f:
+            json.dump(manifest, f)
+
+    def append(self, part, path=None):
+        """Persist one new part plus tombstones: O(part) I/O, the rest of the index is untouched"""
+        path = Path(path or INDEX_DIR)
+        path.mkdir(parents=True, exist_ok=True)
+        part.save(path)
+        self._commit(path)
+
+    def save(self, path=None):
+        """Persist the whole index (after compaction) and remove files of retired parts"""
+        path = Path(path or INDEX_DIR)
+        path.mkdir(parents=True, exist_ok=True)
+        with atomic_write(path / 'centroids.npy', 'wb') as f:
+            np.save(f, self.centroids)
+        for part in self.parts:
+            if not (path / f"{part.name}.rows.npy").exists():
+                part.save(path)
+        self._commit(path)
+
+        referenced = {MANIFEST_FILE, 'centroids.npy'}
+        referenced.update(f"{part.name}.{array_name}.npy" for part in self.parts for array_name in PART_ARRAYS)
+        for file_path in path.iterdir():
+            if file_path.name not in referenced and not file_path.name.startswith('.'):
+                file_path.unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, path=None):
+        path = Path(path or INDEX_DIR)
+        with open(path / MANIFEST_FILE, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        index = cls(dim=manifest['dim'], nlist=manifest.get('nlist'))
+        index.centroids = np.load(path / 'centroids.npy')
+        index.parts = [IndexPart.load(path, name) for name in manifest.get('parts', [])]
+        index.shard_keys = manifest['shard_keys']
+        index.dead_shard_ids = set(manifest.get('dead_shard_ids', []))
+        index.trained_count = manifest['trained_count']
+        index.version = manifest.get('version')
+        return index
+
+
+_library_index = None
+_library_index_mtime = None
+_library_index_lock = threading.RLock()
+_compaction_pending = False
+
+
+def get_library_index():
+    """
+    Process-wide index, reloaded when another process has saved a newer one. A load
+    that loses the race with a save retiring its parts is retried on the new manifest.
+    """
+    global _library_index, _library_index_mtime
+
+    manifest_path = INDEX_DIR / MANIFEST_FILE
+    with _library_index_lock:
+        for attempt in range(OPEN_ATTEMPTS):
+            current_mtime = manifest_path.stat().st_mtime_ns if manifest_path.exists() else None
+            if _library_index is not None and not (current_mtime and current_mtime != _library_index_mtime):
+                break
+            try:
+                _library_index = IVFIndex.load() if current_mtime else IVFIndex()
+            except FileNotFoundError:
+                if attempt == OPEN_ATTEMPTS - 1:
+                    raise
+                logger.info("Library index parts were retired while loading it, retrying")
+                continue
+            _library_index_mtime = current_mtime
+            break
+        return _library_index
+
+
+def _mark_saved():
+    global _library_index_mtime
+    _library_index_mtime = (INDEX_DIR / MANIFEST_FILE).stat().st_mtime_ns
+
+
+def index_shard(key, vectors):
+    """Insert one video's vectors into the library index and persist it (called at ingest)"""
+    # The flock serializes writers in other processes (workers, compact_vector_store);
+    # get_library_index() then reloads whatever they committed before we modify it
+    with _library_index_lock, file_lock(INDEX_DIR / LOCK_FILE):
+        index = get_library_index()
+        part = index.add_shard(key, vectors)
+        if part is None:
+            index.save()
+        else:
+            index.append(part)
+        _mark_saved()
+        part_count = len(index.parts)
+    logger.info(f"Library index updated with shard '{key}' ({part_count} parts)")
+
+    if part_count > getattr(settings, 'ANN_INDEX_MAX_PARTS', 16):
+        schedule_compaction()
+
+
+def compact_library_index(retrain=False):
+    """Fold the library index's parts into one (drops tombstoned entries)"""
+    with _library_index_lock, file_lock(INDEX_DIR / LOCK_FILE):
+        index = get_library_index()
+        index.compact(retrain=retrain)
+        index.save()
+        _mark_saved()
+    logger.info(f"Compacted library index: {len(index)} entries")
+    return index
+
+
+def schedule_compaction():
+    """Compact the library index on a background thread (at most one pending run)"""
+    global _compaction_pending
+
+    with _library_index_lock:
+        if _compaction_pending:
+            return
+        _compaction_pending = True
+
+    def _run():
+        global _compaction_pending
+        try:
+            compact_library_index()
+        except Exception as compaction_error:
+            logger.warning(f"Library index compaction failed: {compaction_error}")
+        finally:
+            with _library_index_lock:
+                _compaction_pending = False
+
+    threading.Thread(target=_run, daemon=True).start()
+
+
+def rebuild_library_index(store, nlist=None):
+    """Build a fresh index over every shard in the vector store"""
+    global _library_index
+
+    index = IVFIndex(nlist=nlist)
+    for key in store.shard_keys():
+        shard = store.open_shard(key)
+        if shard is None or not len(shard):
+            continue
+        if not index.dim:
+            index.dim = shard.dim
+        shard_id = len(index.shard_keys)
+        index.shard_keys.append(key)
+        index.parts.append(IndexPart(
+            normalize_rows(shard.vectors),
+            np.zeros(len(shard), np.int32),
+            np.full(len(shard), shard_id, dtype=np.int32),
+            np.arange(len(shard), dtype=np.int32),
+        ))
+
+    index.compact(retrain=True)
+
+    with _library_index_lock, file_lock(INDEX_DIR / LOCK_FILE):
+        index.save()
+        _library_index = index
+        _mark_saved()
+    return index
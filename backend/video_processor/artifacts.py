@@ -0,0 +1,114 @@
+"""
+Video Artifacts
+Content-addressed keys for a video's derived files (transcript, vectors, PDF)
+"""
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+import logging
+
+from .files import SCRIPTS_DIR, add_scripts_to_path
+
+logger = logging.getLogger(__name__)
+
+add_scripts_to_path()
+
+LOCK_DIR = SCRIPTS_DIR / 'locks'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_or_path):
+    """SHA-256 hex digest of a path or an open (Django) file, read in 1 MB chunks"""
+    hasher = hashlib.sha256()
+    if isinstance(file_or_path, (str, Path)):
+        with open(file_or_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                hasher.update(block)
+    else:
+        file_or_path.seek(0)
+        for block in file_or_path.chunks(HASH_CHUNK_SIZE):
+            hasher.update(block)
+        file_or_path.seek(0)
+    return hasher.hexdigest()
+
+
+def artifact_key(video):
+    """
+    Name under which a video's transcript, vector shard and lexical index are stored:
+    the upload's content hash, so identical uploads share them. Videos uploaded
+    before hashing keep their cleaned-filename key.
+    """
+    if video.content_hash:
+        return video.content_hash
+
+    import pipelIne_api
+    video_filename = Path(video.file.name).name
+    return pipelIne_api.clean_filename(video_filename.rsplit('.', 1)[0])
+
+
+def transcript_path(key):
+    return SCRIPTS_DIR / 'jsons' / f"0_{key}.mp3.json"
+
+
+def audio_path(key):
+    return SCRIPTS_DIR / 'audios' / f"0_{key}.mp3"
+
+
+@contextmanager
+def artifact_lock(key):
+    """
+    Hold the lock for producing one key's audio segments, checkpoint, transcript and
+    shard. Jobs for identical uploads share all of those files, so a second job waits
+    here and then finds the first job's artifacts finished.
+    """
+    from .vector_store import file_lock
+
+    def waiting():
+        logger.info(f"Artifacts for '{key}' are being produced by another job, waiting for it")
+
+    with file_lock(LOCK_DIR / f"{key}.lock", on_wait=waiting):
+        yield
+
+
+def find_shared_pdf(video):
+    """
+    An existing PDF generated for identical content (another upload of the same file
+    by the same user), or None. PDFs carry the video title, so they are never shared
+    between users.
+    """
+    from api.models import PDF
+
+    if not video.content_hash:
+        return None
+    candidates = PDF.objects.filter(
+        video__content_hash=video.content_hash, video__user=video.user,
+    ).exclude(video=video).order_by('generated_at')
+    for pdf_obj in candidates:
+        if pdf_obj.file and pdf_obj.file.storage.exists(pdf_obj.file.name):
+            return pdf_obj
+    return None
+
+
+def link_pdf(video, source_pdf):
+    """Point a video's PDF record at an existing PDF file instead of generating a new one"""
+    from api.models import PDF, UserProfile
+
+    pdf_obj, _ = PDF.objects.update_or_create(
+        video=video,
+        defaults={'file': source_pdf.file.name, 'file_size_bytes': source_pdf.file_size_bytes},
+    )
+
+    profile, _ = UserProfile.objects.get_or_create(user=video.user)
+    profile.total_pdfs = PDF.objects.filter(video__user=video.user).count()
+    profile.save()
+
+    logger.info(f"Linked PDF {source_pdf.file.name} to video {video.id}")
+    return pdf_obj
+
+
+def shared_pdf_file(pdf_obj):
+    """True if another video's PDF record points at the same file (so it must not be deleted)"""
+    from api.models import PDF
+
+    return PDF.objects.filter(file=pdf_obj.file.name).exclude(id=pdf_obj.id).exists()
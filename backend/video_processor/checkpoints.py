@@ -0,0 +1,107 @@
+"""
+Pipeline Checkpoints
+Per-video record of completed stages and transcribed audio segments, so a failed
+or interrupted run resumes where it stopped instead of starting over
+"""
+import json
+import threading
+from pathlib import Path
+
+import logging
+
+from .files import SCRIPTS_DIR, atomic_write
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = SCRIPTS_DIR / 'checkpoints'
+
+
+class PipelineCheckpoint:
+    """
+    JSON checkpoint for one artifact key:
+
+        stages       completed stage names ('audio_extracted', 'transcribed', ...)
+        segments     extracted audio segments [{file, start, end, spans}] in order
+        transcripts  segment index -> {segments: [{start, end, text}], text}
+
+    Every record is persisted immediately with an atomic replace, and recording
+    is thread-safe (segments are transcribed concurrently).
+    """
+
+    def __init__(self, key, data=None, directory=None):
+        self.key = key
+        self.path = Path(directory or CHECKPOINT_DIR) / f"{key}.json"
+        self.data = data or {'stages': [], 'segments': [], 'transcripts': {}}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, key, directory=None):
+        checkpoint = cls(key, directory=directory)
+        try:
+            with open(checkpoint.path, encoding='utf-8') as f:
+                checkpoint.data = json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable checkpoint {checkpoint.path}: {e}")
+        return checkpoint
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump(self.data, f)
+
+    def has_stage(self, stage):
+        return stage in self.data['stages']
+
+    def mark_stage(self, stage):
+        with self._lock:
+            if stage not in self.data['stages']:
+                self.data['stages'].append(stage)
+                self._save()
+
+    def record_segments(self, segments):
+        """Remember the extracted segment files with their offsets and source spans (resets transcripts)"""
+        with self._lock:
+            self.data['segments'] = [
+                {
+                    'file': str(segment[0]),
+                    'start': float(segment[1]),
+                    'end': float(segment[2]),
+                    'spans': [list(span) for span in segment[3]] if len(segment) > 3 else None,
+                }
+                for segment in segments
+            ]
+            self.data['transcripts'] = {}
+            if 'audio_extracted' not in self.data['stages']:
+                self.data['stages'].append('audio_extracted')
+            self._save()
+
+    def segments(self):
+        """Recorded segments as (path, start, end, spans), or None unless every segment is still usable"""
+        segments = [(Path(s['file']), s['start'], s['end'], s.get('spans')) for s in self.data['segments']]
+        if not segments:
+            return None
+        for index, segment in enumerate(segments):
+            if not segment[0].exists() and self.transcript(index) is None:
+                return None
+        return segments
+
+    def transcript(self, index):
+        return self.data['transcripts'].get(str(index))
+
+    def record_transcript(self, index, transcript):
+        with self._lock:
+            self.data['transcripts'][str(index)] = transcript
+            self._save()
+
+    def progress(self):
+        """Summary for status responses"""
+        return {
+            'stages': list(self.data['stages']),
+            'segments_total': len(self.data['segments']),
+            'segments_transcribed': len(self.data['transcripts']),
+        }
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
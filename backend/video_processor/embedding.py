@@ -0,0 +1,193 @@
+"""
+Embedding Client
+Talks to the local Ollama embedding endpoint
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+import logging
+
+from .jobs import stage_slot
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_EMBED_URL = "http://localhost:11434/api/embed"
+EMBEDDING_MODEL = "bge-m3"
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide requests session, so batches reuse pooled keep-alive connections to Ollama"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = max(getattr(settings, 'EMBEDDING_CONCURRENCY', 3), 10)
+            session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+            _session = session
+        return _session
+
+
+def embed_texts(texts, model=EMBEDDING_MODEL, timeout=None, metrics=None):
+    """
+    Embed a list of texts in one Ollama request, returning a list of vectors.
+    Tokens Ollama reports are added to `metrics` (a timing.StageMetrics) if given.
+    """
+    if not texts:
+        return []
+
+    timeout = timeout or getattr(settings, 'EMBEDDING_REQUEST_TIMEOUT', 120)
+    response = get_session().post(
+        OLLAMA_EMBED_URL,
+        json={"model": model, "input": list(texts)},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    data = response.json()
+    if metrics is not None:
+        metrics.add(tokens=data.get("prompt_eval_count") or 0)
+    return data["embeddings"]
+
+
+def embed_batch(texts, model=EMBEDDING_MODEL, retries=None, backoff=None, metrics=None, label=""):
+    """Embed one batch, retrying this batch alone with exponential backoff"""
+    retries = getattr(settings, 'EMBEDDING_BATCH_RETRIES', 3) if retries is None else retries
+    backoff = getattr(settings, 'EMBEDDING_RETRY_BACKOFF_SECONDS', 2) if backoff is None else backoff
+
+    for attempt in range(retries + 1):
+        started = time.monotonic()
+        try:
+            with stage_slot('network'):
+                embeddings = embed_texts(texts, model=model, metrics=metrics)
+            logger.info(f"Embedded batch {label} ({len(texts)} texts) in {time.monotonic() - started:.2f}s")
+            return embeddings
+        except Exception as e:
+            if attempt >= retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            logger.warning(f"Embedding batch {label} failed ({e}); retry {attempt + 1}/{retries} in {delay}s")
+            time.sleep(delay)
+
+
+def embed_texts_batched(texts, model=EMBEDDING_MODEL, batch_size=None, workers=None, metrics=None):
+    """
+    Embed any number of texts as EMBEDDING_BATCH_SIZE-sized Ollama requests, with
+    up to EMBEDDING_CONCURRENCY batches in flight. A failed batch is retried on its
+    own; vectors are returned in input order.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+
+    batch_size = max(1, batch_size or getattr(settings, 'EMBEDDING_BATCH_SIZE', 64))
+    workers = max(1, workers or getattr(settings, 'EMBEDDING_CONCURRENCY', 3))
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    def embed(index):
+        return embed_batch(batches[index], model=model, metrics=metrics, label=f"{index + 1}/{len(batches)}")
+
+    logger.info(f"Embedding {len(texts)} texts in {len(batches)} batches with {min(workers, len(batches))} workers")
+    with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+        results = list(executor.map(embed, range(len(batches))))
+
+    return [vector for batch in results for vector in batch]
+
+
+def normalize_question(question):
+    """Case- and whitespace-insensitive form of a question, used as cache key"""
+    return " ".join(str(question).lower().split())
+
+
+class EmbeddingCache:
+    """Thread-safe bounded LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_size=1024, ttl_seconds=3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self.ttl_seconds or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+question_cache = EmbeddingCache(
+    max_size=getattr(settings, 'QUERY_EMBEDDING_CACHE_SIZE', 1024),
+    ttl_seconds=getattr(settings, 'QUERY_EMBEDDING_CACHE_TTL', 3600),
+)
+
+
+def embed_questions(questions, model=EMBEDDING_MODEL):
+    """
+    Embed many questions as one (n, dim) float32 matrix. Cached questions are reused
+    and the rest are embedded together in a single Ollama request.
+    """
+    keys = [(model, normalize_question(question)) for question in questions]
+    vectors = [question_cache.get(key) for key in keys]
+
+    # Identical questions within a batch are embedded once
+    missing = {}
+    for index, key in enumerate(keys):
+        if vectors[index] is None:
+            missing.setdefault(key, []).append(index)
+
+    if missing:
+        first_indexes = [indexes[0] for indexes in missing.values()]
+        embedded = embed_texts([questions[index] for index in first_indexes], model=model)
+        for (key, indexes), values in zip(missing.items(), embedded):
+            vector = np.asarray(values, dtype=np.float32)
+            vector.setflags(write=False)
+            question_cache.put(key, vector)
+            for index in indexes:
+                vectors[index] = vector
+    logger.info(f"Embedded {len(missing)} of {len(questions)} questions ({len(questions) - len(missing)} reused; "
+                f"question cache: {question_cache.stats()})")
+
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(vectors)
@@ -0,0 +1,41 @@
+"""
+Shared Files
+Location of the scripts project (whose directories hold the runtime artifacts)
+and atomic file writes
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+
+SCRIPTS_DIR = Path(settings.BASE_DIR).parent / 'Video-Knowledge-Extraction-Semantic-Search-System-RAG-based-'
+
+
+def add_scripts_to_path():
+    """Make the scripts project (pipelIne_api, rag_query, enhance_and_pdf) importable"""
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+
+
+@contextmanager
+def atomic_write(path, mode='w', fsync=False):
+    """
+    Open a temp file next to `path` for writing and rename it over `path` when the
+    block succeeds, so readers see the old or the new file, never a partial one.
+    The temp file is named '.<name>.*.tmp'; `fsync` flushes it to disk first.
+    """
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else 'utf-8') as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
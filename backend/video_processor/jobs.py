@@ -0,0 +1,187 @@
+"""
+Processing Job Queue
+Database-backed job queue: enqueue, claim, retry with backoff, lease recovery
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+# kind -> callable(job); handlers register themselves with @job_handler
+JOB_HANDLERS = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help (bad input, missing dependency)"""
+
+
+_stage_slots = {}
+_stage_slots_lock = threading.Lock()
+
+
+def job_handler(kind):
+    """Register the function that runs jobs of `kind`"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+@contextmanager
+def stage_slot(stage):
+    """
+    Hold one of the process-wide slots for a pipeline stage while the block runs.
+
+    Limits come from JOB_STAGE_CONCURRENCY (e.g. {'ffmpeg': 2, 'network': 4}), so
+    CPU-heavy transcodes stay bounded however many workers are busy; stages
+    without a configured limit run unrestricted.
+    """
+    with _stage_slots_lock:
+        slot = _stage_slots.get(stage)
+        if slot is None:
+            limit = getattr(settings, 'JOB_STAGE_CONCURRENCY', {}).get(stage)
+            if not limit:
+                slot = None
+            else:
+                slot = _stage_slots[stage] = threading.BoundedSemaphore(limit)
+
+    if slot is None:
+        yield
+        return
+
+    with slot:
+        yield
+
+
+def enqueue(kind, video=None, user=None, payload=None, max_attempts=None):
+    """Persist a new job; it runs once a worker claims it"""
+    from api.models import ProcessingJob
+
+    job = ProcessingJob.objects.create(
+        kind=kind,
+        video=video,
+        user=user if user is not None else getattr(video, 'user', None),
+        payload=payload or {},
+        max_attempts=max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 3),
+    )
+    logger.info(f"Enqueued {kind} job {job.id}")
+
+    from .worker import notify_enqueued
+    transaction.on_commit(notify_enqueued)
+    return job
+
+
+def claim_job(worker_id, kinds=None):
+    """
+    Take the oldest runnable job, or return None. The claim is a conditional
+    UPDATE on status, so concurrent workers never run the same job twice.
+    """
+    from api.models import ProcessingJob
+
+    now = timezone.now()
+    candidates = ProcessingJob.objects.filter(status='queued').filter(
+        Q(run_after__isnull=True) | Q(run_after__lte=now)
+    )
+    if kinds:
+        candidates = candidates.filter(kind__in=kinds)
+
+    for job_id in candidates.order_by('created_at').values_list('id', flat=True)[:10]:
+        claimed = ProcessingJob.objects.filter(id=job_id, status='queued').update(
+            status='running',
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return ProcessingJob.objects.get(id=job_id)
+    return None
+
+
+def report_progress(job, phase=None, progress=None, message=None):
+    """Record handler progress on a running job (visible to status endpoints)"""
+    updates = {}
+    if phase is not None:
+        updates['phase'] = job.phase = phase
+    if progress is not None:
+        updates['progress'] = job.progress = progress
+    if message is not None:
+        updates['message'] = job.message = message[:255]
+    if updates:
+        type(job).objects.filter(id=job.id).update(**updates)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: JOB_RETRY_BACKOFF_SECONDS, doubled per failed attempt"""
+    base = getattr(settings, 'JOB_RETRY_BACKOFF_SECONDS', 30)
+    return timedelta(seconds=base * (2 ** max(0, attempts - 1)))
+
+
+def is_final_attempt(job):
+    return job.attempts >= job.max_attempts
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome (retrying failed attempts with backoff)"""
+    from api.models import ProcessingJob
+
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind '{job.kind}'")
+        handler(job)
+    except Exception as e:
+        error_message = str(e) or e.__class__.__name__
+        if handler is not None and not isinstance(e, PermanentJobError) and not is_final_attempt(job):
+            delay = retry_delay(job.attempts)
+            logger.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed, retrying in {delay}: {error_message}")
+            ProcessingJob.objects.filter(id=job.id).update(
+                status='queued', run_after=timezone.now() + delay, locked_by='', locked_at=None,
+                last_error=error_message,
+            )
+        else:
+            logger.error(f"Job {job.id} ({job.kind}) failed after {job.attempts} attempt(s): {error_message}")
+            ProcessingJob.objects.filter(id=job.id).update(
+                status='failed', finished_at=timezone.now(), locked_by='', locked_at=None,
+                last_error=error_message,
+            )
+        return False
+
+    ProcessingJob.objects.filter(id=job.id).update(
+        status='succeeded', finished_at=timezone.now(), locked_by='', locked_at=None,
+    )
+    logger.info(f"Job {job.id} ({job.kind}) succeeded")
+    return True
+
+
+def heartbeat(job_ids):
+    """Extend the lease of jobs a live worker is still running"""
+    from api.models import ProcessingJob
+
+    if job_ids:
+        ProcessingJob.objects.filter(id__in=job_ids, status='running').update(locked_at=timezone.now())
+
+
+def requeue_stale_jobs():
+    """
+    Return jobs whose worker stopped heartbeating (crash, restart, deploy) to the
+    queue. The interrupted attempt still counts towards max_attempts.
+    """
+    from api.models import ProcessingJob
+
+    lease = timedelta(seconds=getattr(settings, 'JOB_LEASE_SECONDS', 300))
+    stale = ProcessingJob.objects.filter(status='running', locked_at__lt=timezone.now() - lease)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=timezone.now(), locked_by='', locked_at=None,
+        last_error='Worker stopped while running the final attempt',
+    )
+    count = stale.update(status='queued', run_after=None, locked_by='', locked_at=None)
+    if count:
+        logger.warning(f"Requeued {count} job(s) abandoned by a stopped worker")
+    return count
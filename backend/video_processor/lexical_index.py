@@ -0,0 +1,174 @@
+"""
+Lexical Index
+Per-video BM25 inverted index over transcript segments
+"""
+import json
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+import logging
+
+from .files import SCRIPTS_DIR, atomic_write
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_DIR = SCRIPTS_DIR / 'lexical_index'
+
+# Identifiers such as os.path.join, snake_case_names, E1001 or HTTP-404 stay whole tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+(?:[.:\-][a-z0-9_]+)*")
+PART_PATTERN = re.compile(r"[.:\-_]")
+
+
+def tokenize(text):
+    """Lower-cased terms; compound identifiers also contribute their parts"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(str(text).lower()):
+        terms.append(token)
+        parts = [part for part in PART_PATTERN.split(token) if part]
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    """
+    term -> postings (segment ids, term frequencies) plus the document-length
+    statistics BM25 needs. Segment ids are transcript chunk positions, i.e. the
+    `chunk_id` stored with each row of the video's vector shard.
+    """
+
+    def __init__(self, postings, doc_lengths, k1=1.5, b=0.75):
+        self.postings = postings
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, segments):
+        """Index (segment_id, text) pairs"""
+        segments = list(segments)
+        n_docs = max((segment_id for segment_id, _ in segments), default=-1) + 1
+        doc_lengths = np.zeros(n_docs, dtype=np.float32)
+        postings = defaultdict(lambda: ([], []))
+
+        for segment_id, text in segments:
+            terms = tokenize(text)
+            doc_lengths[segment_id] = len(terms)
+            for term, frequency in Counter(terms).items():
+                postings[term][0].append(segment_id)
+                postings[term][1].append(frequency)
+
+        return cls(
+            {
+                term: (np.asarray(doc_ids, dtype=np.int32), np.asarray(freqs, dtype=np.float32))
+                for term, (doc_ids, freqs) in postings.items()
+            },
+            doc_lengths,
+        )
+
+    def scores(self, query):
+        """BM25 score of every segment for a query, shape (n_segments,)"""
+        scores = np.zeros(len(self), dtype=np.float32)
+        if not len(self):
+            return scores
+
+        n_docs = len(self)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, freqs = posting
+            idf = math.log(1 + (n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_ids] / max(self.avg_doc_length, 1e-9))
+            scores[doc_ids] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+        return scores
+
+    def to_dict(self):
+        return {
+            'k1': self.k1,
+            'b': self.b,
+            'doc_lengths': self.doc_lengths.astype(int).tolist(),
+            'postings': {
+                term: [doc_ids.tolist(), freqs.astype(int).tolist()]
+                for term, (doc_ids, freqs) in self.postings.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        postings = {
+            term: (np.asarray(doc_ids, dtype=np.int32), np.asarray(freqs, dtype=np.float32))
+            for term, (doc_ids, freqs) in data['postings'].items()
+        }
+        return cls(postings, data['doc_lengths'], k1=data.get('k1', 1.5), b=data.get('b', 0.75))
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def index_path(key):
+    return LEXICAL_DIR / f"{key}.json"
+
+
+def save_index(key, index):
+    """Write a video's index atomically (write-temp + rename)"""
+    LEXICAL_DIR.mkdir(parents=True, exist_ok=True)
+    with atomic_write(index_path(key)) as f:
+        json.dump(index.to_dict(), f)
+
+
+def build_index(key, chunks):
+    """Build and persist the index for a video's transcript chunks (in transcript order)"""
+    index = BM25Index.build((position, chunk.get('text', '')) for position, chunk in enumerate(chunks))
+    save_index(key, index)
+    logger.info(f"Built lexical index for '{key}': {len(index)} segments, {len(index.postings)} terms")
+    return index
+
+
+def load_index(key):
+    """Load a video's index (cached until the file changes), or None if it was never built"""
+    path = index_path(key)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _loaded_lock:
+        cached = _loaded.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    with open(path, encoding='utf-8') as f:
+        index = BM25Index.from_dict(json.load(f))
+    with _loaded_lock:
+        _loaded[key] = (mtime, index)
+    return index
+
+
+def shard_index(shard):
+    """Index for a vector shard, built from the shard's own texts if it is missing"""
+    index = load_index(shard.key)
+    if index is None:
+        index = BM25Index.build((int(shard.meta['chunk_id'][row]), shard.text(row)) for row in range(len(shard)))
+        save_index(shard.key, index)
+        logger.info(f"Built lexical index for '{shard.key}' from its vector shard")
+    return index
+
+
+def row_scores(index, shard, query):
+    """BM25 scores aligned with the shard's rows, scaled to [0, 1]"""
+    segment_scores = index.scores(query)
+    chunk_ids = np.asarray(shard.meta['chunk_id'])
+    scores = np.zeros(len(shard), dtype=np.float32)
+    known = chunk_ids < len(segment_scores)
+    scores[known] = segment_scores[chunk_ids[known]]
+    top = scores.max() if len(scores) else 0.0
+    return scores / top if top > 0 else scores
@@ -0,0 +1,169 @@
+"""
+LLM Response Cache
+Disk-backed cache of Groq chat completions keyed by model, messages and sampling settings
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+import logging
+
+from .files import SCRIPTS_DIR, atomic_write
+from .jobs import stage_slot
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = SCRIPTS_DIR / 'llm_cache'
+
+
+def request_key(model, messages, temperature=None, max_tokens=None):
+    """SHA-256 of the request fields that determine a completion"""
+    payload = json.dumps(
+        {'model': model, 'messages': messages, 'temperature': temperature, 'max_tokens': max_tokens},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    One JSON file per response under `directory`. Hits refresh the file's mtime and
+    once the directory grows past `max_bytes` the least recently used files are
+    evicted down to 90% of it. Writes are atomic; counters are thread-safe.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=256 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                content = json.load(f)['content']
+            os.utime(path)
+        except (FileNotFoundError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, key, content):
+        if self.max_bytes <= 0:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        with atomic_write(path) as f:
+            json.dump({'content': content}, f, ensure_ascii=False)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._disk_usage()
+            else:
+                self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        if not self.directory.exists():
+            return []
+        return list(self.directory.glob('*.json'))
+
+    def _disk_usage(self):
+        return sum(path.stat().st_size for path in self._entries() if path.exists())
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is at 90% of max_bytes"""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        self._bytes = total
+        logger.info(f"LLM cache evicted {evicted} entries ({total / 1e6:.1f} MB kept)")
+
+    def clear(self):
+        with self._lock:
+            for path in self._entries():
+                path.unlink(missing_ok=True)
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            return {
+                'entries': len(entries),
+                'bytes': self._disk_usage(),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+response_cache = LLMResponseCache(
+    directory=getattr(settings, 'LLM_CACHE_DIR', None) or CACHE_DIR,
+    max_bytes=int(getattr(settings, 'LLM_CACHE_MAX_MB', 256) * 1024 * 1024),
+)
+
+
+def chat_completion(client, model, messages, temperature=None, max_tokens=None, metrics=None, use_cache=True):
+    """
+    Text of a chat completion, served from the response cache when the same request
+    was answered before. Tokens of live calls are added to `metrics`
+    (a timing.StageMetrics); cached answers spend none. With `use_cache=False` (or
+    LLM_CACHE_ENABLED off) the model is always called and the fresh answer replaces
+    the cached one. Each live call holds one 'network' stage slot.
+    """
+    enabled = getattr(settings, 'LLM_CACHE_ENABLED', True)
+    key = request_key(model, messages, temperature, max_tokens)
+    if enabled and use_cache:
+        content = response_cache.get(key)
+        if content is not None:
+            return content
+
+    with stage_slot('network'):
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+    if metrics is not None:
+        metrics.add_usage(response)
+    content = response.choices[0].message.content
+
+    if enabled and content:
+        try:
+            response_cache.put(key, content)
+        except OSError as e:
+            logger.warning(f"Could not cache LLM response: {e}")
+    return content
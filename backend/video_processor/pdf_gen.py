@@ -2,22 +2,24 @@
 PDF Generation Integration
 Wraps existing enhance_and_pdf.py logic
 """
-import sys
 import os
 import re
+import uuid
 from pathlib import Path
-from django.conf import settings
-from django.core.files import File
+from django.db import IntegrityError, transaction
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from groq import Groq
 
+from .files import SCRIPTS_DIR, add_scripts_to_path
+from .jobs import enqueue, job_handler, report_progress, stage_slot
+from .llm_cache import chat_completion, request_key, response_cache
+from .timing import stage_timer
+
 logger = logging.getLogger(__name__)
 
-# Add the existing scripts directory to Python path
-SCRIPTS_DIR = Path(settings.BASE_DIR).parent / 'Video-Knowledge-Extraction-Semantic-Search-System-RAG-based-'
-sys.path.insert(0, str(SCRIPTS_DIR))
+add_scripts_to_path()
 
 
 def _format_seconds(seconds):
@@ -35,8 +37,12 @@ def _format_seconds(seconds):
     return f"{minutes:02d}:{secs:02d}"
 
 
-def _generate_chunk_content(client, model, chunk_text, idx, total, start_time_hint=None, end_time_hint=None):
-    """Generate high-quality educational content for one transcript chunk."""
+CHUNK_TEMPERATURE = 0.2
+CHUNK_MAX_TOKENS = 2200
+
+
+def _chunk_request(model, chunk_text, idx, total, start_time_hint=None, end_time_hint=None):
+    """Chat request (model, messages, temperature, max_tokens) for one transcript chunk."""
     time_hint = ""
     if start_time_hint and end_time_hint:
         time_hint = f"\nChunk timeline: {start_time_hint} to {end_time_hint}\n"
@@ -92,36 +98,24 @@ Transcript chunk:
 >>>
 """
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-        max_tokens=2200,
-    )
-    return response.choices[0].message.content.strip()
+    return {
+        'model': model,
+        'messages': [{"role": "user", "content": prompt}],
+        'temperature': CHUNK_TEMPERATURE,
+        'max_tokens': CHUNK_MAX_TOKENS,
+    }
 
 
-def _repair_code_blocks_with_llm(client, model, content):
-    """Repair generated fenced code blocks so they are complete and self-contained."""
-    pattern = re.compile(r"```([a-zA-Z0-9_+-]*)\n(.*?)```", re.DOTALL)
-    matches = list(pattern.finditer(content))
-    if not matches:
-        return content
-
-    max_repair_blocks = int(os.getenv('PDF_CODE_REPAIR_LIMIT', '8'))
-    repaired_count = 0
-    updated_text = content
+def _generate_chunk_content(client, model, chunk_text, idx, total, start_time_hint=None, end_time_hint=None, metrics=None, use_cache=True):
+    """Generate high-quality educational content for one transcript chunk."""
+    request = _chunk_request(model, chunk_text, idx, total, start_time_hint, end_time_hint)
+    content = chat_completion(client, **request, metrics=metrics, use_cache=use_cache)
+    return content.strip()
 
-    for match in matches:
-        if repaired_count >= max_repair_blocks:
-            break
 
-        lang = (match.group(1) or 'text').strip() or 'text'
-        code = (match.group(2) or '').strip()
-        if not code:
-            continue
-
-        prompt = f"""
+def _repair_code_block(client, model, lang, code, metrics=None, use_cache=True):
+    """Ask the LLM for a complete, self-contained version of one code block."""
+    prompt = f"""
 You are a senior software engineer.
 Fix and improve this code snippet to be complete and self-contained.
 
@@ -141,28 +135,66 @@ Code:
 >>>
 """
 
+    fixed_code = chat_completion(
+        client,
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.1,
+        max_tokens=1200,
+        metrics=metrics,
+        use_cache=use_cache,
+    ).strip()
+    fixed_code = re.sub(r"^```[a-zA-Z0-9_+-]*\n", "", fixed_code)
+    return re.sub(r"```$", "", fixed_code).strip()
+
+
+def _repair_code_blocks_with_llm(client, model, content, metrics=None, use_cache=True):
+    """Repair generated fenced code blocks so they are complete and self-contained."""
+    pattern = re.compile(r"```([a-zA-Z0-9_+-]*)\n(.*?)```", re.DOTALL)
+    matches = list(pattern.finditer(content))
+    if not matches:
+        return content
+
+    max_repair_blocks = int(os.getenv('PDF_CODE_REPAIR_LIMIT', '8'))
+    max_workers = max(1, int(os.getenv('PDF_CODE_REPAIR_WORKERS', '4')))
+
+    # The first PDF_CODE_REPAIR_LIMIT non-empty blocks, repaired concurrently
+    targets = []
+    for match in matches:
+        if len(targets) >= max_repair_blocks:
+            break
+        lang = (match.group(1) or 'text').strip() or 'text'
+        code = (match.group(2) or '').strip()
+        if code:
+            targets.append((match, lang, code))
+    if not targets:
+        return content
+
+    def _repair_one(target):
+        match, lang, code = target
         try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=1200,
-            )
-            fixed_code = response.choices[0].message.content.strip()
-            fixed_code = re.sub(r"^```[a-zA-Z0-9_+-]*\n", "", fixed_code)
-            fixed_code = re.sub(r"```$", "", fixed_code).strip()
-
-            original_block = match.group(0)
-            replacement_block = f"```{lang}\n{fixed_code}\n```"
-            updated_text = updated_text.replace(original_block, replacement_block, 1)
-            repaired_count += 1
+            return f"```{lang}\n{_repair_code_block(client, model, lang, code, metrics, use_cache)}\n```"
         except Exception as repair_error:
             logger.warning(f"Code block repair failed: {repair_error}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets))) as executor:
+        replacements = list(executor.map(_repair_one, targets))
 
-    return updated_text
+    # Rebuild in one pass from the match spans, so each repair lands on its own block
+    parts = []
+    position = 0
+    for (match, _, _), replacement in zip(targets, replacements):
+        if replacement is None:
+            continue
+        parts.append(content[position:match.start()])
+        parts.append(replacement)
+        position = match.end()
+    parts.append(content[position:])
+    return "".join(parts)
 
 
-def _generate_final_sections(client, model, full_text_excerpt):
+def _generate_final_sections(client, model, full_text_excerpt, metrics=None, use_cache=True):
     """Generate required ending sections: Final Summary and Key Takeaways."""
     prompt = f"""
 Create only the final two sections for a course PDF.
@@ -187,17 +219,46 @@ Source excerpt:
 >>>
 """
 
-    response = client.chat.completions.create(
+    content = chat_completion(
+        client,
         model=model,
         messages=[{"role": "user", "content": prompt}],
         temperature=0.25,
         max_tokens=1800,
+        metrics=metrics,
+        use_cache=use_cache,
+    )
+    return content.strip()
+
+
+def _load_chunk_notes(video, chunk_count):
+    """Stored chunk notes of a video by index; notes past the current chunk count are dropped"""
+    from api.models import PDFChunkNote
+
+    PDFChunkNote.objects.filter(video=video, index__gte=chunk_count).delete()
+    return {note.index: note for note in PDFChunkNote.objects.filter(video=video)}
+
+
+def _save_chunk_note(video, index, input_hash, status, content):
+    from api.models import PDFChunkNote
+
+    PDFChunkNote.objects.update_or_create(
+        video=video,
+        index=index,
+        defaults={'input_hash': input_hash, 'status': status, 'content': content},
     )
-    return response.choices[0].message.content.strip()
 
 
-def _generate_high_quality_pdf_content(raw_text, chunks, enhance_and_pdf):
-    """Generate complete, high-quality PDF content with lower latency than multi-pass synthesis."""
+def _generate_high_quality_pdf_content(raw_text, chunks, enhance_and_pdf, metrics=None, use_cache=True, progress=None, video=None):
+    """
+    Generate complete, high-quality PDF content with lower latency than multi-pass synthesis.
+    `progress(phase, percent, message)` is called as chunks and the closing phases finish.
+
+    With a `video`, each chunk's notes are stored (PDFChunkNote) with the hash of the
+    request that produced them; a rebuild only regenerates chunks whose request
+    changed or that fell back to beautify_text last time.
+    """
+    progress = progress or (lambda phase, percent, message: None)
     model = os.getenv('GROQ_PDF_MODEL', 'llama-3.3-70b-versatile')
     client = Groq(api_key=os.getenv('GROQ_API_KEY'))
 
@@ -206,6 +267,8 @@ def _generate_high_quality_pdf_content(raw_text, chunks, enhance_and_pdf):
     token_chunks = enhance_and_pdf.split_text_by_tokens(raw_text, max_tokens=max_tokens, overlap=overlap_tokens)
 
     logger.info(f"Generating high-quality PDF content using {len(token_chunks)} chunks")
+    if metrics is not None:
+        metrics.add(segments=len(token_chunks))
 
     chunk_times = []
     if chunks:
@@ -222,6 +285,24 @@ def _generate_high_quality_pdf_content(raw_text, chunks, enhance_and_pdf):
     chunk_notes = [""] * len(token_chunks)
     max_workers = max(1, int(os.getenv('PDF_ENHANCE_WORKERS', '3')))
 
+    input_hashes = [
+        request_key(**_chunk_request(model, chunk_text, idx + 1, len(token_chunks), *chunk_times[idx]))
+        for idx, chunk_text in enumerate(token_chunks)
+    ]
+    stored_notes = _load_chunk_notes(video, len(token_chunks)) if video is not None else {}
+
+    # Chunks whose stored notes were generated from the same request are reused as is
+    pending = []
+    for idx, chunk_text in enumerate(token_chunks):
+        note = stored_notes.get(idx)
+        if use_cache and note is not None and note.status == 'generated' and note.input_hash == input_hashes[idx]:
+            chunk_notes[idx] = note.content
+        else:
+            pending.append((idx, chunk_text))
+    reused = len(token_chunks) - len(pending)
+    if reused:
+        logger.info(f"Reusing stored notes for {reused}/{len(token_chunks)} chunks")
+
     def _process_one(index_and_chunk):
         idx, chunk_text = index_and_chunk
         start_hint, end_hint = chunk_times[idx]
@@ -235,22 +316,32 @@ def _generate_high_quality_pdf_content(raw_text, chunks, enhance_and_pdf):
                 len(token_chunks),
                 start_hint,
                 end_hint,
+                metrics=metrics,
+                use_cache=use_cache,
             )
+            chunk_status = 'generated'
         except Exception as chunk_error:
             logger.warning(f"Chunk enhancement failed for chunk {idx + 1}: {chunk_error}")
-            output = enhance_and_pdf.beautify_text(chunk_text)
-        return idx, output
-
-    if max_workers == 1 or len(token_chunks) == 1:
-        for idx, chunk_text in enumerate(token_chunks):
-            _, output = _process_one((idx, chunk_text))
-            chunk_notes[idx] = output
+            with stage_slot('network'):
+                output = enhance_and_pdf.beautify_text(chunk_text)
+            chunk_status = 'fallback'
+        return idx, output, chunk_status
+
+    def _chunk_done(idx, output, chunk_status, done):
+        chunk_notes[idx] = output
+        if video is not None:
+            _save_chunk_note(video, idx, input_hashes[idx], chunk_status, output)
+        progress('chunks', int(80 * done / len(token_chunks)), f"Generated {done}/{len(token_chunks)} chunks")
+
+    progress('chunks', int(80 * reused / len(token_chunks)), f"Generated {reused}/{len(token_chunks)} chunks")
+    if max_workers == 1 or len(pending) <= 1:
+        for done, index_and_chunk in enumerate(pending, start=reused + 1):
+            _chunk_done(*_process_one(index_and_chunk), done)
     else:
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(_process_one, (idx, chunk_text)) for idx, chunk_text in enumerate(token_chunks)]
-            for future in as_completed(futures):
-                idx, output = future.result()
-                chunk_notes[idx] = output
+            futures = [executor.submit(_process_one, index_and_chunk) for index_and_chunk in pending]
+            for done, future in enumerate(as_completed(futures), start=reused + 1):
+                _chunk_done(*future.result(), done)
 
     merged = []
     for idx, content in enumerate(chunk_notes, start=1):
@@ -260,24 +351,89 @@ def _generate_high_quality_pdf_content(raw_text, chunks, enhance_and_pdf):
     excerpt_limit = int(os.getenv('PDF_FINAL_SECTION_CHARS', '14000'))
     excerpt_text = raw_text[:excerpt_limit]
     logger.info("Generating final summary and key takeaways section")
-    final_sections = _generate_final_sections(client, model, excerpt_text)
+    progress('summary', 82, "Writing final summary")
+    final_sections = _generate_final_sections(client, model, excerpt_text, metrics=metrics, use_cache=use_cache)
 
     merged.append(final_sections)
     combined = "\n\n".join(merged)
 
     try:
         logger.info("Repairing fenced code blocks for completeness")
-        combined = _repair_code_blocks_with_llm(client, model, combined)
+        progress('code_repair', 88, "Repairing code blocks")
+        combined = _repair_code_blocks_with_llm(client, model, combined, metrics=metrics, use_cache=use_cache)
     except Exception as repair_error:
         logger.warning(f"Code repair phase failed, continuing without repair: {repair_error}")
 
     return combined
 
 
-def generate_pdf(video_id):
+def _pdf_storage_name(video, pdf_filename, current_name=None):
+    """
+    Storage name for a video's PDF: always a path no other video's PDF uses, so
+    rendering never overwrites a file linked from a duplicate upload. A legacy
+    title-based name already used by another video keeps the video's own current
+    file, or gets a unique suffix.
+    """
+    from api.models import PDF
+
+    field = PDF._meta.get_field('file')
+    name = field.generate_filename(None, pdf_filename)
+    if not PDF.objects.filter(file=name).exclude(video=video).exists():
+        return name
+    if current_name and not PDF.objects.filter(file=current_name).exclude(video=video).exists():
+        return current_name
+    return field.storage.get_available_name(name)
+
+
+def generate_pdf_async(video_id, regenerate=False):
+    """
+    Queue PDF (re)generation for a video. Returns (job, created); a generate_pdf job
+    already queued or running for the video is returned instead of a duplicate.
+    A regenerate request upgrades a joined job that has not started yet; a running
+    one keeps its payload, so callers compare job.payload['regenerate'] to tell.
+
+    Coalescing rests on the one_active_pdf_job_per_video constraint rather than row
+    locks (SQLite ignores select_for_update): of two concurrent inserts one fails
+    and returns the winner's job.
+    """
+    from api.models import Video, ProcessingJob
+
+    video = Video.objects.get(id=video_id)
+    while True:
+        active = ProcessingJob.objects.filter(
+            video=video, kind='generate_pdf', status__in=['queued', 'running']
+        ).first()
+        if active is not None:
+            if regenerate and not active.payload.get('regenerate'):
+                payload = {**active.payload, 'regenerate': True}
+                if ProcessingJob.objects.filter(id=active.id, status='queued').update(payload=payload):
+                    active.payload = payload
+                else:
+                    active.refresh_from_db()
+            return active, False
+        try:
+            with transaction.atomic():
+                return enqueue('generate_pdf', video=video, payload={'regenerate': bool(regenerate)}), True
+        except IntegrityError:
+            logger.info(f"PDF job for video {video_id} was queued concurrently, coalescing")
+
+
+@job_handler('generate_pdf')
+def run_generate_pdf_job(job):
+    """Job handler: generate a video's PDF, reporting chunk-level progress on the job"""
+    def progress(phase, percent, message):
+        report_progress(job, phase=phase, progress=percent, message=message)
+
+    generate_pdf(job.video_id, use_cache=not job.payload.get('regenerate'), progress=progress)
+    report_progress(job, phase='done', progress=100, message='PDF ready')
+
+
+def generate_pdf(video_id, use_cache=True, progress=None):
     """
     Generate PDF for a video
-    Returns PDF model instance
+    Returns PDF model instance. LLM answers for unchanged prompts come from the
+    response cache unless `use_cache` is False (deliberate regeneration);
+    `progress(phase, percent, message)` receives progress updates.
     """
     from api.models import Video, PDF
     import enhance_and_pdf
@@ -292,102 +448,110 @@ def generate_pdf(video_id):
             logger.error(f"Video status check failed! Status is {video.status}")
             raise ValueError(f"Video status must be completed or processing, found: {video.status}")
         
-        # Get JSON file path
-        json_dir = SCRIPTS_DIR / 'jsons'
-        
-        # Use the same filename cleaning logic as the pipeline
-        import pipelIne_api
-        
-        # Get the original video filename
-        video_filename = Path(video.file.name).name
-        
-        # Clean the filename (remove extension and clean special characters)
-        base_name = pipelIne_api.clean_filename(video_filename.rsplit('.', 1)[0])
-        
-        # The JSON file is named as: "0_{base_name}.mp3.json"
-        json_filename = f"0_{base_name}.mp3.json"
-        json_path = json_dir / json_filename
-        
-        if not json_path.exists():
-            logger.error(f"JSON file not found at expected path: {json_path}")
-            # Try to find any matching JSON file as fallback
-            json_files = list(json_dir.glob(f"*{base_name}*.json"))
-            if not json_files:
-                logger.error(f"No JSON file found for video: {base_name} in {json_dir}")
-                raise FileNotFoundError(f"No JSON file found for video: {base_name}")
-            json_path = json_files[0]
-            logger.warning(f"Using fallback JSON file: {json_path}")
-        
-        logger.info(f"Found JSON file: {json_path}")
-
-        
-        # Load JSON data
-        with open(json_path, encoding='utf-8') as f:
-            data = json.load(f)
-        
-        raw_text = data.get('text', '').strip()
-        if not raw_text:
-            raise ValueError("No text in JSON file")
-        
-        logger.info(f"Loaded text from JSON, length: {len(raw_text)} characters")
-        
-        transcript_chunks = data.get('chunks', [])
-
-        # Generate detailed educational content with full transcript coverage
-        logger.info("Generating high-quality PDF content...")
-        try:
-            enhanced_text = _generate_high_quality_pdf_content(
-                raw_text=raw_text,
-                chunks=transcript_chunks,
-                enhance_and_pdf=enhance_and_pdf,
+        with stage_timer(video, 'pdf_generation') as metrics:
+            # Get JSON file path (same content-hash / cleaned-filename key as the pipeline)
+            from .artifacts import artifact_key, transcript_path
+            json_dir = SCRIPTS_DIR / 'jsons'
+            base_name = artifact_key(video)
+            json_path = transcript_path(base_name)
+            
+            if not json_path.exists():
+                logger.error(f"JSON file not found at expected path: {json_path}")
+                # Try to find any matching JSON file as fallback
+                json_files = list(json_dir.glob(f"*{base_name}*.json"))
+                if not json_files:
+                    logger.error(f"No JSON file found for video: {base_name} in {json_dir}")
+                    raise FileNotFoundError(f"No JSON file found for video: {base_name}")
+                json_path = json_files[0]
+                logger.warning(f"Using fallback JSON file: {json_path}")
+            
+            logger.info(f"Found JSON file: {json_path}")
+
+            
+            # Load JSON data
+            with open(json_path, encoding='utf-8') as f:
+                data = json.load(f)
+            
+            raw_text = data.get('text', '').strip()
+            if not raw_text:
+                raise ValueError("No text in JSON file")
+            
+            logger.info(f"Loaded text from JSON, length: {len(raw_text)} characters")
+            
+            transcript_chunks = data.get('chunks', [])
+
+            # Generate detailed educational content with full transcript coverage
+            logger.info("Generating high-quality PDF content...")
+            try:
+                enhanced_text = _generate_high_quality_pdf_content(
+                    raw_text=raw_text,
+                    chunks=transcript_chunks,
+                    enhance_and_pdf=enhance_and_pdf,
+                    metrics=metrics,
+                    use_cache=use_cache,
+                    progress=progress,
+                    video=video,
+                )
+                logger.info("High-quality content generation complete")
+            except Exception as content_error:
+                logger.warning(f"Enhanced content generation failed, using legacy fallback: {content_error}")
+                chunks = enhance_and_pdf.split_text_by_tokens(raw_text)
+                enhanced_parts = []
+                for i, chunk in enumerate(chunks):
+                    logger.info(f"Fallback enhancement for chunk {i+1}/{len(chunks)}...")
+                    with stage_slot('network'):
+                        enhanced_parts.append(enhance_and_pdf.beautify_text(chunk))
+                enhanced_text = "\n\n".join(enhanced_parts)
+                logger.info("Fallback text enhancement complete")
+            
+            # Create PDF title from cleaned base name; hashed uploads use the video title and
+            # are stored per video (duplicates linked to this PDF keep their own file on refresh)
+            if video.content_hash:
+                video_title = video.title
+                pdf_filename = f"{video.content_hash}-{video.id}.pdf"
+            else:
+                video_title = base_name.replace('_', ' ').title()
+                pdf_filename = f"{video_title}.pdf"
+            # Render into a temp file beside the final storage path and rename it into place:
+            # no second copy through FileField.save, and readers never see a partial PDF
+            pdf_obj = PDF.objects.filter(video=video).first()
+            old_name = pdf_obj.file.name if pdf_obj is not None and pdf_obj.file else None
+            storage_name = _pdf_storage_name(video, pdf_filename, old_name)
+            pdf_path = Path(PDF._meta.get_field('file').storage.path(storage_name))
+            pdf_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = pdf_path.with_name(f".{pdf_path.name}.{uuid.uuid4().hex}.tmp")
+            
+            logger.info(f"Creating PDF at: {pdf_path}")
+            if progress is not None:
+                progress('rendering', 95, "Rendering PDF")
+            try:
+                enhance_and_pdf.create_pdf(video_title, enhanced_text, str(temp_path))
+                file_size = temp_path.stat().st_size
+                os.replace(temp_path, pdf_path)
+            finally:
+                temp_path.unlink(missing_ok=True)
+            logger.info("PDF file created successfully")
+            
+            # Save to database
+            pdf_obj, _ = PDF.objects.update_or_create(
+                video=video,
+                defaults={'file': storage_name, 'file_size_bytes': file_size},
             )
-            logger.info("High-quality content generation complete")
-        except Exception as content_error:
-            logger.warning(f"Enhanced content generation failed, using legacy fallback: {content_error}")
-            chunks = enhance_and_pdf.split_text_by_tokens(raw_text)
-            enhanced_parts = []
-            for i, chunk in enumerate(chunks):
-                logger.info(f"Fallback enhancement for chunk {i+1}/{len(chunks)}...")
-                enhanced_parts.append(enhance_and_pdf.beautify_text(chunk))
-            enhanced_text = "\n\n".join(enhanced_parts)
-            logger.info("Fallback text enhancement complete")
-        
-        # Create PDF title from cleaned base name
-        video_title = base_name.replace('_', ' ').title()
-        pdf_filename = f"{video_title}.pdf"
-        pdf_path = settings.MEDIA_ROOT / 'pdfs' / pdf_filename
-        pdf_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        logger.info(f"Creating PDF at: {pdf_path}")
-        enhance_and_pdf.create_pdf(video_title, enhanced_text, str(pdf_path))
-        logger.info("PDF file created successfully")
-        
-        # Save to database
-        pdf_obj, created = PDF.objects.get_or_create(
-            video=video,
-            defaults={'file_size_bytes': os.path.getsize(pdf_path)}
-        )
-        
-        if created:
-            logger.info("Saving PDF to database...")
-            with open(pdf_path, 'rb') as f:
-                pdf_obj.file.save(pdf_filename, File(f), save=True)
-        else:
-            logger.info("Updating existing PDF in database...")
-            with open(pdf_path, 'rb') as f:
-                pdf_obj.file.save(pdf_filename, File(f), save=True)
-
-        pdf_obj.file_size_bytes = os.path.getsize(pdf_path)
-        pdf_obj.save(update_fields=['file_size_bytes'])
-        
-        # Update video profile stats
-        from api.models import UserProfile
-        profile, _ = UserProfile.objects.get_or_create(user=video.user)
-        profile.total_pdfs = PDF.objects.filter(video__user=video.user).count()
-        profile.save()
-        
-        logger.info(f"PDF generation completed for video ID: {video_id}")
-        return pdf_obj
+            metrics.add(bytes=file_size)
+            
+            # Drop the previous version unless another video's PDF still points at it
+            if old_name and old_name != storage_name and not PDF.objects.filter(file=old_name).exists():
+                pdf_obj.file.storage.delete(old_name)
+                logger.info(f"Deleted previous PDF version {old_name}")
+            
+            # Update video profile stats
+            from api.models import UserProfile
+            profile, _ = UserProfile.objects.get_or_create(user=video.user)
+            profile.total_pdfs = PDF.objects.filter(video__user=video.user).count()
+            profile.save()
+            
+            logger.info(f"PDF generation completed for video ID: {video_id} (LLM cache: {response_cache.stats()})")
+            return pdf_obj
         
     except Exception as e:
         logger.error(f"Error generating PDF for video {video_id}: {e}", exc_info=True)
@@ -3,41 +3,84 @@ Video Processing Pipeline Integration
 Wraps existing pipelIne_api.py logic
 """
 import os
-import sys
-import threading
-import shutil
-import subprocess
 import json
-import requests
 from pathlib import Path
 from django.conf import settings
+from django.utils import timezone
 import logging
 
+from . import artifacts, lexical_index
+from .ann_index import index_shard
+from .artifacts import artifact_key
+from .checkpoints import PipelineCheckpoint
+from .embedding import EMBEDDING_MODEL, embed_texts_batched
+from .files import SCRIPTS_DIR, add_scripts_to_path, atomic_write
+from .jobs import enqueue, is_final_attempt, job_handler
+from .streaming import EmbeddingStream
+from .timing import StageMetrics, record_stage, stage_timer
+from .transcription import extract_audio_segments, transcribe_segments
+from .vector_store import get_vector_store
+
 logger = logging.getLogger(__name__)
 
-# Add the existing scripts directory to Python path
-SCRIPTS_DIR = Path(settings.BASE_DIR).parent / 'Video-Knowledge-Extraction-Semantic-Search-System-RAG-based-'
-sys.path.insert(0, str(SCRIPTS_DIR))
+add_scripts_to_path()
 
 
 def process_video_async(video_id):
     """
-    Process video asynchronously (runs in thread for now, should be Celery in production)
+    Queue a video for processing; a `run_workers` pool picks it up
     """
-    thread = threading.Thread(target=_process_video_sync, args=(video_id,))
-    thread.daemon = True
-    thread.start()
+    from api.models import Video
+
+    return enqueue('process_video', video=Video.objects.get(id=video_id))
 
 
-def _process_video_sync(video_id):
+def resume_video(video_id):
+    """
+    Queue a failed or interrupted video to continue from its last checkpoint.
+    Returns (job, created); an already queued/running job is returned as is.
+    """
+    from api.models import ProcessingJob
+
+    active = ProcessingJob.objects.filter(
+        video_id=video_id, kind='process_video', status__in=['queued', 'running']
+    ).first()
+    if active is not None:
+        return active, False
+    return process_video_async(video_id), True
+
+
+def checkpoint_progress(video):
+    """Stages and transcribed segments recorded for a video's unfinished run"""
+    return PipelineCheckpoint.load(artifact_key(video)).progress()
+
+
+@job_handler('process_video')
+def run_process_video_job(job):
+    """Job handler: run the pipeline, marking the video failed only once retries are exhausted"""
+    _process_video_sync(job.video_id, raise_errors=True, final_attempt=is_final_attempt(job))
+
+
+def _total_size(paths):
+    """Combined size in bytes of the files that exist"""
+    return sum(path.stat().st_size for path in paths if path.exists())
+
+
+def _record_duration(video, seconds):
+    """Store the media duration (end of the last audio segment or transcript chunk)"""
+    seconds = round(float(seconds), 3)
+    if seconds and video.duration_seconds != seconds:
+        video.duration_seconds = seconds
+        video.save(update_fields=['duration_seconds'])
+
+
+def _process_video_sync(video_id, raise_errors=False, final_attempt=True):
     """
     Actual video processing logic - processes individual video file directly
     """
     from api.models import Video, PDF
     import pipelIne_api
     from groq import Groq
-    import joblib
-    import pandas as pd
     
     video = None
     try:
@@ -47,7 +90,7 @@ def _process_video_sync(video_id):
         # Update status
         video.status = 'processing'
         video.processing_stage = 'uploaded'
-        video.save()
+        video.save(update_fields=['status', 'processing_stage'])
         
         # Get the uploaded video file path (Django media file)
         video_path = Path(video.file.path)
@@ -60,177 +103,182 @@ def _process_video_sync(video_id):
         
         # Define paths for processing
         audio_dir = SCRIPTS_DIR / 'audios'
-        json_dir = SCRIPTS_DIR / 'jsons'
         chunks_dir = audio_dir / 'chunks'
         
-        # Clean filename for audio/json
-        base_name = pipelIne_api.clean_filename(video_filename.rsplit('.', 1)[0])
-        audio_filename = f"0_{base_name}.mp3"
-        audio_path = audio_dir / audio_filename
-        json_filename = f"{audio_filename}.json"
-        json_path = json_dir / json_filename
+        # Artifacts are keyed by content hash: a re-upload of the same file finds its
+        # transcript and vectors already on disk and skips straight through steps 1-3
+        base_name = artifact_key(video)
+        audio_path = artifacts.audio_path(base_name)
+        json_path = artifacts.transcript_path(base_name)
         
         logger.info(f"Output paths - Audio: {audio_path}, JSON: {json_path}")
         
-        # Step 1: Convert to MP3
-        logger.info("Step 1/4: Converting video to audio...")
-        video.processing_stage = 'audio_converted'
-        video.save()
-        
-        if not audio_path.exists():
-            logger.info(f"Converting {video_filename} to MP3...")
-            subprocess.run([
-                "ffmpeg", "-y", "-i", str(video_path), str(audio_path)
-            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            logger.info("Audio conversion complete")
-        else:
-            logger.info("Audio file already exists, skipping conversion")
-        
-        # Step 2: Transcribe using Groq
-        logger.info("Step 2/4: Transcribing audio to text...")
-        video.processing_stage = 'transcribed'
-        video.save()
-        
-        if not json_path.exists():
-            logger.info("Splitting audio into chunks...")
-            # Split audio into 10-minute chunks
-            chunk_pattern = str(chunks_dir / f"{base_name}_part_%03d.mp3")
-            subprocess.run([
-                "ffmpeg", "-y",
-                "-i", str(audio_path),
-                "-f", "segment",
-                "-segment_time", "600",
-                "-c", "copy",
-                chunk_pattern
-            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-            # Get all chunk files
-            chunk_files = sorted(chunks_dir.glob(f"{base_name}_part_*.mp3"))
-            logger.info(f"Created {len(chunk_files)} audio chunks")
-            
-            # Transcribe each chunk
-            groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-            all_chunks = []
-            full_text = ""
-            offset = 0.0
-            
-            for idx, chunk_file in enumerate(chunk_files, start=1):
-                logger.info(f"Transcribing chunk {idx}/{len(chunk_files)}...")
-                
-                with open(chunk_file, "rb") as f:
-                    result = groq_client.audio.transcriptions.create(
-                        file=f,
-                        model="whisper-large-v3-turbo",
-                        response_format="verbose_json",
-                    )
-                
-                # Add segments with offset
-                for seg in result.segments:
-                    all_chunks.append({
-                        "number": "0",
-                        "title": base_name,
-                        "start": float(seg["start"]) + offset,
-                        "end": float(seg["end"]) + offset,
-                        "text": seg["text"].strip()
-                    })
-                
-                full_text += result.text.strip() + " "
-                
-                # Calculate offset for next chunk
-                duration_cmd = [
-                    "ffprobe", "-v", "error",
-                    "-show_entries", "format=duration",
-                    "-of", "default=noprint_wrappers=1:nokey=1",
-                    str(chunk_file)
-                ]
-                duration = float(subprocess.check_output(duration_cmd).decode().strip())
-                offset += duration
-                
-                # Clean up chunk file
-                chunk_file.unlink()
-            
-            # Save JSON
-            with open(json_path, "w", encoding="utf-8") as f:
-                json.dump({"chunks": all_chunks, "text": full_text.strip()}, f, indent=2)
-            
-            logger.info(f"Transcription complete, saved to {json_path}")
-        else:
-            logger.info("JSON file already exists, skipping transcription")
-        
-        # Step 3: Generate embeddings
-        logger.info("Step 3/4: Generating embeddings...")
-        video.processing_stage = 'embedded'
-        video.save()
-        
-        # Load or create embeddings dataframe
-        embedding_file = SCRIPTS_DIR / 'embeddings.joblib'
-        if embedding_file.exists():
-            df_existing = joblib.load(str(embedding_file))
-            next_id = int(df_existing["chunk_id"].max()) + 1 if len(df_existing) else 0
-            embedded_keys = set(df_existing["title"].astype(str) + "__" + df_existing["start"].astype(str))
-        else:
-            df_existing = pd.DataFrame()
-            next_id = 0
-            embedded_keys = set()
-        
-        # Load JSON and check for new chunks
-        with open(json_path, encoding="utf-8") as f:
-            content = json.load(f)
-        
-        chunks = content.get("chunks", [])
-        new_chunks = [c for c in chunks if f'{c["title"]}__{c["start"]}' not in embedded_keys]
-        
-        if new_chunks:
-            logger.info(f"Generating embeddings for {len(new_chunks)} new chunks...")
-            texts = [c["text"] for c in new_chunks]
-            
-            # Create embeddings via Ollama
-            response = requests.post(
-                "http://localhost:11434/api/embed",
-                json={"model": "bge-m3", "input": texts},
-                timeout=300
-            )
-            response.raise_for_status()
-            embeddings = response.json()["embeddings"]
-            
-            rows = []
-            for c, emb in zip(new_chunks, embeddings):
-                c["chunk_id"] = next_id
-                c["embedding"] = emb
-                rows.append(c)
-                next_id += 1
-            
-            df_new = pd.DataFrame(rows)
-            df_final = pd.concat([df_existing, df_new], ignore_index=True) if len(df_existing) else df_new
-            joblib.dump(df_final, str(embedding_file))
-            logger.info(f"Embeddings updated, total chunks: {len(df_final)}")
-        else:
-            logger.info("No new chunks to embed")
-        
-        logger.info("Embeddings generation complete")
+        # Identical uploads share every file below (segments, checkpoint, transcript,
+        # shard): one job produces them while a duplicate waits, then skips through
+        with artifacts.artifact_lock(base_name):
+            # Stages and segments finished by an earlier (failed or interrupted) run
+            checkpoint = PipelineCheckpoint.load(base_name)
+            if checkpoint.data['stages']:
+                logger.info(f"Resuming from checkpoint: {checkpoint.progress()}")
+            
+            # Step 1: Extract speech audio segments (one ffmpeg pass straight from the video)
+            logger.info("Step 1/4: Extracting audio...")
+            video.processing_stage = 'audio_converted'
+            video.save(update_fields=['processing_stage'])
+            
+            segments = []
+            if not json_path.exists():
+                segments = checkpoint.segments()
+                if segments:
+                    logger.info(f"Reusing {len(segments)} audio chunks from checkpoint")
+                else:
+                    keep_full_track = getattr(settings, 'AUDIO_KEEP_FULL_TRACK', False) and not audio_path.exists()
+                    logger.info(f"Extracting audio segments from {video_filename}...")
+                    with stage_timer(video, 'audio_extraction') as metrics:
+                        segments = extract_audio_segments(
+                            video_path, chunks_dir, base_name,
+                            full_track_path=audio_path if keep_full_track else None,
+                        )
+                        metrics.add(bytes=_total_size(segment[0] for segment in segments), segments=len(segments))
+                    checkpoint.record_segments(segments)
+                    logger.info(f"Created {len(segments)} audio chunks")
+                if segments:
+                    _record_duration(video, segments[-1][2])
+            else:
+                logger.info("JSON file already exists, skipping audio extraction")
+            
+            # Step 2: Transcribe using Groq
+            logger.info("Step 2/4: Transcribing audio to text...")
+            video.processing_stage = 'transcribed'
+            video.save(update_fields=['processing_stage'])
+            
+            # Per-video shard in the vector store (replaces the library-wide embeddings.joblib)
+            store = get_vector_store()
+            shard = store.open_shard(base_name)
+            embedded_starts = shard.starts() if shard is not None else set()
+            streamed = 0
+            
+            if not json_path.exists():
+                # Transcribe the chunks concurrently; results are merged back in order.
+                # Each finished chunk is checkpointed, so a failure only loses the chunks in flight.
+                # Every segment's chunks stream straight into embedding (step 3) while later
+                # segments are still transcribing
+                groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+                # The embedding row records the consumer's busy time, not the overlapping
+                # transcription wall time, so each stage's cost stays separable
+                embed_metrics = StageMetrics()
+                embed_started_at = timezone.now()
+                stream = EmbeddingStream(store, base_name, embedded_starts, metrics=embed_metrics)
+                try:
+                    with stream:
+                        with stage_timer(video, 'transcription') as metrics:
+                            all_chunks, full_text = transcribe_segments(
+                                groq_client, segments, base_name, checkpoint=checkpoint, on_segment=stream.put,
+                            )
+                            metrics.add(bytes=_total_size(segment[0] for segment in segments), segments=len(segments))
+                finally:
+                    record_stage(video, 'embedding', embed_started_at, stream.busy_seconds, embed_metrics,
+                                 succeeded=stream.error is None)
+                streamed = stream.embedded
+                if stream.shard is not None:
+                    shard = stream.shard
+                    embedded_starts = shard.starts()
+                logger.info(f"Embedded {streamed} chunks while transcribing")
+            
+                # Save JSON (write-temp + rename: a crash never leaves a partial transcript behind)
+                with atomic_write(json_path) as f:
+                    json.dump({"chunks": all_chunks, "text": full_text}, f, indent=2)
+                checkpoint.mark_stage('transcribed')
+            
+                # Chunk files are kept until the transcript is saved so a failed run can resume
+                for segment in segments:
+                    segment[0].unlink(missing_ok=True)
+            
+                logger.info(f"Transcription complete, saved to {json_path}")
+                lexical_index.build_index(base_name, all_chunks)
+            else:
+                logger.info("JSON file already exists, skipping transcription")
+            video.json_path = str(json_path)
+            
+            # Step 3: Generate embeddings
+            logger.info("Step 3/4: Generating embeddings...")
+            video.processing_stage = 'embedded'
+            video.save(update_fields=['processing_stage', 'json_path'])
+            
+            # Load JSON and check for chunks not embedded yet (transcript from an earlier run)
+            with open(json_path, encoding="utf-8") as f:
+                content = json.load(f)
+            
+            chunks = content.get("chunks", [])
+            for position, c in enumerate(chunks):
+                c["chunk_id"] = position
+            new_chunks = [c for c in chunks if float(c["start"]) not in embedded_starts]
+            if chunks and not video.duration_seconds:
+                _record_duration(video, max(float(c["end"]) for c in chunks))
+            
+            if new_chunks:
+                logger.info(f"Generating embeddings for {len(new_chunks)} new chunks...")
+                texts = [c["text"] for c in new_chunks]
+            
+                # Create embeddings via Ollama: bounded batches, a few in flight, each retried on its own
+                with stage_timer(video, 'embedding') as metrics:
+                    embeddings = embed_texts_batched(texts, metrics=metrics)
+                    metrics.add(bytes=sum(len(text.encode('utf-8')) for text in texts), segments=len(texts))
+            
+                shard = store.append_chunks(base_name, new_chunks, embeddings, model=EMBEDDING_MODEL)
+                logger.info(f"Embeddings updated, total chunks for video: {len(shard)}")
+            elif not streamed:
+                logger.info("No new chunks to embed")
+            
+            if new_chunks or streamed:
+                # Keep the library-wide ANN index in step with the new shard
+                try:
+                    index_shard(base_name, shard.vectors)
+                except Exception as index_error:
+                    logger.warning(f"Library index update failed (rebuild with manage.py build_ann_index): {index_error}")
+            
+            # Record where this video's vectors live so queries can open the shard directly
+            if shard is not None and video.vector_shard != base_name:
+                video.vector_shard = base_name
+                video.save(update_fields=['vector_shard'])
+            
+            checkpoint.mark_stage('embedded')
+            logger.info("Embeddings generation complete")
         
         # Step 4: Generate PDF
         logger.info("Step 4/4: Generating PDF...")
         video.processing_stage = 'pdf_generated'
-        video.save()
+        video.save(update_fields=['processing_stage'])
         
-        from . import pdf_gen
-        logger.info(f"Calling generate_pdf for video {video.id}")
-        pdf_gen.generate_pdf(video_id)
-        logger.info("PDF generation complete")
+        shared_pdf = artifacts.find_shared_pdf(video)
+        if checkpoint.has_stage('pdf_generated') and PDF.objects.filter(video=video).exists():
+            logger.info("PDF already generated by an earlier run, skipping")
+        elif shared_pdf is not None:
+            logger.info(f"Reusing PDF of video {shared_pdf.video_id} (same content)")
+            artifacts.link_pdf(video, shared_pdf)
+        else:
+            from . import pdf_gen
+            logger.info(f"Calling generate_pdf for video {video.id}")
+            pdf_gen.generate_pdf(video_id)
+            logger.info("PDF generation complete")
+        checkpoint.mark_stage('pdf_generated')
         
-        # Mark as completed
+        # Mark as completed; every artifact is final, so the checkpoint is no longer needed
         video.status = 'completed'
-        video.save()
+        video.save(update_fields=['status'])
+        checkpoint.clear()
         logger.info(f"Video processing completed successfully for video ID: {video_id}")
         
     except Exception as e:
         error_message = str(e)
         logger.error(f"Error processing video {video_id}: {error_message}", exc_info=True)
         
-        if video:
+        # Earlier attempts leave the video 'processing'; the queue retries them with backoff
+        if video and final_attempt:
             video.status = 'failed'
             video.error_message = error_message
-            video.save()
+            video.save(update_fields=['status', 'error_message'])
+        if raise_errors:
+            raise
 
 
@@ -2,81 +2,303 @@
 Query Processing Integration
 Wraps existing rag_query.py logic with performance optimizations
 """
-import sys
-from pathlib import Path
+import hashlib
 from django.conf import settings
+from django.core.cache import cache
+import numpy as np
 import logging
 
+from . import lexical_index
+from .embedding import embed_questions, normalize_question
+from .files import add_scripts_to_path
+from .search import VectorSearchEngine
+from .vector_store import get_vector_store
+
 logger = logging.getLogger(__name__)
 
-# Add the existing scripts directory to Python path
-SCRIPTS_DIR = Path(settings.BASE_DIR).parent / 'Video-Knowledge-Extraction-Semantic-Search-System-RAG-based-'
-sys.path.insert(0, str(SCRIPTS_DIR))
+add_scripts_to_path()
+
+
+SEARCH_MODES = ('vector', 'hybrid', 'lexical')
+
+
+class VideoNotIndexed(Exception):
+    """Raised when a video has no chunk embeddings in the vector store"""
+
+
+def open_video_shard(video):
+    """O(1) lookup of a video's shard through Video.vector_shard (maintained at ingest)"""
+    if not video.vector_shard:
+        raise VideoNotIndexed(f"Video {video.id} has not been indexed")
+    shard = get_vector_store().open_shard(video.vector_shard)
+    if shard is None:
+        raise VideoNotIndexed(f"Vector shard '{video.vector_shard}' for video {video.id} is missing")
+    return shard
+
+
+def answer_cache_key(video_id, index_version, question, top_k, mode='vector'):
+    """Cache key for a formatted answer; a new index version makes older entries unreachable"""
+    digest = hashlib.sha1(normalize_question(question).encode('utf-8')).hexdigest()
+    return f"answer:{video_id}:{index_version}:{mode}:{top_k}:{digest}"
+
+
+def search_shard_batch(shard, questions, top_k=3, mode=None):
+    """
+    Retrieve the top chunks of one shard for each question.
+
+    'vector'  cosine similarity of bge-m3 embeddings
+    'hybrid'  cosine fused with BM25 (SEARCH_LEXICAL_WEIGHT), catches exact identifiers
+    'lexical' BM25 only; never contacts Ollama
+    """
+    mode = mode or getattr(settings, 'SEARCH_MODE', 'vector')
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'")
+    if not questions:
+        return []
+
+    engine = VectorSearchEngine.from_shard(shard)
+    if not len(engine):
+        return [[] for _ in questions]
+
+    lexical_scores = None
+    if mode in ('hybrid', 'lexical'):
+        index = lexical_index.shard_index(shard)
+        lexical_scores = np.vstack([lexical_index.row_scores(index, shard, question) for question in questions])
+        if mode == 'lexical':
+            return engine.rank(lexical_scores, top_k, min_score=0.0)
+
+    # One embedding request for all (uncached) questions, then one matrix-matrix product
+    question_vectors = embed_questions(questions)
+    return engine.search_batch(
+        question_vectors,
+        top_k=top_k,
+        lexical_scores=lexical_scores,
+        lexical_weight=getattr(settings, 'SEARCH_LEXICAL_WEIGHT', 0.3) if lexical_scores is not None else 0.0,
+    )
+
 
-# Module-level cache for embeddings (avoids reloading 8MB+ file on every query)
-_embeddings_cache = None
-_embeddings_file_mtime = None
+def search_shard(shard, question, top_k=3, mode=None):
+    """Top chunks of one shard for a single question"""
+    return search_shard_batch(shard, [question], top_k=top_k, mode=mode)[0]
 
 
-def query_video(video_id, question):
+def refine_timestamps(shard, question, hits):
+    """
+    Tighten the hits' start/end with rag_query.search_chunks, whose Ollama timestamp
+    refinement the original query path ran on every question. It only sees the
+    retrieved hits, so ranking stays with the search engine; on failure the chunk
+    boundaries are kept.
+
+    Off by default (SEARCH_REFINE_TIMESTAMPS): search_chunks embeds the question
+    again through Ollama before refining, which bypasses the question embedding
+    cache, so every uncached answer pays an extra embedding round-trip plus the
+    refinement calls. Without it, answers point at whole transcript chunks.
+    """
+    if not hits or not getattr(settings, 'SEARCH_REFINE_TIMESTAMPS', False):
+        return hits
+
+    try:
+        import pandas as pd
+        import rag_query
+
+        # Start times are unique within a shard (ingest skips chunks by start)
+        starts = np.asarray(shard.meta['start'])
+        rows = [int(np.flatnonzero(starts == hit['start'])[0]) for hit in hits]
+        df = pd.DataFrame({
+            'title': shard.key,
+            'start': [hit['start'] for hit in hits],
+            'end': [hit['end'] for hit in hits],
+            'text': [hit['text'] for hit in hits],
+            'embedding': [np.asarray(shard.vectors[row]) for row in rows],
+        })
+        refined = {result['text']: result for result in rag_query.search_chunks(df, question, top_k=len(hits))}
+    except Exception as refine_error:
+        logger.warning(f"Timestamp refinement failed, using chunk boundaries: {refine_error}")
+        return hits
+
+    return [
+        {**hit, 'start': refined[hit['text']]['start'], 'end': refined[hit['text']]['end']}
+        if hit['text'] in refined else hit
+        for hit in hits
+    ]
+
+
+def format_answer(results):
+    """Chat answer text for retrieved chunks"""
+    import rag_query
+
+    if not results:
+        return "No part of this video matches that question."
+    return rag_query.format_chat_answer(results)
+
+
+def query_video(video_id, question, top_k=3, mode=None):
     """
     Query a video using RAG with optimized caching
-    Returns dict with answer and timestamp info
+    Returns dict with answer, timestamp info and answer cache status ('hit' or 'miss')
     """
     from api.models import Video
-    import rag_query
-    import joblib
-    import pipelIne_api
-    
-    global _embeddings_cache, _embeddings_file_mtime
-    
+
+    mode = mode or getattr(settings, 'SEARCH_MODE', 'vector')
     video = Video.objects.get(id=video_id)
-    
+
     if video.status != 'completed':
         raise ValueError("Video processing not complete")
-    
-    # Load embeddings with caching
-    embedding_file = SCRIPTS_DIR / 'embeddings.joblib'
-    
-    # Check if we need to reload (file changed or no cache)
-    current_mtime = embedding_file.stat().st_mtime if embedding_file.exists() else None
-    
-    if _embeddings_cache is None or _embeddings_file_mtime != current_mtime:
-        logger.info("Loading embeddings from disk (cache miss or file updated)")
-        df = joblib.load(str(embedding_file))
-        _embeddings_cache = df
-        _embeddings_file_mtime = current_mtime
-    else:
-        logger.info("Using cached embeddings (cache hit)")
-        df = _embeddings_cache
-    
-    # Filter to this video's chunks using cleaned filename (more reliable than title)
-    video_filename = Path(video.file.name).name
-    base_name = pipelIne_api.clean_filename(video_filename.rsplit('.', 1)[0])
-    
-    # Match on the exact base_name used during processing
-    df_video = df[df['title'] == base_name]
-    
-    if len(df_video) == 0:
-        logger.warning(f"No chunks found for base_name '{base_name}', using all chunks")
-        df_video = df
-    else:
-        logger.info(f"Found {len(df_video)} chunks for video '{base_name}'")
-    
-    # Search chunks (this includes timestamp refinement via Ollama)
-    # NOTE: Timestamp refinement adds API calls but improves precision
-    results = rag_query.search_chunks(df_video, question, top_k=3)
-    
+
+    # Open only this video's shard; memmapped pages are shared across workers
+    shard = open_video_shard(video)
+
+    # Identical question against an unchanged index: answer without touching Ollama.
+    # Refined answers are cached apart from the batch endpoint's unrefined ones
+    refine = mode != 'lexical' and getattr(settings, 'SEARCH_REFINE_TIMESTAMPS', False)
+    cache_key = answer_cache_key(video.id, shard.version, question, top_k, f"{mode}+refined" if refine else mode)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Answer cache hit for video {video.id}")
+        return {**cached, 'cache_status': 'hit'}
+
+    logger.info(f"Searching shard '{shard.key}' for video {video.id} ({len(shard)} chunks, {mode} mode)")
+    results = search_shard(shard, question, top_k=top_k, mode=mode)
+    if refine:
+        results = refine_timestamps(shard, question, results)
+
     # Format answer
-    answer = rag_query.format_chat_answer(results)
-    
+    answer = format_answer(results)
+
     # Extract timestamp from top result
     timestamp_start = results[0]['start'] if results else None
     timestamp_end = results[0]['end'] if results else None
-    
-    return {
+
+    result = {
         'answer': answer,
         'timestamp_start': timestamp_start,
         'timestamp_end': timestamp_end,
         'raw_results': results,
     }
+    cache.set(cache_key, result, getattr(settings, 'QUERY_ANSWER_CACHE_TTL', 86400))
+
+    return {**result, 'cache_status': 'miss'}
+
+
+def query_video_batch(video_id, questions, top_k=3, mode=None):
+    """
+    Answer many questions about one video. Cached answers are reused; the rest share
+    one embedding request and one scoring pass over the shard. Timestamps are never
+    refined here (that costs Ollama calls per question); answers point at whole chunks.
+    Returns one dict per question, in order, shaped like query_video's result.
+    """
+    from api.models import Video
+
+    mode = mode or getattr(settings, 'SEARCH_MODE', 'vector')
+    video = Video.objects.get(id=video_id)
+
+    if video.status != 'completed':
+        raise ValueError("Video processing not complete")
+
+    shard = open_video_shard(video)
+
+    cache_keys = [answer_cache_key(video.id, shard.version, question, top_k, mode) for question in questions]
+    cached = cache.get_many(cache_keys)
+    results = [None] * len(questions)
+    pending = []
+    for index, key in enumerate(cache_keys):
+        if key in cached:
+            results[index] = {**cached[key], 'cache_status': 'hit'}
+        else:
+            pending.append(index)
+
+    logger.info(f"Batch of {len(questions)} questions on shard '{shard.key}' "
+                f"({len(questions) - len(pending)} cached, {mode} mode)")
+
+    if pending:
+        hits_per_question = search_shard_batch(shard, [questions[index] for index in pending], top_k=top_k, mode=mode)
+        fresh = {}
+        for index, hits in zip(pending, hits_per_question):
+            result = {
+                'answer': format_answer(hits),
+                'timestamp_start': hits[0]['start'] if hits else None,
+                'timestamp_end': hits[0]['end'] if hits else None,
+                'raw_results': hits,
+            }
+            fresh[cache_keys[index]] = result
+            results[index] = {**result, 'cache_status': 'miss'}
+        cache.set_many(fresh, getattr(settings, 'QUERY_ANSWER_CACHE_TTL', 86400))
+
+    return results
+
+
+def _exact_hits(shard, query_vector, top_k):
+    """(key, row, score) of a shard's top_k rows by exact cosine"""
+    engine = VectorSearchEngine.from_shard(shard)
+    scores = engine.score(query_vector)
+    rows = engine.top_k_rows(scores, top_k)[0]
+    return [(shard.key, int(row), float(scores[0, row])) for row in rows]
+
+
+def search_library(user, query, limit=10, offset=0):
+    """
+    Rank transcript segments across every completed video owned by `user`.
+
+    A user whose shards hold at most LIBRARY_SEARCH_EXACT_MAX_ROWS rows is scanned
+    exactly. Larger libraries go through the library-wide IVF index, probing more
+    lists until enough of the user's own hits are found (the closest lists may hold
+    only other users' lectures); shards not in the index yet are scanned exactly so
+    new videos are never missed. Identical uploads share a shard, and each of them
+    gets its own result. Returns up to `limit` hit dicts starting at rank `offset`.
+    """
+    from api.models import Video
+
+    from .ann_index import get_library_index
+
+    videos = {}
+    for video in Video.objects.filter(user=user, status='completed', vector_shard__isnull=False).order_by('id'):
+        videos.setdefault(video.vector_shard, []).append(video)
+    if not videos:
+        return []
+
+    wanted = offset + limit
+    query_vector = embed_questions([query])[0]
+
+    store = get_vector_store()
+    shards = {}
+    for key in videos:
+        shard = store.open_shard(key)
+        if shard is not None and len(shard) and shard.dim == len(query_vector):
+            shards[key] = shard
+
+    hits = []
+    exact_keys = set(shards)
+    if sum(len(shard) for shard in shards.values()) > getattr(settings, 'LIBRARY_SEARCH_EXACT_MAX_ROWS', 50000):
+        index = get_library_index()
+        indexed = exact_keys & set(index.live_shard_keys)
+        nprobe = getattr(settings, 'ANN_INDEX_NPROBE', 8)
+        while indexed:
+            hits = index.search(query_vector, top_k=wanted, nprobe=nprobe, shard_filter=indexed)
+            if len(hits) >= wanted or nprobe >= len(index.centroids):
+                break
+            nprobe *= 2
+        exact_keys -= indexed
+
+    for key in exact_keys:
+        hits.extend(_exact_hits(shards[key], query_vector, wanted))
+    hits.sort(key=lambda hit: -hit[2])
+
+    results = []
+    for key, row, score in hits:
+        if len(results) >= wanted:
+            break
+        shard = shards[key]
+        if row >= len(shard):
+            continue
+        chunk = shard.chunk(row)
+        for video in videos[key]:
+            results.append({
+                'video_id': video.id,
+                'title': video.title,
+                'youtube_url': video.youtube_url or '',
+                'timestamp_start': chunk['start'],
+                'timestamp_end': chunk['end'],
+                'text': chunk['text'],
+                'score': score,
+            })
+    return results[offset:wanted]
@@ -0,0 +1,79 @@
+"""
+Vector Search Engine
+Exact cosine top-k over a 2-D float32 matrix of pre-normalized chunk vectors
+"""
+import numpy as np
+import logging
+
+from .vector_store import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+
+class VectorSearchEngine:
+    """
+    Scores every chunk with one matrix product and picks the top k with argpartition.
+
+    `vectors` must already be unit-normalized (vector store shards are), so the dot
+    product is the cosine similarity. `chunk_at(row)` returns the result dict for a row.
+    """
+
+    def __init__(self, vectors, chunk_at):
+        self.vectors = vectors
+        self.chunk_at = chunk_at
+
+    @classmethod
+    def from_shard(cls, shard):
+        return cls(shard.vectors, shard.chunk)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def score(self, query_vectors):
+        """Cosine scores, shape (n_queries, n_chunks)"""
+        queries = normalize_rows(query_vectors)
+        return queries @ np.asarray(self.vectors).T
+
+    def top_k_rows(self, scores, top_k):
+        """Row indices of the k best scores per query, best first"""
+        n_chunks = scores.shape[1]
+        k = min(top_k, n_chunks)
+        if k <= 0:
+            return np.zeros((scores.shape[0], 0), dtype=np.int64)
+        if k < n_chunks:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(n_chunks), (scores.shape[0], 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        return np.take_along_axis(candidates, order, axis=1)
+
+    def rank(self, scores, top_k=3, min_score=None):
+        """Top-k result dicts for each row of a (n_queries, n_chunks) score matrix"""
+        rows = self.top_k_rows(scores, top_k)
+
+        results = []
+        for query_index, query_rows in enumerate(rows):
+            hits = []
+            for row in query_rows:
+                if min_score is not None and scores[query_index, row] <= min_score:
+                    continue
+                hit = self.chunk_at(int(row))
+                hit['score'] = float(scores[query_index, row])
+                hits.append(hit)
+            results.append(hits)
+        return results
+
+    def search_batch(self, query_vectors, top_k=3, lexical_scores=None, lexical_weight=0.0):
+        """
+        Top-k result dicts for each query vector. With `lexical_scores` (one [0, 1]
+        row per query, aligned with the chunks) the ranking uses the fused score
+        (1 - lexical_weight) * cosine + lexical_weight * lexical.
+        """
+        if not len(self):
+            return [[] for _ in range(len(np.atleast_2d(query_vectors)))]
+
+        scores = self.score(query_vectors)
+        if lexical_scores is not None and lexical_weight:
+            scores = (1.0 - lexical_weight) * scores + lexical_weight * np.atleast_2d(lexical_scores)
+        return self.rank(scores, top_k)
@@ -0,0 +1,120 @@
+"""
+Streaming Embedding
+Embeds transcript chunks while later audio segments are still being transcribed
+"""
+import queue
+import threading
+import time
+
+from django.conf import settings
+import logging
+
+from .embedding import EMBEDDING_MODEL, embed_texts_batched
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class EmbeddingStream:
+    """
+    Consumer side of the transcription -> embedding pipeline.
+
+    put() hands over one segment's chunks (in segment order) through a bounded
+    queue; a background thread embeds them and appends them to the video's
+    vector shard, so a slow embedder applies backpressure instead of buffering a
+    whole video. Embedded chunks are appended in batches of at least
+    `flush_chunks`, so a long video adds a few shard segments rather than one per
+    audio segment (which would trigger compactions mid-ingest). Chunk ids are assigned by running position, matching the order
+    of the merged transcript. Chunks whose start time is in `skip_starts` (already
+    in the shard from an interrupted run) are not embedded again.
+
+    Use as a context manager: leaving the block waits for the queue to drain and
+    re-raises an embedding failure; if the block itself raises, the stream is
+    stopped without waiting on further work; chunks already embedded are still
+    appended either way, so a resumed run skips them. `busy_seconds` is the time spent
+    embedding and appending, i.e. the embedding stage's own cost.
+    """
+
+    def __init__(self, store, key, skip_starts=(), metrics=None, maxsize=None, model=EMBEDDING_MODEL,
+                 flush_chunks=None):
+        self.store = store
+        self.key = key
+        self.skip_starts = set(skip_starts)
+        self.metrics = metrics
+        self.model = model
+        self.shard = None
+        self.embedded = 0
+        self.busy_seconds = 0.0
+        self.error = None
+        self._stopped = False
+        self._position = 0
+        self._flush_chunks = flush_chunks or getattr(settings, 'EMBEDDING_STREAM_FLUSH_CHUNKS', 512)
+        self._pending_chunks = []
+        self._pending_embeddings = []
+        self._queue = queue.Queue(maxsize=maxsize or getattr(settings, 'EMBEDDING_STREAM_QUEUE_SIZE', 4))
+        self._thread = threading.Thread(target=self._run, name=f"embed-{key[:12]}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stopped = exc_type is not None
+        self._queue.put(_DONE)
+        self._thread.join()
+        if exc_type is None and self.error is not None:
+            raise self.error
+        return False
+
+    def put(self, chunks):
+        """Queue one segment's chunks (blocks while the queue is full)"""
+        if self.error is not None:
+            raise self.error
+        for chunk in chunks:
+            chunk["chunk_id"] = self._position
+            self._position += 1
+        self._queue.put(chunks)
+
+    def _run(self):
+        while True:
+            chunks = self._queue.get()
+            if chunks is _DONE:
+                self._timed(self._flush)
+                return
+            if self.error is not None or self._stopped:
+                # Keep draining so a blocked producer is released; put() reports the error
+                continue
+            self._timed(self._embed, chunks)
+            if len(self._pending_chunks) >= self._flush_chunks:
+                self._timed(self._flush)
+
+    def _timed(self, step, *args):
+        started = time.monotonic()
+        try:
+            step(*args)
+        except Exception as e:
+            logger.error(f"Streaming embedding for '{self.key}' failed: {e}")
+            self.error = self.error or e
+        finally:
+            self.busy_seconds += time.monotonic() - started
+
+    def _embed(self, chunks):
+        new_chunks = [c for c in chunks if float(c["start"]) not in self.skip_starts]
+        if not new_chunks:
+            return
+        texts = [c["text"] for c in new_chunks]
+        embeddings = embed_texts_batched(texts, model=self.model, metrics=self.metrics)
+        if self.metrics is not None:
+            self.metrics.add(bytes=sum(len(text.encode('utf-8')) for text in texts), segments=len(texts))
+        self._pending_chunks.extend(new_chunks)
+        self._pending_embeddings.extend(embeddings)
+        self.skip_starts.update(float(c["start"]) for c in new_chunks)
+
+    def _flush(self):
+        if not self._pending_chunks:
+            return
+        chunks, embeddings = self._pending_chunks, self._pending_embeddings
+        self._pending_chunks, self._pending_embeddings = [], []
+        self.shard = self.store.append_chunks(self.key, chunks, embeddings, model=self.model)
+        self.embedded += len(chunks)
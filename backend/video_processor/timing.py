@@ -0,0 +1,147 @@
+"""
+Stage Timing
+Per-stage wall-clock and throughput records (StageTiming rows) for pipeline runs
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StageMetrics:
+    """Work counters for one stage run; add() is thread-safe (stages fan out to thread pools)"""
+
+    def __init__(self):
+        self.bytes = None
+        self.segments = None
+        self.tokens = None
+        self._lock = threading.Lock()
+
+    def add(self, bytes=0, segments=0, tokens=0):
+        with self._lock:
+            if bytes:
+                self.bytes = (self.bytes or 0) + int(bytes)
+            if segments:
+                self.segments = (self.segments or 0) + int(segments)
+            if tokens:
+                self.tokens = (self.tokens or 0) + int(tokens)
+
+    def add_usage(self, response):
+        """Count the tokens reported by an OpenAI-style chat completion response"""
+        usage = getattr(response, 'usage', None)
+        self.add(tokens=getattr(usage, 'total_tokens', 0) or 0)
+
+
+@contextmanager
+def stage_timer(video, stage):
+    """
+    Time a pipeline stage for `video` and yield its StageMetrics.
+
+    The StageTiming row is written when the stage starts (so the status endpoint
+    shows the stage in flight) and completed on exit with duration, outcome and
+    counters. Instrumentation errors are logged, never raised into the pipeline.
+    """
+    from api.models import StageTiming
+
+    metrics = StageMetrics()
+    timing = None
+    try:
+        timing = StageTiming.objects.create(video_id=video.id, stage=stage, started_at=timezone.now())
+    except Exception as e:
+        logger.warning(f"Could not record {stage} timing for video {video.id}: {e}")
+    started = time.monotonic()
+
+    succeeded = False
+    try:
+        yield metrics
+        succeeded = True
+    finally:
+        if timing is not None:
+            timing.finished_at = timezone.now()
+            timing.duration_seconds = time.monotonic() - started
+            timing.succeeded = succeeded
+            timing.bytes = metrics.bytes
+            timing.segments = metrics.segments
+            timing.tokens = metrics.tokens
+            try:
+                timing.save(update_fields=[
+                    'finished_at', 'duration_seconds', 'succeeded', 'bytes', 'segments', 'tokens',
+                ])
+            except Exception as e:
+                logger.warning(f"Could not record {stage} timing for video {video.id}: {e}")
+        logger.info(f"Stage {stage} for video {video.id} took {time.monotonic() - started:.1f}s")
+
+
+def record_stage(video, stage, started_at, duration_seconds, metrics, succeeded=True):
+    """
+    Write a finished StageTiming row for work that did not run as one block, e.g.
+    embedding interleaved with transcription, where the duration is only the time
+    actually spent embedding.
+    """
+    from api.models import StageTiming
+
+    try:
+        StageTiming.objects.create(
+            video_id=video.id, stage=stage, started_at=started_at, finished_at=timezone.now(),
+            duration_seconds=duration_seconds, succeeded=succeeded,
+            bytes=metrics.bytes, segments=metrics.segments, tokens=metrics.tokens,
+        )
+    except Exception as e:
+        logger.warning(f"Could not record {stage} timing for video {video.id}: {e}")
+    logger.info(f"Stage {stage} for video {video.id} took {duration_seconds:.1f}s")
+
+
+def timing_record(timing):
+    """Dict form of a StageTiming row for API responses"""
+    return {
+        'stage': timing.stage,
+        'started_at': timing.started_at,
+        'finished_at': timing.finished_at,
+        'duration_seconds': timing.duration_seconds,
+        'succeeded': timing.succeeded,
+        'bytes': timing.bytes,
+        'segments': timing.segments,
+        'tokens': timing.tokens,
+    }
+
+
+def latest_timings(video):
+    """Most recent run of each stage for a video, in pipeline order"""
+    latest = {}
+    for timing in video.stage_timings.order_by('started_at'):
+        latest[timing.stage] = timing
+    return sorted(latest.values(), key=lambda timing: timing.started_at)
+
+
+def stage_percentiles(queryset):
+    """
+    p50/p95 duration per stage over successful runs, with throughput where the
+    stage records bytes (MB/s) or segments (per second). Returns a list of dicts.
+    """
+    rows = queryset.filter(succeeded=True, duration_seconds__isnull=False).values_list(
+        'stage', 'duration_seconds', 'bytes', 'segments',
+    )
+    by_stage = {}
+    for stage, duration, size, segments in rows:
+        by_stage.setdefault(stage, []).append((duration, size, segments))
+
+    report = []
+    for stage, runs in sorted(by_stage.items()):
+        durations = np.array([run[0] for run in runs], dtype=float)
+        total_seconds = float(durations.sum())
+        total_bytes = sum(run[1] or 0 for run in runs)
+        total_segments = sum(run[2] or 0 for run in runs)
+        report.append({
+            'stage': stage,
+            'runs': len(runs),
+            'p50_seconds': round(float(np.percentile(durations, 50)), 2),
+            'p95_seconds': round(float(np.percentile(durations, 95)), 2),
+            'mb_per_second': round(total_bytes / total_seconds / 1e6, 2) if total_bytes and total_seconds else None,
+            'segments_per_second': round(total_segments / total_seconds, 2) if total_segments and total_seconds else None,
+        })
+    return report
@@ -0,0 +1,217 @@
+"""
+Transcription
+Audio extraction and concurrent Groq Whisper transcription of audio segments
+"""
+import csv
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+import logging
+
+from . import vad
+from .jobs import stage_slot
+
+logger = logging.getLogger(__name__)
+
+WHISPER_MODEL = "whisper-large-v3-turbo"
+
+
+def read_segment_list(list_path, segments_dir):
+    """
+    Parse the segment muxer's CSV list (`name,start,end` per line) into
+    [(segment_path, start_seconds, end_seconds)] in segment order.
+    """
+    segments = []
+    with open(list_path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or not row[0]:
+                continue
+            segments.append((Path(segments_dir) / row[0], float(row[1]), float(row[2])))
+    segments.sort(key=lambda segment: segment[1])
+    return segments
+
+
+def extract_audio_segments(video_path, segments_dir, base_name, full_track_path=None):
+    """
+    Decode the video's audio once and write transcription-ready segments straight
+    from it: mono, AUDIO_SAMPLE_RATE Hz, AUDIO_BITRATE MP3, AUDIO_SEGMENT_SECONDS
+    long. With `full_track_path` the same pass also writes the full-length track.
+
+    With AUDIO_VAD_ENABLED, silence found by a silencedetect pass is dropped from
+    the segments and cuts are placed at pauses; each segment then also carries the
+    source spans it was assembled from, so transcript times map back to the video.
+    That pass is the only one decoding the video: it keeps the mono audio as FLAC
+    and the segment pass reads that.
+
+    Returns [(segment_path, start_seconds, end_seconds[, spans])] taken from the
+    muxer's segment list, so offsets need no per-segment ffprobe call.
+    """
+    sample_rate = getattr(settings, 'AUDIO_SAMPLE_RATE', 16000)
+    bitrate = getattr(settings, 'AUDIO_BITRATE', '32k')
+    segment_seconds = getattr(settings, 'AUDIO_SEGMENT_SECONDS', 600)
+    speech_output = ["-ac", "1", "-ar", str(sample_rate), "-c:a", "libmp3lame", "-b:a", bitrate]
+
+    segments_dir.mkdir(parents=True, exist_ok=True)
+    for stale in segments_dir.glob(f"{base_name}_part_*.mp3"):
+        stale.unlink()
+    list_path = segments_dir / f"{base_name}_segments.csv"
+    filter_path = segments_dir / f"{base_name}_speech.filter"
+    decoded_path = segments_dir / f"{base_name}_decoded.flac"
+
+    source_path = video_path
+    spans = None
+    if getattr(settings, 'AUDIO_VAD_ENABLED', False):
+        spans, duration = vad.detect_speech(video_path, decoded_path=decoded_path, sample_rate=sample_rate)
+        source_path = decoded_path
+        kept = sum(end - start for start, end in spans)
+        if not spans or not duration or kept >= duration - 0.5:
+            # Nothing to drop (or no speech found at all): cut the full track as before
+            spans = None
+        else:
+            logger.info(f"VAD kept {kept:.0f}s of {duration:.0f}s audio ({100 * (1 - kept / duration):.0f}% silence dropped)")
+
+    command = ["ffmpeg", "-y", "-i", str(source_path)]
+    if full_track_path is not None:
+        command += ["-map", "0:a:0", "-vn", *speech_output, str(full_track_path)]
+    command += ["-map", "0:a:0", "-vn"]
+    if spans is not None:
+        # The select expression grows with the number of pauses, so it goes in a filter script
+        filter_path.write_text(vad.select_filter(spans, sample_rate), encoding='utf-8')
+        cuts = vad.plan_cuts(spans, segment_seconds)
+        command += ["-filter_script:a", str(filter_path), *speech_output, "-f", "segment"]
+        command += ["-segment_times", ",".join(f"{cut:.3f}" for cut in cuts)] if cuts else ["-segment_time", str(segment_seconds)]
+    else:
+        command += [*speech_output, "-f", "segment", "-segment_time", str(segment_seconds)]
+    command += [
+        "-segment_list", str(list_path),
+        "-segment_list_type", "csv",
+        "-reset_timestamps", "1",
+        str(segments_dir / f"{base_name}_part_%03d.mp3"),
+    ]
+
+    try:
+        with stage_slot('ffmpeg'):
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        segments = read_segment_list(list_path, segments_dir)
+    finally:
+        list_path.unlink(missing_ok=True)
+        filter_path.unlink(missing_ok=True)
+        decoded_path.unlink(missing_ok=True)
+
+    if spans is None:
+        return segments
+
+    # List times are on the trimmed timeline; translate each segment back to source spans
+    mapped = []
+    for path, trimmed_start, trimmed_end in segments:
+        segment_spans = vad.slice_spans(spans, trimmed_start, trimmed_end)
+        if segment_spans:
+            mapped.append((path, segment_spans[0][0], segment_spans[-1][1], segment_spans))
+        else:
+            path.unlink(missing_ok=True)
+    return mapped
+
+
+def segment_spans(segment):
+    """Source spans a segment was cut from; a plain (path, start, end) segment is one span"""
+    if len(segment) > 3 and segment[3]:
+        return [tuple(span) for span in segment[3]]
+    return [(float(segment[1]), float(segment[2]))]
+
+
+def transcribe_segment(client, path, retries=None, backoff=None):
+    """Transcribe one audio segment, retrying this segment alone on failure"""
+    retries = getattr(settings, 'TRANSCRIPTION_SEGMENT_RETRIES', 3) if retries is None else retries
+    backoff = getattr(settings, 'TRANSCRIPTION_RETRY_BACKOFF_SECONDS', 5) if backoff is None else backoff
+
+    for attempt in range(retries + 1):
+        try:
+            with open(path, "rb") as f, stage_slot('network'):
+                return client.audio.transcriptions.create(
+                    file=f,
+                    model=WHISPER_MODEL,
+                    response_format="verbose_json",
+                )
+        except Exception as e:
+            if attempt >= retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            logger.warning(f"Transcription of {path.name} failed ({e}); retry {attempt + 1}/{retries} in {delay}s")
+            time.sleep(delay)
+
+
+def transcribe_segments(client, segments, title, workers=None, checkpoint=None, on_segment=None):
+    """
+    Transcribe audio segments concurrently and merge them in segment order.
+
+    `segments` are (path, start_seconds, end_seconds[, spans]) tuples as returned
+    by extract_audio_segments; each segment's timestamps are mapped back through
+    its source spans (or shifted by its start), so the merged chunks carry
+    absolute times. With a `checkpoint`, segments it
+    already holds are not sent again and each new one is recorded as soon as it
+    finishes. `on_segment(chunks)` is called with each segment's merged chunks, in
+    segment order, as soon as that segment and all before it are done, so later
+    stages can start while the rest is still transcribing. Returns (chunks, text).
+    """
+    workers = workers or getattr(settings, 'TRANSCRIPTION_WORKERS', 4)
+    timelines = [segment_spans(segment) for segment in segments]
+
+    def transcribe(index):
+        if checkpoint is not None:
+            recorded = checkpoint.transcript(index)
+            if recorded is not None:
+                return recorded
+        transcript = transcript_record(transcribe_segment(client, segments[index][0]))
+        if checkpoint is not None:
+            checkpoint.record_transcript(index, transcript)
+        return transcript
+
+    logger.info(f"Transcribing {len(segments)} segments with {min(workers, len(segments) or 1)} workers")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # map() yields results in submission order, whatever order they finish in
+        results = []
+        for index, result in enumerate(executor.map(transcribe, range(len(segments)))):
+            results.append(result)
+            if on_segment is not None:
+                on_segment(segment_chunks(result, timelines[index], title))
+
+    return merge_transcripts(results, timelines, title)
+
+
+def transcript_record(result):
+    """Plain-dict form of a Whisper verbose_json result (segment-relative times)"""
+    return {
+        'segments': [
+            {'start': float(seg["start"]), 'end': float(seg["end"]), 'text': seg["text"]}
+            for seg in result.segments
+        ],
+        'text': result.text,
+    }
+
+
+def segment_chunks(result, spans, title):
+    """Transcript chunks of one segment, mapped to absolute (source) times"""
+    return [
+        {
+            "number": "0",
+            "title": title,
+            "start": vad.source_time(float(seg["start"]), spans),
+            "end": vad.source_time(float(seg["end"]), spans),
+            "text": seg["text"].strip()
+        }
+        for seg in result['segments']
+    ]
+
+
+def merge_transcripts(results, timelines, title):
+    """Concatenate per-segment transcripts, mapping segment times through each segment's spans"""
+    all_chunks = []
+    texts = []
+    for result, spans in zip(results, timelines):
+        all_chunks.extend(segment_chunks(result, spans, title))
+        texts.append(result['text'].strip())
+
+    return all_chunks, " ".join(text for text in texts if text)
@@ -0,0 +1,161 @@
+"""
+Voice Activity Detection
+Finds speech spans with ffmpeg silencedetect and maps trimmed audio back to source time
+"""
+import re
+import subprocess
+
+from django.conf import settings
+import logging
+
+from .jobs import stage_slot
+
+logger = logging.getLogger(__name__)
+
+SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):([\d.]+)")
+
+
+def parse_silencedetect(output):
+    """
+    Parse ffmpeg silencedetect log output into ([(silence_start, silence_end)], duration).
+    A silence still open at the end of the stream ends at the duration.
+    """
+    duration = None
+    match = DURATION_RE.search(output)
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    silences = []
+    open_start = None
+    for line in output.splitlines():
+        start = SILENCE_START_RE.search(line)
+        if start:
+            open_start = max(0.0, float(start.group(1)))
+        end = SILENCE_END_RE.search(line)
+        if end and open_start is not None:
+            silences.append((open_start, float(end.group(1))))
+            open_start = None
+    if open_start is not None and duration is not None:
+        silences.append((open_start, duration))
+    return silences, duration
+
+
+def speech_spans(silences, duration, padding=0.0):
+    """
+    Complement of `silences` over [0, duration]: the spans to keep. Each kept span is
+    widened by `padding` seconds into the neighbouring silence so word edges survive.
+    """
+    spans = []
+    speech_start = 0.0
+    for silence_start, silence_end in sorted(silences):
+        if silence_start > speech_start:
+            spans.append((max(0.0, speech_start - padding), silence_start + padding))
+        speech_start = max(speech_start, silence_end)
+    if duration is None or duration > speech_start:
+        spans.append((max(0.0, speech_start - padding), duration if duration is not None else float('inf')))
+
+    # Padding can make neighbours touch; merge them
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def detect_speech(media_path, noise_db=None, min_silence=None, padding=None, decoded_path=None, sample_rate=16000):
+    """
+    Run silencedetect over the media's first audio stream.
+    Returns (speech spans in source seconds, media duration).
+
+    With `decoded_path` the same pass also writes the audio there as mono
+    `sample_rate` Hz FLAC, so later passes read that instead of decoding the video again.
+    """
+    noise_db = getattr(settings, 'AUDIO_VAD_NOISE_DB', -35) if noise_db is None else noise_db
+    min_silence = getattr(settings, 'AUDIO_VAD_MIN_SILENCE_SECONDS', 1.0) if min_silence is None else min_silence
+    padding = getattr(settings, 'AUDIO_VAD_PADDING_SECONDS', 0.25) if padding is None else padding
+
+    command = [
+        "ffmpeg", "-hide_banner", "-nostats", "-i", str(media_path),
+        "-map", "0:a:0", "-vn", "-ac", "1",
+        "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}",
+    ]
+    if decoded_path is not None:
+        command += ["-ar", str(sample_rate), "-c:a", "flac", "-y", str(decoded_path)]
+    else:
+        command += ["-f", "null", "-"]
+    with stage_slot('ffmpeg'):
+        result = subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    silences, duration = parse_silencedetect(result.stderr.decode('utf-8', errors='replace'))
+    return speech_spans(silences, duration, padding), duration
+
+
+def plan_cuts(spans, max_seconds):
+    """
+    Segment boundaries on the trimmed (speech-only) timeline. Segments hold at most
+    `max_seconds` of speech and are cut between spans, i.e. at pauses; only a single
+    span longer than that is cut inside.
+    """
+    cuts = []
+    position = 0.0
+    segment_start = 0.0
+    for start, end in spans:
+        length = end - start
+        if position > segment_start and position + length - segment_start > max_seconds:
+            cuts.append(position)
+            segment_start = position
+        while position + length - segment_start > max_seconds:
+            segment_start += max_seconds
+            cuts.append(segment_start)
+        position += length
+    return cuts
+
+
+def select_filter(spans, sample_rate):
+    """
+    Audio filter keeping only `spans` and closing the gaps. Frames are first split to
+    10 ms so the kept audio matches the span lengths closely.
+    """
+    condition = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in spans)
+    return (
+        f"aresample={sample_rate},asetnsamples=n={max(1, sample_rate // 100)}:p=0,"
+        f"aselect='{condition}',asetpts=N/SR/TB"
+    )
+
+
+def slice_spans(spans, trimmed_start, trimmed_end):
+    """Source spans covered by [trimmed_start, trimmed_end) of the trimmed timeline"""
+    sliced = []
+    position = 0.0
+    for start, end in spans:
+        length = end - start
+        low = max(trimmed_start, position)
+        high = min(trimmed_end, position + length)
+        if high > low:
+            sliced.append((start + low - position, start + high - position))
+        position += length
+        if position >= trimmed_end:
+            break
+    return sliced
+
+
+def source_time(seconds, spans):
+    """
+    Map a time within a trimmed segment (its `spans` concatenated) back to source
+    time. Times past the last span continue from its start.
+    """
+    position = 0.0
+    for start, end in spans:
+        length = end - start
+        if seconds < position + length:
+            return start + seconds - position
+        position += length
+    if not spans:
+        return seconds
+    start, end = spans[-1]
+    return start + seconds - (position - (end - start))
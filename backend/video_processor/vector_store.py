@@ -0,0 +1,397 @@
+"""
+Vector Store
+Per-video float32 embedding shards opened with numpy.memmap
+"""
+import json
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+from .files import SCRIPTS_DIR, atomic_write
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = SCRIPTS_DIR / 'vector_store'
+
+VECTORS_FILE = 'vectors.f32'
+META_FILE = 'meta.npy'
+TEXTS_FILE = 'texts.bin'
+MANIFEST_FILE = 'manifest.json'
+LOCK_FILE = '.lock'
+
+# Opens retried when a concurrent commit retires the files of the manifest just read
+OPEN_ATTEMPTS = 3
+
+# One fixed-size record per chunk; text lives in the segment text file at [text_offset, text_offset + text_length)
+META_DTYPE = np.dtype([
+    ('chunk_id', '<i8'),
+    ('start', '<f8'),
+    ('end', '<f8'),
+    ('text_offset', '<i8'),
+    ('text_length', '<i4'),
+])
+
+
+def normalize_rows(vectors):
+    """Return float32 copy of vectors scaled to unit L2 norm (zero rows stay zero)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+class VectorShard:
+    """Read-only, memory-mapped view over one video's chunk vectors and metadata"""
+
+    def __init__(self, key, path):
+        self.key = key
+        self.path = Path(path)
+
+        with open(self.path / MANIFEST_FILE, encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+        self.dim = int(self.manifest['dim'])
+        self.count = int(self.manifest['count'])
+        self.model = self.manifest.get('model')
+        self.version = self.manifest.get('version')
+        self.segments = shard_segments(self.manifest)
+
+        vectors, metas, self._texts = [], [], []
+        for segment in self.segments:
+            if not segment['count']:
+                continue
+            vectors.append(np.memmap(self.path / segment['vectors'], dtype='<f4', mode='r',
+                                     shape=(segment['count'], self.dim)))
+            metas.append(np.load(self.path / segment['meta'], mmap_mode='r'))
+            self._texts.append(np.memmap(self.path / segment['texts'], dtype=np.uint8, mode='r'))
+
+        if len(vectors) == 1:
+            # Compacted shard: serve straight from the page cache, no copy
+            self.vectors, self.meta = vectors[0], metas[0]
+        elif vectors:
+            self.vectors, self.meta = np.vstack(vectors), np.concatenate(metas)
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+            self.meta = np.zeros(0, dtype=META_DTYPE)
+
+        # First row of each non-empty segment; text offsets are relative to their segment
+        self._segment_rows = np.cumsum([0] + [len(m) for m in metas])[:-1]
+
+    def __len__(self):
+        return self.count
+
+    def text(self, row):
+        """Decode the transcript text of one row"""
+        segment = int(np.searchsorted(self._segment_rows, row, side='right')) - 1
+        offset = int(self.meta['text_offset'][row])
+        length = int(self.meta['text_length'][row])
+        return bytes(self._texts[segment][offset:offset + length]).decode('utf-8')
+
+    def chunk(self, row):
+        """Return a chunk dict in the same shape the transcript JSON uses"""
+        record = self.meta[row]
+        return {
+            'title': self.key,
+            'chunk_id': int(record['chunk_id']),
+            'start': float(record['start']),
+            'end': float(record['end']),
+            'text': self.text(row),
+        }
+
+    def starts(self):
+        """Set of chunk start times already stored (used to skip re-embedding)"""
+        return set(float(value) for value in self.meta['start'])
+
+
+@contextmanager
+def file_lock(path, on_wait=None):
+    """
+    Exclusive flock on `path` for the duration of the block (held across processes).
+    `on_wait` is called once if the lock is busy, before blocking on it.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if on_wait is not None:
+                    on_wait()
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def segment_files(segment):
+    return (segment['vectors'], segment['meta'], segment['texts'])
+
+
+def shard_segments(manifest):
+    """Segment list of a manifest; shards written before the segment log have one implicit segment"""
+    if 'segments' in manifest:
+        return manifest['segments']
+    return [{'vectors': VECTORS_FILE, 'meta': META_FILE, 'texts': TEXTS_FILE, 'count': int(manifest['count'])}]
+
+
+class VectorStore:
+    """
+    Directory of per-video shards, each an append-only log of segments:
+
+        vector_store/<key>/seg-<id>.f32       contiguous (count, dim) float32, unit-normalized rows
+        vector_store/<key>/seg-<id>.meta.npy  META_DTYPE records, one per row
+        vector_store/<key>/seg-<id>.txt       UTF-8 chunk texts, addressed by meta offsets
+        vector_store/<key>/manifest.json      dim, count, model, version, segments
+
+    New rows are written as a fresh segment and become visible when the manifest
+    is atomically replaced, so an append costs O(new chunks) and readers never
+    observe a partial write. Compaction merges segments back into one.
+
+    Writers of a shard (ingest workers, the compaction command) hold an flock on
+    <key>/.lock from reading the manifest to committing the next one, so an
+    append and a compaction in different processes cannot lose each other's rows.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._open_shards = {}
+        self._pending_compactions = set()
+
+    def shard_path(self, key):
+        return self.root / key
+
+    def has_shard(self, key):
+        return (self.shard_path(key) / MANIFEST_FILE).exists()
+
+    def shard_keys(self):
+        """Keys of every shard in the store"""
+        if not self.root.exists():
+            return []
+        return sorted(
+            p.name for p in self.root.iterdir()
+            if p.is_dir() and not p.name.startswith(('.', '_')) and (p / MANIFEST_FILE).exists()
+        )
+
+    def open_shard(self, key):
+        """
+        Open one video's shard. Opened shards are reused until the manifest changes,
+        so repeated queries only pay for a stat() call.
+
+        Readers take no lock: a writer in another process may retire the segments of
+        the manifest just read before they are mapped. The new manifest is already
+        published by then, so the open is retried against it.
+        """
+        manifest_path = self.shard_path(key) / MANIFEST_FILE
+        for attempt in range(OPEN_ATTEMPTS):
+            try:
+                mtime = manifest_path.stat().st_mtime_ns
+            except FileNotFoundError:
+                return None
+
+            with self._lock:
+                cached = self._open_shards.get(key)
+                if cached and cached[0] == mtime:
+                    return cached[1]
+
+            try:
+                shard = VectorShard(key, self.shard_path(key))
+            except FileNotFoundError:
+                if attempt == OPEN_ATTEMPTS - 1:
+                    raise
+                logger.info(f"Segments of shard '{key}' were retired while opening it, retrying")
+                continue
+            with self._lock:
+                self._open_shards[key] = (mtime, shard)
+            return shard
+
+    @contextmanager
+    def _locked(self, key):
+        """Hold the shard's write lock (threads of this process and other processes)"""
+        with self._write_lock, file_lock(self.shard_path(key) / LOCK_FILE):
+            yield
+
+    def _read_manifest(self, key):
+        """Manifest currently on disk, or None; call with the shard locked"""
+        try:
+            with open(self.shard_path(key) / MANIFEST_FILE, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_segment(self, shard_dir, chunks, vectors):
+        """Write one segment's files under fresh names; nothing references them until commit"""
+        meta = np.zeros(len(chunks), dtype=META_DTYPE)
+        encoded_texts = []
+        offset = 0
+        for row, chunk in enumerate(chunks):
+            encoded = (chunk.get('text') or '').encode('utf-8')
+            meta[row] = (int(chunk['chunk_id']), float(chunk['start']), float(chunk['end']), offset, len(encoded))
+            encoded_texts.append(encoded)
+            offset += len(encoded)
+
+        name = f"seg-{uuid.uuid4().hex}"
+        segment = {
+            'vectors': f"{name}.f32",
+            'meta': f"{name}.meta.npy",
+            'texts': f"{name}.txt",
+            'count': len(chunks),
+        }
+        vectors.tofile(shard_dir / segment['vectors'])
+        np.save(shard_dir / segment['meta'], meta)
+        with open(shard_dir / segment['texts'], 'wb') as f:
+            f.write(b''.join(encoded_texts))
+        return segment
+
+    def _commit(self, key, manifest, previous=None):
+        """
+        Atomically publish a manifest (write-temp + rename), then delete the segments
+        of the `previous` manifest that the new one no longer references.
+        """
+        shard_dir = self.shard_path(key)
+        with atomic_write(shard_dir / MANIFEST_FILE, fsync=True) as f:
+            json.dump(manifest, f)
+
+        if previous is not None:
+            referenced = {name for segment in manifest['segments'] for name in segment_files(segment)}
+            for segment in shard_segments(previous):
+                for name in segment_files(segment):
+                    # Open memmaps keep unlinked files readable, so in-flight queries are unaffected
+                    if name not in referenced:
+                        (shard_dir / name).unlink(missing_ok=True)
+
+        with self._lock:
+            self._open_shards.pop(key, None)
+
+    def write_shard(self, key, chunks, embeddings, model):
+        """Write (or replace) a video's shard from transcript chunks and their embeddings."""
+        if len(chunks) != len(embeddings):
+            raise ValueError("chunks and embeddings must have the same length")
+
+        with self._locked(key):
+            self._write_shard(key, chunks, embeddings, model, self._read_manifest(key))
+
+        logger.info(f"Wrote vector shard '{key}' with {len(chunks)} chunks")
+        return self.open_shard(key)
+
+    def _write_shard(self, key, chunks, embeddings, model, previous):
+        vectors = normalize_rows(embeddings) if len(embeddings) else np.zeros((0, 0), dtype=np.float32)
+        segment = self._write_segment(self.shard_path(key), chunks, vectors)
+        self._commit(key, {
+            'key': key,
+            'dim': int(vectors.shape[1]) if len(embeddings) else 0,
+            'count': len(chunks),
+            'model': model,
+            'normalized': True,
+            'version': uuid.uuid4().hex,
+            'segments': [segment],
+        }, previous)
+
+    def append_chunks(self, key, chunks, embeddings, model):
+        """Append new chunks to a video's shard as one new segment (O(new chunks) I/O)."""
+        if len(chunks) != len(embeddings):
+            raise ValueError("chunks and embeddings must have the same length")
+
+        with self._locked(key):
+            previous = self._read_manifest(key)
+            if previous is None or not int(previous['count']):
+                self._write_shard(key, chunks, embeddings, model, previous)
+                logger.info(f"Wrote vector shard '{key}' with {len(chunks)} chunks")
+                return self.open_shard(key)
+
+            vectors = normalize_rows(embeddings)
+            if vectors.shape[1] != int(previous['dim']):
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match shard dimension {previous['dim']}")
+
+            segment = self._write_segment(self.shard_path(key), chunks, vectors)
+            manifest = dict(previous)
+            manifest['segments'] = shard_segments(previous) + [segment]
+            manifest['count'] = int(previous['count']) + len(chunks)
+            manifest['version'] = uuid.uuid4().hex
+            self._commit(key, manifest, previous)
+
+        logger.info(f"Appended {len(chunks)} chunks to vector shard '{key}' ({len(manifest['segments'])} segments)")
+
+        if len(manifest['segments']) > getattr(settings, 'VECTOR_STORE_MAX_SEGMENTS', 8):
+            self.schedule_compaction(key)
+        return self.open_shard(key)
+
+    def compact_shard(self, key):
+        """Merge a shard's segments into one contiguous segment; returns True if anything changed"""
+        with self._locked(key):
+            if not self.has_shard(key):
+                return False
+            # Read from disk, not the open-shard cache: another process may have appended
+            shard = VectorShard(key, self.shard_path(key))
+            if len(shard.segments) <= 1:
+                return False
+
+            chunks = [shard.chunk(row) for row in range(len(shard))]
+            segment = self._write_segment(self.shard_path(key), chunks, np.ascontiguousarray(shard.vectors))
+            manifest = dict(shard.manifest)
+            manifest['segments'] = [segment]
+            # Same rows, same order: keep the version so cached answers stay valid
+            self._commit(key, manifest, shard.manifest)
+
+            # Segments left behind by a writer that died before committing
+            referenced = set(segment_files(segment))
+            for path in self.shard_path(key).glob('seg-*'):
+                if path.name not in referenced:
+                    path.unlink(missing_ok=True)
+
+        logger.info(f"Compacted vector shard '{key}' from {len(shard.segments)} segments")
+        return True
+
+    def schedule_compaction(self, key):
+        """Compact a shard on a background thread (at most one pending run per shard)"""
+        with self._lock:
+            if key in self._pending_compactions:
+                return
+            self._pending_compactions.add(key)
+
+        def _run():
+            try:
+                self.compact_shard(key)
+            except Exception as compaction_error:
+                logger.warning(f"Compaction of vector shard '{key}' failed: {compaction_error}")
+            finally:
+                with self._lock:
+                    self._pending_compactions.discard(key)
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def delete_shard(self, key):
+        with self._locked(key):
+            shutil.rmtree(self.shard_path(key), ignore_errors=True)
+        with self._lock:
+            self._open_shards.pop(key, None)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_vector_store():
+    """Process-wide store instance (shares opened memmaps between requests)"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = VectorStore()
+        return _default_store
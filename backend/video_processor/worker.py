@@ -0,0 +1,128 @@
+"""
+Job Worker Pool
+Fixed-size pool of threads that claim and run jobs from the processing queue
+"""
+import os
+import socket
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections
+import logging
+
+from . import jobs
+
+logger = logging.getLogger(__name__)
+
+
+def load_handlers():
+    """Import the modules that register job handlers"""
+    from . import pdf_gen, pipeline, youtube  # noqa: F401
+
+
+class JobWorkerPool:
+    """
+    `workers` threads, each running one job at a time, so at most `workers`
+    videos are in flight per process however many are uploaded at once.
+    A heartbeat thread keeps the leases of running jobs fresh; jobs whose
+    lease expires (the process died) are picked up again by any pool.
+    """
+
+    def __init__(self, workers=None, kinds=None, poll_interval=None):
+        self.workers = workers or getattr(settings, 'JOB_QUEUE_WORKERS', 2)
+        self.kinds = kinds
+        self.poll_interval = poll_interval or getattr(settings, 'JOB_QUEUE_POLL_SECONDS', 2)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._running = {}
+        self._running_lock = threading.Lock()
+
+    def start(self):
+        load_handlers()
+        jobs.requeue_stale_jobs()
+
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+        logger.info(f"Started {self.workers} job worker(s) as {self.worker_id}")
+        return self
+
+    def wake(self):
+        """Skip the idle wait (a job was just enqueued in this process)"""
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        """Stop claiming new jobs and wait for running ones to finish"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        slot_id = f"{self.worker_id}/{threading.current_thread().name}"
+        while not self._stop.is_set():
+            job = None
+            try:
+                close_old_connections()
+                job = jobs.claim_job(slot_id, kinds=self.kinds)
+                if job is None:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+
+                with self._running_lock:
+                    self._running[threading.get_ident()] = job.id
+                logger.info(f"Worker {slot_id} running job {job.id} ({job.kind}, attempt {job.attempts})")
+                jobs.run_job(job)
+            except Exception as e:
+                # Database hiccups must not kill the worker thread
+                logger.error(f"Job worker error: {e}", exc_info=True)
+                self._stop.wait(self.poll_interval)
+            finally:
+                if job is not None:
+                    with self._running_lock:
+                        self._running.pop(threading.get_ident(), None)
+        close_old_connections()
+
+    def _heartbeat(self):
+        interval = max(1, getattr(settings, 'JOB_LEASE_SECONDS', 300) // 3)
+        while not self._stop.wait(interval):
+            try:
+                close_old_connections()
+                with self._running_lock:
+                    job_ids = list(self._running.values())
+                jobs.heartbeat(job_ids)
+                jobs.requeue_stale_jobs()
+            except Exception as e:
+                logger.warning(f"Job heartbeat failed: {e}")
+
+
+_embedded_pool = None
+_embedded_pool_lock = threading.Lock()
+
+
+def notify_enqueued():
+    """
+    Called after a job is enqueued. With JOB_QUEUE_EMBEDDED_WORKERS > 0 the web
+    process runs its own small pool (handy for `runserver`); otherwise jobs wait
+    for `manage.py run_workers`.
+    """
+    global _embedded_pool
+
+    embedded_workers = getattr(settings, 'JOB_QUEUE_EMBEDDED_WORKERS', 0)
+    if not embedded_workers:
+        return
+
+    with _embedded_pool_lock:
+        if _embedded_pool is None:
+            _embedded_pool = JobWorkerPool(workers=embedded_workers).start()
+    _embedded_pool.wake()
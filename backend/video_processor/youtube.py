@@ -0,0 +1,151 @@
+"""
+YouTube Download Job
+Downloads a YouTube video with yt-dlp and queues it for processing
+"""
+import os
+import re
+import shutil
+import tempfile
+import logging
+
+from django.db import transaction
+
+from .artifacts import file_sha256
+from .jobs import PermanentJobError, job_handler, report_progress, stage_slot
+
+logger = logging.getLogger(__name__)
+
+
+def parse_progress_percent(value):
+    """Convert yt-dlp progress value to integer percent"""
+    if value is None:
+        return None
+
+    if isinstance(value, (int, float)):
+        return max(0, min(100, int(float(value))))
+
+    text = str(value)
+    match = re.search(r"(\d+(?:\.\d+)?)%", text)
+    if not match:
+        return None
+
+    return max(0, min(100, int(float(match.group(1)))))
+
+
+@job_handler('youtube_download')
+def download_youtube_video(job):
+    """
+    Job handler: download payload['youtube_url'], create the Video and enqueue its
+    processing. The Video, its link on the job and the processing job are committed
+    together, so a retry after that point finds job.video and does not download again.
+    """
+    from django.core.files import File
+    from api.models import Video
+    from api.validators import validate_video_file
+    from .pipeline import process_video_async
+
+    if job.video_id is not None:
+        report_progress(job, phase='processing', progress=100, message='Uploaded. Processing video...')
+        return
+
+    try:
+        import yt_dlp
+    except ImportError:
+        logger.error("yt-dlp is not installed")
+        raise PermanentJobError('YouTube downloader dependency is missing on server')
+
+    youtube_url = job.payload['youtube_url']
+    custom_title = job.payload.get('title') or ''
+    temp_dir = None
+    downloaded_path = None
+
+    try:
+        temp_dir = tempfile.mkdtemp(prefix='yt_download_')
+        info_ref = {}
+        last_reported = {'progress': None}
+
+        def progress_hook(progress_data):
+            status_value = progress_data.get('status')
+
+            if status_value == 'downloading':
+                percent_value = parse_progress_percent(progress_data.get('_percent_str'))
+                if percent_value is None:
+                    total_bytes = progress_data.get('total_bytes') or progress_data.get('total_bytes_estimate')
+                    downloaded_bytes = progress_data.get('downloaded_bytes')
+                    if total_bytes and downloaded_bytes is not None:
+                        percent_value = int((downloaded_bytes / total_bytes) * 100)
+
+                # yt-dlp calls the hook many times per second; only write whole-percent changes
+                percent_value = percent_value if percent_value is not None else 0
+                if percent_value != last_reported['progress']:
+                    last_reported['progress'] = percent_value
+                    report_progress(job, phase='downloading', progress=percent_value,
+                                    message='Downloading from YouTube...')
+
+            if status_value == 'finished':
+                filename = progress_data.get('filename')
+                if filename:
+                    info_ref['downloaded_path'] = filename
+
+                report_progress(job, phase='downloaded', progress=100,
+                                message='Download complete. Uploading to application...')
+
+        ydl_opts = {
+            'format': 'best[ext=mp4]/best',
+            'outtmpl': os.path.join(temp_dir, '%(title).200B [%(id)s].%(ext)s'),
+            'noplaylist': True,
+            'quiet': True,
+            'no_warnings': True,
+            'progress_hooks': [progress_hook],
+        }
+
+        with stage_slot('network'):
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(youtube_url, download=True)
+                downloaded_path = info_ref.get('downloaded_path') or ydl.prepare_filename(info)
+
+        if not downloaded_path or not os.path.exists(downloaded_path):
+            downloaded_files = [
+                os.path.join(temp_dir, name)
+                for name in os.listdir(temp_dir)
+                if os.path.isfile(os.path.join(temp_dir, name))
+            ]
+            if not downloaded_files:
+                raise ValueError('Failed to download video from YouTube')
+            downloaded_path = downloaded_files[0]
+
+        file_name = os.path.basename(downloaded_path)
+        file_size = os.path.getsize(downloaded_path)
+        try:
+            validate_video_file(file_name, file_size)
+        except ValueError as e:
+            raise PermanentJobError(str(e))
+
+        final_title = custom_title or info.get('title') or os.path.splitext(file_name)[0]
+
+        video = Video(
+            user=job.user,
+            title=final_title,
+            status='uploading',
+            youtube_url=youtube_url,
+            content_hash=file_sha256(downloaded_path),
+        )
+        with open(downloaded_path, 'rb') as downloaded_file:
+            video.file.save(file_name, File(downloaded_file), save=False)
+        try:
+            with transaction.atomic():
+                video.save()
+                job.video = video
+                job.save(update_fields=['video'])
+                process_video_async(video.id)
+        except Exception:
+            job.video = None
+            video.file.delete(save=False)
+            raise
+
+        report_progress(job, phase='processing', progress=100, message='Uploaded. Processing video...')
+        logger.info(f"YouTube download job {job.id} created video ID: {video.id}")
+
+    finally:
+        if temp_dir and os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
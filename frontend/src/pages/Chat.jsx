@@ -26,6 +26,7 @@ export const Chat = () => {
     const dragStartX = useRef(0);
     const dragStartWidth = useRef(40);
     const chatBodyRef = useRef(null);
+    const pdfPollRef = useRef(null);
 
     useEffect(() => {
         videoAPI.getVideo(id)
@@ -33,6 +34,9 @@ export const Chat = () => {
             .catch(err => console.error(err));
     }, [id]);
 
+    // Stop any PDF job polling when leaving the chat
+    useEffect(() => () => pdfPollRef.current?.abort(), [id]);
+
     useEffect(() => {
         setIsMessagesHydrated(false);
         try {
@@ -115,9 +119,12 @@ export const Chat = () => {
     };
 
     const handleOpenPdf = async () => {
+        pdfPollRef.current?.abort();
+        const controller = new AbortController();
+        pdfPollRef.current = controller;
         try {
-            const pdfRes = await videoAPI.getPDF(id);
-            const fileUrl = pdfRes?.data?.file;
+            const pdf = await videoAPI.waitForPDF(id, { signal: controller.signal });
+            const fileUrl = pdf?.file;
 
             if (!fileUrl) {
                 alert('PDF is not available yet for this video.');
@@ -126,6 +133,7 @@ export const Chat = () => {
 
             window.open(getPdfUrl(fileUrl), '_blank', 'noopener,noreferrer');
         } catch (error) {
+            if (controller.signal.aborted) return;
             console.error('Failed to open PDF:', error);
             alert('Could not open PDF right now. Please try again.');
         }
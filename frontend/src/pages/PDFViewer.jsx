@@ -12,18 +12,26 @@ export const PDFViewer = () => {
     const [pdf, setPdf] = useState(null);
     const [video, setVideo] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [progress, setProgress] = useState(null);
 
     useEffect(() => {
+        // Stop polling the PDF job when the viewer unmounts or switches video
+        const controller = new AbortController();
         Promise.all([
             videoAPI.getVideo(id),
-            videoAPI.getPDF(id)
+            videoAPI.waitForPDF(id, { onProgress: setProgress, signal: controller.signal })
         ])
-            .then(([videoRes, pdfRes]) => {
+            .then(([videoRes, pdfData]) => {
                 setVideo(videoRes.data);
-                setPdf(pdfRes.data);
+                setPdf(pdfData);
             })
-            .catch(err => console.error(err))
-            .finally(() => setLoading(false));
+            .catch(err => {
+                if (!controller.signal.aborted) console.error(err);
+            })
+            .finally(() => {
+                if (!controller.signal.aborted) setLoading(false);
+            });
+        return () => controller.abort();
     }, [id]);
 
     const getPdfUrl = (fileUrl) => {
@@ -101,7 +109,11 @@ export const PDFViewer = () => {
                 </div>
 
                 {loading ? (
-                    <div className="loading-state">Preparing your document...</div>
+                    <div className="loading-state">
+                        {progress
+                            ? `${progress.message || 'Generating your document...'} (${progress.progress}%)`
+                            : 'Preparing your document...'}
+                    </div>
                 ) : pdf ? (
                     <div style={{
                         flex: 1,
@@ -99,12 +99,44 @@ export const videoAPI = {
 
     // Get video status
     getVideoStatus: (id) => api.get(`/videos/${id}/status/`),
+    resumeVideo: (id) => api.post(`/videos/${id}/resume/`),
 
     // Query video
     queryVideo: (id, question) => api.post(`/videos/${id}/query/`, { question }),
+    queryVideoBatch: (id, questions) => api.post(`/videos/${id}/query_batch/`, { questions }),
+    searchLibrary: (q, params = {}) => api.get('/videos/search/', { params: { q, ...params } }),
+
+    // Get PDF (202 with a job_id while it is being generated)
+    getPDF: (id, params = {}) => api.get(`/videos/${id}/pdf/`, { params }),
+    getPDFStatus: (id, jobId) =>
+        api.get(`/videos/${id}/pdf_status/`, { params: jobId ? { job_id: jobId } : {} }),
+
+    // Resolve with the PDF, polling its generation job if one had to be queued.
+    // Polling stops when `signal` aborts or after `timeoutMs`.
+    waitForPDF: async (id, { params = {}, onProgress, intervalMs = 2000, timeoutMs = 15 * 60 * 1000, signal } = {}) => {
+        const response = await api.get(`/videos/${id}/pdf/`, { params, signal });
+        if (response.status !== 202) {
+            return response.data;
+        }
 
-    // Get PDF
-    getPDF: (id) => api.get(`/videos/${id}/pdf/`),
+        const jobId = response.data.job_id;
+        const deadline = Date.now() + timeoutMs;
+        for (;;) {
+            await new Promise((resolve, reject) => {
+                const timer = setTimeout(resolve, intervalMs);
+                signal?.addEventListener('abort', () => {
+                    clearTimeout(timer);
+                    reject(new DOMException('PDF polling aborted', 'AbortError'));
+                }, { once: true });
+            });
+            signal?.throwIfAborted();
+            const { data: job } = await api.get(`/videos/${id}/pdf_status/`, { params: { job_id: jobId }, signal });
+            if (onProgress) onProgress(job);
+            if (job.status === 'succeeded') return job.pdf;
+            if (job.status === 'failed') throw new Error(job.error || 'PDF generation failed');
+            if (Date.now() >= deadline) throw new Error('PDF generation is taking too long; try again later');
+        }
+    },
 
     // Delete video
     deleteVideo: (id) => api.delete(`/videos/${id}/`),